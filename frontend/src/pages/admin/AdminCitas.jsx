@@ -12,6 +12,9 @@ const AdminCitas = () => {
     const [loading, setLoading] = useState(true);
     const [filtroFecha, setFiltroFecha] = useState('');
     const [busqueda, setBusqueda] = useState('');
+    // Cursor de la página siguiente (null = no hay más) y carga de "Cargar más" en curso
+    const [cursor, setCursor] = useState(null);
+    const [cargandoMas, setCargandoMas] = useState(false);
 
     useEffect(() => {
         const init = async () => {
@@ -30,21 +33,40 @@ const AdminCitas = () => {
         init();
     }, []);
 
+    const getParams = useCallback(() => {
+        const params = { estado: activeTab };
+        if (filtroFecha) params.fecha = filtroFecha;
+        return params;
+    }, [activeTab, filtroFecha]);
+
+    // Primera página; las siguientes se piden con "Cargar más"
     const cargarCitas = useCallback(async () => {
         if (!activeTab) return;
         setLoading(true);
         try {
-            const params = { estado: activeTab };
-            if (filtroFecha) params.fecha = filtroFecha;
-            const data = await citasService.getAll(params);
-            const lista = Array.isArray(data) ? data : (data.results || []);
-            setCitas(lista);
+            const data = await citasService.getPage(getParams());
+            setCitas(data.results);
+            setCursor(data.cursor);
         } catch (error) {
             console.error(error);
         } finally {
             setLoading(false);
         }
-    }, [activeTab, filtroFecha]);
+    }, [activeTab, getParams]);
+
+    const cargarMas = async () => {
+        if (!cursor) return;
+        setCargandoMas(true);
+        try {
+            const data = await citasService.getPage(getParams(), cursor);
+            setCitas(prev => [...prev, ...data.results]);
+            setCursor(data.cursor);
+        } catch (error) {
+            console.error(error);
+        } finally {
+            setCargandoMas(false);
+        }
+    };
 
     useEffect(() => {
         cargarCitas();
@@ -261,6 +283,13 @@ const AdminCitas = () => {
                                 ))}
                             </tbody>
                         </table>
+                        {cursor && (
+                            <div className="p-4 text-center border-t border-gray-100">
+                                <button onClick={cargarMas} disabled={cargandoMas} className="px-6 py-2 rounded-lg bg-gray-100 text-gray-700 text-xs font-bold uppercase tracking-widest hover:bg-gray-200 disabled:opacity-50">
+                                    {cargandoMas ? 'Cargando...' : 'Cargar más'}
+                                </button>
+                            </div>
+                        )}
                     </div>
                 )}
             </div>
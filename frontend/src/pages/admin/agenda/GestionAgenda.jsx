@@ -205,10 +205,11 @@ const GestionAgenda = () => {
                 const [h, b, c] = await Promise.all([
                     agendaService.getDisponibilidades({ profesional_id: prof.id }),
                     agendaService.getBloqueos({ profesional_id: prof.id }),
+                    // El calendario necesita todas las citas del rango visible (acotado por fecha)
                     citasService.getAll({ 
                         profesional_id: prof.id, 
-                        fecha_inicio: fIni.toISOString().split('T')[0], 
-                        fecha_fin: fFin.toISOString().split('T')[0] 
+                        fecha__gte: fIni.toISOString().split('T')[0], 
+                        fecha__lte: fFin.toISOString().split('T')[0] 
                     }).catch(() => []) 
                 ]);
                 return { id: prof.id, data: { horarios: h, bloqueos: b, citas: c } };
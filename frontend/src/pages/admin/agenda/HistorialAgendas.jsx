@@ -10,6 +10,9 @@ const HistorialPanel = ({ profesionalSeleccionado }) => {
     // ESTADOS
     const [citas, setCitas] = useState([]);
     const [loading, setLoading] = useState(false);
+    // Cursor de la página siguiente (null = no hay más) y carga de "Cargar más" en curso
+    const [cursor, setCursor] = useState(null);
+    const [cargandoMas, setCargandoMas] = useState(false);
 
     // Filtros Iniciales (Mes Actual)
     const [filtros, setFiltros] = useState({
@@ -19,6 +22,13 @@ const HistorialPanel = ({ profesionalSeleccionado }) => {
     });
 
     // --- LÓGICA DE BÚSQUEDA ---
+    const getParams = () => ({
+        fecha__gte: filtros.fechaInicio,
+        fecha__lte: filtros.fechaFin,
+        profesional_id: profesionalSeleccionado.id,
+        ...(filtros.estado ? { estado: filtros.estado } : {})
+    });
+
     const handleBuscar = async (e) => {
         if (e) e.preventDefault();
         
@@ -26,24 +36,11 @@ const HistorialPanel = ({ profesionalSeleccionado }) => {
 
         setLoading(true);
         try {
-            const profId = profesionalSeleccionado.id;
+            const data = await citasService.getPage(getParams());
+            setCitas(data.results);
+            setCursor(data.cursor);
 
-            const data = await citasService.getAll({
-                fecha_inicio: filtros.fechaInicio,
-                fecha_fin: filtros.fechaFin,
-                profesional_id: profId,
-                estado: filtros.estado
-            });
-            
-            // Filtro de seguridad en cliente para asegurar consistencia
-            const dataFiltrada = data.filter(c => 
-                c.profesional_id === parseInt(profId) &&
-                (!filtros.estado || c.estado === filtros.estado)
-            );
-
-            setCitas(dataFiltrada);
-            
-            if (dataFiltrada.length === 0 && e) {
+            if (data.results.length === 0 && e) {
                 const Toast = Swal.mixin({ toast: true, position: 'top-end', showConfirmButton: false, timer: 3000 });
                 Toast.fire({ icon: 'info', title: 'No se encontraron citas en este periodo' });
             }
@@ -55,12 +52,27 @@ const HistorialPanel = ({ profesionalSeleccionado }) => {
         }
     };
 
+    const cargarMas = async () => {
+        if (!cursor) return;
+        setCargandoMas(true);
+        try {
+            const data = await citasService.getPage(getParams(), cursor);
+            setCitas(prev => [...prev, ...data.results]);
+            setCursor(data.cursor);
+        } catch (error) {
+            console.error("Error cargando historial", error);
+        } finally {
+            setCargandoMas(false);
+        }
+    };
+
     // Cargar datos cuando cambia el profesional
     useEffect(() => {
         if (profesionalSeleccionado) {
             handleBuscar();
         } else {
             setCitas([]);
+            setCursor(null);
         }
         // eslint-disable-next-line react-hooks/exhaustive-deps
     }, [profesionalSeleccionado]); 
@@ -70,32 +82,24 @@ const HistorialPanel = ({ profesionalSeleccionado }) => {
     };
 
     // --- EXPORTAR A CSV (Excel) ---
-    const handleDescargar = () => {
+    // El servidor arma el archivo por bloques: sirve para rangos largos sin cargarlos en el navegador
+    const handleDescargar = async () => {
         if (citas.length === 0) return Swal.fire('Info', 'No hay datos para exportar', 'info');
 
-        const cabeceras = ['ID', 'Fecha', 'Hora Inicio', 'Hora Fin', 'Paciente', 'Documento', 'Servicio', 'Estado', 'Nota Paciente', 'Nota Interna'];
-        const filas = citas.map(c => [
-            c.id,
-            c.fecha,
-            c.hora_inicio,
-            c.hora_fin,
-            `"${c.paciente_nombre || 'N/A'}"`,
-            c.paciente_doc,
-            `"${c.servicio_nombre || ''}"`,
-            c.estado,
-            `"${c.nota || ''}"`,
-            `"${c.nota_interna || ''}"`
-        ]);
-
-        const csvContent = [cabeceras.join(','), ...filas.map(f => f.join(','))].join('\n');
-        const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-        const url = URL.createObjectURL(blob);
-        const link = document.createElement('a');
-        link.href = url;
-        link.setAttribute('download', `Historial_${profesionalSeleccionado.nombre.replace(/\s+/g, '_')}_${filtros.fechaInicio}.csv`);
-        document.body.appendChild(link);
-        link.click();
-        document.body.removeChild(link);
+        try {
+            const blob = await citasService.exportar({ ...getParams(), ordering: 'fecha,hora_inicio' });
+            const url = URL.createObjectURL(blob);
+            const link = document.createElement('a');
+            link.href = url;
+            link.setAttribute('download', `Historial_${profesionalSeleccionado.nombre.replace(/\s+/g, '_')}_${filtros.fechaInicio}.csv`);
+            document.body.appendChild(link);
+            link.click();
+            document.body.removeChild(link);
+            URL.revokeObjectURL(url);
+        } catch (error) {
+            console.error("Error exportando historial", error);
+            Swal.fire('Error', 'No se pudo generar el reporte', 'error');
+        }
     };
 
     // --- HELPER DE COLORES (Compatible con estados dinámicos) ---
@@ -291,6 +295,13 @@ const HistorialPanel = ({ profesionalSeleccionado }) => {
                                 </tbody>
                             </table>
                         </div>
+                        {cursor && (
+                            <div className="p-4 text-center border-t border-gray-100">
+                                <button onClick={cargarMas} disabled={cargandoMas} className="px-6 py-2 rounded-lg bg-indigo-50 text-indigo-700 text-xs font-bold hover:bg-indigo-100 disabled:opacity-50">
+                                    {cargandoMas ? 'Cargando...' : 'Cargar más'}
+                                </button>
+                            </div>
+                        )}
                     </div>
                 )}
             </div>
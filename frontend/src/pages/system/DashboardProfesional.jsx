@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useContext, useCallback } from 'react';
+import React, { useState, useEffect, useContext, useCallback, useRef } from 'react';
 import { citasService } from '../../services/citasService';
 import { AuthContext } from '../../context/AuthContext';
 import Swal from 'sweetalert2';
@@ -24,6 +24,9 @@ const DashboardProfesional = () => {
     return `${edad} años`;
   };
 
+  // Marca de agua de la última consulta de cambios (por fecha: al cambiar el día se recarga todo)
+  const watermarkRef = useRef({ fecha: null, valor: null, ultimoId: null });
+
   const cargarAgendaDia = useCallback(async () => {
     if (!user?.profesional_id) {
       console.error("❌ Error: El usuario no tiene vinculado un profesional_id en su token.");
@@ -39,17 +42,31 @@ const DashboardProfesional = () => {
         .toISOString()
         .split('T')[0];
 
-      console.log(`🔍 Consultando citas para Prof: ${user.profesional_id} en Fecha: ${fechaQuery}`);
-
-      const data = await citasService.getAll({
-        profesional_id: user.profesional_id,
-        fecha: fechaQuery,
-        ordering: 'hora_inicio'
-      });
-
-      const lista = Array.isArray(data) ? data : (data.results || []);
-      console.log("✅ Respuesta del servidor:", lista);
-      setCitas(lista);
+      if (watermarkRef.current.fecha !== fechaQuery) {
+        watermarkRef.current = { fecha: fechaQuery, valor: null, ultimoId: null };
+      }
+
+      let completo = false;
+      while (!completo) {
+        const data = await citasService.getCambios(
+          { profesional_id: user.profesional_id, fecha: fechaQuery },
+          watermarkRef.current.valor,
+          watermarkRef.current.ultimoId
+        );
+        if (!data) return; // 304: nada cambió
+
+        const inicial = data.inicial || !watermarkRef.current.valor;
+        watermarkRef.current.valor = data.watermark;
+        watermarkRef.current.ultimoId = data.ultimo_id;
+        completo = data.completo;
+
+        setCitas(prev => {
+          const porId = new Map((inicial ? [] : prev).map(c => [c.id, c]));
+          data.eliminados.forEach(id => porId.delete(id));
+          data.cambios.forEach(c => porId.set(c.id, c));
+          return [...porId.values()].sort((a, b) => a.hora_inicio.localeCompare(b.hora_inicio));
+        });
+      }
     } catch (error) {
       console.error("❌ Error en la petición:", error);
     } finally {
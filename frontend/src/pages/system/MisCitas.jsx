@@ -19,6 +19,9 @@ const MisCitas = () => {
     const [loading, setLoading] = useState(true);
     
     const [pacienteId, setPacienteId] = useState(null); 
+    // Cursor de la página siguiente (null = no hay más) y carga de "Cargar más" en curso
+    const [cursor, setCursor] = useState(null);
+    const [cargandoMas, setCargandoMas] = useState(false);
 
     // CORRECCIÓN: Validar user.user_id (Formato JWT de Django) o user.id
     useEffect(() => {
@@ -47,16 +50,15 @@ const MisCitas = () => {
             ];
 
             if (currentPacienteId) {
-                promesas.unshift(citasService.getAll({ paciente_id: currentPacienteId }));
+                promesas.unshift(citasService.getPage({ paciente_id: currentPacienteId }));
             } else {
-                promesas.unshift(Promise.resolve([])); 
+                promesas.unshift(Promise.resolve({ results: [], cursor: null })); 
             }
 
             const [dataCitas, dataServicios, dataProfesionales, dataSedes] = await Promise.all(promesas);
 
-            const citasList = Array.isArray(dataCitas) ? dataCitas : (dataCitas.results || []);
-
-            setCitas(citasList);
+            setCitas(dataCitas.results);
+            setCursor(dataCitas.cursor);
             setServicios(dataServicios);
             setProfesionales(dataProfesionales);
             setSedes(dataSedes);
@@ -71,6 +73,20 @@ const MisCitas = () => {
         }
     };
 
+    const cargarMas = async () => {
+        if (!cursor || !pacienteId) return;
+        setCargandoMas(true);
+        try {
+            const data = await citasService.getPage({ paciente_id: pacienteId }, cursor);
+            setCitas(prev => [...prev, ...data.results]);
+            setCursor(data.cursor);
+        } catch (err) {
+            console.error("Error cargando más citas", err);
+        } finally {
+            setCargandoMas(false);
+        }
+    };
+
     const getNombreServicio = (id) => {
         const item = servicios.find(s => s.id === id);
         return item ? item.nombre : 'Servicio General';
@@ -110,8 +126,9 @@ const MisCitas = () => {
                 await Swal.fire('¡Cancelada!', 'Tu cita ha sido cancelada exitosamente.', 'success');
                 
                 if (pacienteId) {
-                    const nuevasCitas = await citasService.getAll({ paciente_id: pacienteId });
-                    setCitas(Array.isArray(nuevasCitas) ? nuevasCitas : (nuevasCitas.results || []));
+                    const nuevasCitas = await citasService.getPage({ paciente_id: pacienteId });
+                    setCitas(nuevasCitas.results);
+                    setCursor(nuevasCitas.cursor);
                 }
 
             } catch (error) {
@@ -259,6 +276,13 @@ const MisCitas = () => {
                             </tbody>
                         </table>
                     </div>
+                    {cursor && (
+                        <div className="p-4 text-center border-t border-gray-100">
+                            <button onClick={cargarMas} disabled={cargandoMas} className="px-6 py-2 rounded-lg bg-blue-50 text-blue-700 text-sm font-bold hover:bg-blue-100 disabled:opacity-50">
+                                {cargandoMas ? 'Cargando...' : 'Cargar más'}
+                            </button>
+                        </div>
+                    )}
                 </div>
             )}
         </div>
@@ -1,4 +1,4 @@
-﻿import React, { useState, useEffect, useContext, useCallback } from 'react';
+﻿import React, { useState, useEffect, useContext, useCallback, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { staffService } from '../../services/staffService';
 import { citasService } from '../../services/citasService';
@@ -39,6 +39,10 @@ const NuevaCita = ({ adminSelectedPatientId = null, isAdminMode = false, presele
     const [dependientes, setDependientes] = useState([]);
     const [titularPerfil, setTitularPerfil] = useState(null);
     const [notaInicial, setNotaInicial] = useState('');
+    // Token del hold del horario elegido (appointments-ms lo suelta solo a los pocos minutos)
+    const reservaRef = useRef(null);
+    // Idempotency-Key del envio actual: se reutiliza si el usuario reintenta tras un error de red
+    const envioRef = useRef(null);
     const [canScheduleForOthers, setCanScheduleForOthers] = useState(false);
     const [allServicios, setAllServicios] = useState([]);
     const [allProfesionales, setAllProfesionales] = useState([]);
@@ -327,57 +331,47 @@ const NuevaCita = ({ adminSelectedPatientId = null, isAdminMode = false, presele
             if (profsDelServicio.length === 0) throw new Error("No hay medicos disponibles.");
 
             const nuevosResultados = [];
-            let diaActual = new Date(fechaInicio);
-            let diasBuscados = 0;
+            const diaActual = new Date(fechaInicio);
             const ahoraMismo = new Date();
-            
-            while (nuevosResultados.length < 3 && diasBuscados < 14) {
-                const fechaStr = diaActual.toISOString().split('T')[0];
-                
-                for (const prof of profsDelServicio) {
-                    if (!prof.lugares_atencion || prof.lugares_atencion.length === 0) continue;
-                    
-                    const slotsBase = await agendaService.getSlots(prof.id, fechaStr, selection.servicio.duracion_minutos);
-                    
-                    if (slotsBase.length > 0) {
-                        const [bloqueosData, rawCitas] = await Promise.all([
-                            agendaService.getBloqueos({ profesional_id: prof.id }),
-                            citasService.getAll({ profesional_id: prof.id, fecha: fechaStr })
-                        ]);
+            const profsConSede = profsDelServicio.filter(p => p.lugares_atencion && p.lugares_atencion.length > 0);
+
+            if (profsConSede.length > 0) {
+                const fechaInicioStr = diaActual.toISOString().split('T')[0];
+                const fechaFin = new Date(diaActual);
+                fechaFin.setDate(fechaFin.getDate() + 13);
+
+                // Una sola llamada para todos los profesionales y los 14 días
+                const rango = await agendaService.getSlotsRango({
+                    profesionalIds: profsConSede.map(p => p.id),
+                    fechaInicio: fechaInicioStr,
+                    fechaFin: fechaFin.toISOString().split('T')[0],
+                    duracion: selection.servicio.duracion_minutos,
+                    servicioId: selection.servicio.id
+                });
+                const slotsPorProf = rango?.profesionales || {};
 
-                        const citasDia = Array.isArray(rawCitas) ? rawCitas : (rawCitas?.results || []);
+                for (let d = 0; d < 14 && nuevosResultados.length < 3; d++) {
+                    const dia = new Date(diaActual);
+                    dia.setDate(dia.getDate() + d);
+                    const fechaStr = dia.toISOString().split('T')[0];
 
-                        const slotLibre = slotsBase.find(slot => {
-                            const h = typeof slot === 'object' ? slot.hora : slot;
-                            if (typeof slot === 'object' && slot.disponible === false) return false;
-
-                            const slotStart = new Date(`${fechaStr}T${h}`);
-                            if (!isAdminMode && slotStart < ahoraMismo) return false;
-                            
-                            const isBloqueado = bloqueosData.some(b => new Date(b.fecha_inicio) <= slotStart && new Date(b.fecha_fin) > slotStart);
-                            
-                            const isOcupado = citasDia.some(c => {
-                                if (c.estado === 'CANCELADA' || c.estado === 'RECHAZADA') return false;
-                                return c.hora_inicio.startsWith(h);
-                            });
-
-                            return !isBloqueado && !isOcupado;
-                        });
+                    for (const prof of profsConSede) {
+                        const slotsDia = slotsPorProf[String(prof.id)]?.[fechaStr] || [];
+                        const slotLibre = slotsDia.find(h => isAdminMode || new Date(`${fechaStr}T${h}`) >= ahoraMismo);
 
                         if (slotLibre) {
                             nuevosResultados.push({
                                 profesional: prof,
                                 sede: sedes.find(s => s.id === prof.lugares_atencion[0]),
                                 fecha: fechaStr,
-                                hora: typeof slotLibre === 'object' ? slotLibre.hora : slotLibre
+                                hora: slotLibre
                             });
                         }
+                        if (nuevosResultados.length >= 3) break;
                     }
-                    if (nuevosResultados.length >= 3) break;
                 }
-                diaActual.setDate(diaActual.getDate() + 1);
-                diasBuscados++;
             }
+            diaActual.setDate(diaActual.getDate() + 14);
 
             setSearchDateStart(diaActual); 
             if (reset) setSuggestions(nuevosResultados);
@@ -391,7 +385,50 @@ const NuevaCita = ({ adminSelectedPatientId = null, isAdminMode = false, presele
         }
     };
 
-    const seleccionarSugerencia = (sug) => {
+    const liberarReserva = () => {
+        const token = reservaRef.current;
+        reservaRef.current = null;
+        envioRef.current = null;
+        if (token) citasService.liberarReserva(token).catch(() => {});
+    };
+
+    useEffect(() => liberarReserva, []);
+
+    // Reserva el horario mientras se confirma; false si otro usuario lo tomo primero
+    const reservarHorario = async (profesional, fecha, hora) => {
+        const anterior = reservaRef.current;
+        try {
+            const reserva = await citasService.tomarReserva({
+                profesional_id: profesional.id,
+                fecha,
+                hora_inicio: hora,
+                servicio_id: selection.servicio?.id,
+            });
+            reservaRef.current = reserva.token;
+            envioRef.current = null;
+            if (anterior) citasService.liberarReserva(anterior).catch(() => {});
+            return true;
+        } catch (error) {
+            if (error?.response?.status === 409) {
+                Swal.fire('Horario no disponible', getApiErrorMessage(error, 'Otro usuario esta reservando este horario.'), 'warning');
+                return false;
+            }
+            // Sin hold igual se puede confirmar: la validacion final la hace el backend
+            return true;
+        }
+    };
+
+    const seleccionarHora = async (h) => {
+        if (!(await reservarHorario(selection.profesional, selection.fecha, h))) {
+            fetchSlots();
+            return;
+        }
+        setSelection(prev => ({ ...prev, hora: h }));
+        nextStep();
+    };
+
+    const seleccionarSugerencia = async (sug) => {
+        if (!(await reservarHorario(sug.profesional, sug.fecha, sug.hora))) return;
         setSelection(prev => ({ ...prev, profesional: sug.profesional, sede: sug.sede, fecha: sug.fecha, hora: sug.hora }));
         setShowAssistant(false);
         setStep(5);
@@ -470,6 +507,9 @@ const NuevaCita = ({ adminSelectedPatientId = null, isAdminMode = false, presele
             fechaTemp.setMinutes(fechaTemp.getMinutes() + duracion);
             const horaFinCalc = fechaTemp.toTimeString().slice(0, 5);
 
+            if (!envioRef.current) {
+                envioRef.current = window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+            }
             await citasService.create({
                 paciente_id: pacienteId,
                 servicio_id: selection.servicio.id,
@@ -479,8 +519,11 @@ const NuevaCita = ({ adminSelectedPatientId = null, isAdminMode = false, presele
                 hora_inicio: selection.hora,
                 hora_fin: horaFinCalc,
                 is_admin_mode: isAdminMode, 
-                nota: notaInicial.trim()
-            });
+                nota: notaInicial.trim(),
+                ...(reservaRef.current ? { reserva_token: reservaRef.current } : {})
+            }, { idempotencyKey: envioRef.current });
+            reservaRef.current = null;
+            envioRef.current = null;
             await Swal.fire('Cita confirmada', 'La cita ha sido agendada con exito.', 'success');
             if (preselectedSlot?.returnToAgenda) {
                 navigate('/dashboard/admin/agenda', { state: { restoreAgenda: preselectedSlot.restoreAgenda || null } });
@@ -488,6 +531,8 @@ const NuevaCita = ({ adminSelectedPatientId = null, isAdminMode = false, presele
                 navigate(adminSelectedPatientId ? '/dashboard/admin/citas' : '/dashboard/citas');
             }
         } catch (error) {
+            // Si el servidor alcanzo a responder, el siguiente intento es un envio nuevo
+            if (error?.response) envioRef.current = null;
             const mensajeError = getApiErrorMessage(error, 'No se pudo agendar la cita. Intente nuevamente.');
             Swal.fire({ icon: 'error', title: 'Error', text: mensajeError });
         } finally { 
@@ -659,7 +704,7 @@ const NuevaCita = ({ adminSelectedPatientId = null, isAdminMode = false, presele
                         {slots.length > 0 ? (
                             <div className="grid grid-cols-3 sm:grid-cols-4 md:grid-cols-6 gap-3">
                                 {slots.map(h => (
-                                    <button key={h} onClick={() => { setSelection({ ...selection, hora: h }); nextStep(); }} className={`py-2 px-1 rounded-lg text-sm font-bold border transition-all duration-200 ${selection.hora === h ? 'bg-blue-600 text-white shadow-lg transform scale-105' : 'bg-white text-gray-600 border-gray-200 hover:border-blue-400 hover:text-blue-600 hover:shadow-md'}`}>{h}</button>
+                                    <button key={h} onClick={() => seleccionarHora(h)} className={`py-2 px-1 rounded-lg text-sm font-bold border transition-all duration-200 ${selection.hora === h ? 'bg-blue-600 text-white shadow-lg transform scale-105' : 'bg-white text-gray-600 border-gray-200 hover:border-blue-400 hover:text-blue-600 hover:shadow-md'}`}>{h}</button>
                                 ))}
                             </div>
                         ) : (
@@ -705,6 +750,7 @@ const NuevaCita = ({ adminSelectedPatientId = null, isAdminMode = false, presele
             <button onClick={() => {
                 if(preselectedSlot) navigate('/dashboard/admin/agenda', { state: { restoreAgenda: preselectedSlot.restoreAgenda || null } });
                 else { 
+                    liberarReserva();
                     setSelection({ servicio: null, profesional: null, sede: null, fecha: '', hora: '' }); 
                     setNotaInicial('');
                     setStep(dependientes.length > 0 && !isAdminMode ? 0 : 1); 
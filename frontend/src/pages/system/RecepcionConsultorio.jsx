@@ -50,7 +50,7 @@ const RecepcionConsultorio = () => {
         try {
             const data = await citasService.getAll({
                 fecha: selectedDate,
-                ordering: 'hora_inicio'
+                ordering: 'fecha,hora_inicio'
             });
             setCitas(data);
         } catch (error) {
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { citasService } from '../../services/citasService';
 import { FaHospital, FaVolumeUp, FaUserClock, FaUserMd, FaMousePointer } from 'react-icons/fa';
 
@@ -58,59 +58,72 @@ const SalaEsperaPantalla = () => {
         window.speechSynthesis.getVoices(); // warm-up
     }, [audioActivado]);
 
-    // 2. Carga de Datos y Polling
-    useEffect(() => {
-        const cargarLlamados = async () => {
-            try {
-                // CORRECCIÓN 1: Obtener fecha local exacta (Evita desfase UTC)
-                const hoyLocal = new Date();
-                const offset = hoyLocal.getTimezoneOffset();
-                const fechaQuery = new Date(hoyLocal.getTime() - (offset * 60 * 1000)).toISOString().split('T')[0];
-
-                const data = await citasService.getAll({ fecha: fechaQuery });
-                const lista = Array.isArray(data) ? data : (data.results || []);
-
-                console.log(`📺 Pantalla Sala - Fecha: ${fechaQuery} - Citas recibidas:`, lista.length);
-
-                const llamadosOrdenados = lista
-                    .filter(c => c.estado === 'LLAMADO')
-                    .sort((a, b) => new Date(b.updated_at) - new Date(a.updated_at));
-
-                const actual = llamadosOrdenados[0];
-
-                const enEspera = lista
-                    .filter(c => ['EN_SALA', 'LLAMADO'].includes(c.estado));
-
-                setCitas(enEspera);
+    // 2. Carga de Datos (long-poll: el servidor responde solo cuando cambia la sala)
+    const ultimoLlamadoRef = useRef(null);
+    const audioActivadoRef = useRef(audioActivado);
+    useEffect(() => { audioActivadoRef.current = audioActivado; }, [audioActivado]);
 
-                if (actual) {
-                    // ✅ CLAVE PARA RE-LLAMADO:
-                    // comparar por id + updated_at para detectar un "nuevo evento"
-                    const actualKey = `${actual.id}-${actual.updated_at || ''}`;
-                    const ultimoKey = ultimoLlamado ? `${ultimoLlamado.id}-${ultimoLlamado.updated_at || ''}` : null;
+    useEffect(() => {
+        let activo = true;
+        let version = null;
+
+        const procesar = (lista) => {
+            const llamadosOrdenados = lista
+                .filter(c => c.estado === 'LLAMADO')
+                .sort((a, b) => new Date(b.updated_at) - new Date(a.updated_at));
+
+            const actual = llamadosOrdenados[0];
+
+            setCitas(lista);
+
+            if (actual) {
+                // ✅ CLAVE PARA RE-LLAMADO:
+                // comparar por id + updated_at para detectar un "nuevo evento"
+                const ultimo = ultimoLlamadoRef.current;
+                const actualKey = `${actual.id}-${actual.updated_at || ''}`;
+                const ultimoKey = ultimo ? `${ultimo.id}-${ultimo.updated_at || ''}` : null;
+
+                if (!ultimo || ultimoKey !== actualKey) {
+                    console.log("🔔 ¡NUEVO LLAMADO DETECTADO!", actual.paciente_nombre, actual.updated_at);
+                    hablar(actual);
+                    ultimoLlamadoRef.current = actual;
+                    setUltimoLlamado(actual);
+                }
+            }
+        };
 
-                    if (!ultimoLlamado || ultimoKey !== actualKey) {
-                        console.log("🔔 ¡NUEVO LLAMADO DETECTADO!", actual.paciente_nombre, actual.updated_at);
-                        hablar(actual);
-                        setUltimoLlamado(actual);
+        const escucharSala = async () => {
+            while (activo) {
+                try {
+                    // CORRECCIÓN 1: Obtener fecha local exacta (Evita desfase UTC)
+                    const hoyLocal = new Date();
+                    const offset = hoyLocal.getTimezoneOffset();
+                    const fechaQuery = new Date(hoyLocal.getTime() - (offset * 60 * 1000)).toISOString().split('T')[0];
+
+                    const data = await citasService.getSala({ fecha: fechaQuery, version });
+                    if (!activo) return;
+                    if (data) {
+                        version = data.version;
+                        procesar(data.citas);
                     }
-                }
-            } catch (error) {
-                console.error("❌ Error de conexión en sala:", error);
-                if (error.response?.status === 401 || error.response?.status === 403) {
-                    window.location.reload();
+                } catch (error) {
+                    console.error("❌ Error de conexión en sala:", error);
+                    if (error.response?.status === 401 || error.response?.status === 403) {
+                        window.location.reload();
+                        return;
+                    }
+                    await new Promise(resolve => setTimeout(resolve, 3000));
                 }
             }
         };
 
-        cargarLlamados();
-        const interval = setInterval(cargarLlamados, 1500);
-        return () => clearInterval(interval);
-    }, [ultimoLlamado, audioActivado]);
+        escucharSala();
+        return () => { activo = false; };
+    }, []);
 
     // 3. Síntesis de Voz
     const hablar = (cita) => {
-        if (!window.speechSynthesis || !audioActivado) return;
+        if (!window.speechSynthesis || !audioActivadoRef.current) return;
 
         window.speechSynthesis.cancel();
 
@@ -60,5 +60,22 @@ export const agendaService = {
 
         const response = await api.get('/agenda/slots/', { params });
         return response.data;
+    },
+
+    // Slots de varios profesionales y días en una sola llamada (vista semanal)
+    // Respuesta: { profesionales: { [profesionalId]: { 'YYYY-MM-DD': ['08:00', ...] } } }
+    getSlotsRango: async ({ profesionalIds, fechaInicio, fechaFin, duracion = 20, servicioId = null, lugarId = null }) => {
+        const params = {
+            profesional_ids: profesionalIds.join(','),
+            fecha_inicio: fechaInicio,
+            fecha_fin: fechaFin,
+            duracion_minutos: duracion
+        };
+
+        if (servicioId) params.servicio_id = servicioId;
+        if (lugarId) params.lugar_id = lugarId;
+
+        const response = await api.get('/agenda/slots/rango/', { params });
+        return response.data;
     }
 };
\ No newline at end of file
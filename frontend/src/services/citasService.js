@@ -1,12 +1,37 @@
 import api from '../api/axiosConfig'; // <--- Usamos esta instancia configurada
 
 const BASE_URL = '/citas'; 
+const MAX_PAGE_SIZE = 200;
+
+// Cursor de la página siguiente a partir del link `next` del listado (null si no hay más)
+const cursorDe = (next) => (next ? new URL(next).searchParams.get('cursor') : null);
+
+// El listado viene paginado por cursor ({ next, results }); se sigue el cursor hasta la última página.
+// Solo para vistas que necesitan el conjunto completo (la agenda de un día); los listados usan getPage.
+const getAllPages = async (params = {}) => {
+    const results = [];
+    let cursor = null;
+    do {
+        const response = await api.get(`${BASE_URL}/`, {
+            params: { page_size: MAX_PAGE_SIZE, ...params, ...(cursor ? { cursor } : {}) }
+        });
+        const data = response.data;
+        if (Array.isArray(data)) return data;
+
+        results.push(...data.results);
+        cursor = cursorDe(data.next);
+    } while (cursor);
+    return results;
+};
 
 export const citasService = {
-    // Obtener citas con filtros (fecha, estado, paciente_id, etc.)
-    getAll: async (params = {}) => {
-        const response = await api.get(`${BASE_URL}/`, { params });
-        return response.data;
+    // Todas las citas que cumplan los filtros (recorre todas las páginas): solo para rangos acotados
+    getAll: async (params = {}) => getAllPages(params),
+
+    // Una sola página: { results, cursor }. Para la siguiente ("Cargar más"), pasar ese cursor; null = no hay más.
+    getPage: async (params = {}, cursor = null) => {
+        const response = await api.get(`${BASE_URL}/`, { params: { ...params, ...(cursor ? { cursor } : {}) } });
+        return { results: response.data.results, cursor: cursorDe(response.data.next) };
     },
     
     getById: async (id) => {
@@ -14,8 +39,11 @@ export const citasService = {
         return response.data;
     },
 
-    create: async (citaData) => {
-        const response = await api.post(`${BASE_URL}/`, citaData);
+    // Con idempotencyKey, los reintentos del mismo envío reciben la respuesta original (sin duplicar la cita)
+    create: async (citaData, { idempotencyKey } = {}) => {
+        const response = await api.post(`${BASE_URL}/`, citaData, {
+            headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {}
+        });
         return response.data;
     },
 
@@ -24,6 +52,53 @@ export const citasService = {
         return response.data;
     },
 
+    // Cambios desde una marca de agua: { watermark, ultimo_id, completo, cambios, eliminados } o null (304, sin cambios).
+    // Si la marca venció (410) se hace la carga completa y se devuelve con inicial: true.
+    getCambios: async (params = {}, updatedAfter = null, afterId = null) => {
+        const response = await api.get(`${BASE_URL}/cambios/`, {
+            params: {
+                ...params,
+                ...(updatedAfter ? { updated_after: updatedAfter } : {}),
+                ...(updatedAfter && afterId ? { after_id: afterId } : {})
+            },
+            validateStatus: (status) => status === 200 || status === 304 || status === 410
+        });
+        if (response.status === 410) {
+            return { ...(await citasService.getCambios(params)), inicial: true };
+        }
+        return response.status === 304 ? null : response.data;
+    },
+
+    // Sala de espera (long-poll): { version, citas } o null si no hubo cambios en `espera` segundos
+    getSala: async ({ fecha, lugar_id, version } = {}) => {
+        const response = await api.get(`${BASE_URL}/sala/`, {
+            params: { fecha, ...(lugar_id ? { lugar_id } : {}), ...(version != null ? { version } : {}) }
+        });
+        return response.status === 204 ? null : response.data;
+    },
+
+    // Hold temporal del horario elegido en el asistente: { token, hora_inicio, hora_fin, expira_en } (409 si ya lo tiene otro)
+    tomarReserva: async ({ profesional_id, fecha, hora_inicio, servicio_id, token } = {}) => {
+        const response = await api.post(`${BASE_URL}/reservas/`, {
+            profesional_id, fecha, hora_inicio, servicio_id, ...(token ? { token } : {})
+        });
+        return response.data;
+    },
+
+    liberarReserva: async (token) => {
+        if (!token) return;
+        await api.delete(`${BASE_URL}/reservas/`, { params: { token } });
+    },
+
+    // Exportación en el servidor (solo admin): devuelve un Blob csv/xlsx con los filtros del listado
+    exportar: async (params = {}, formato = 'csv') => {
+        const response = await api.get(`${BASE_URL}/exportar/`, {
+            params: { ...params, formato },
+            responseType: 'blob',
+        });
+        return response.data;
+    },
+
     getReporteInasistencias: async () => {
         const response = await api.get('/citas/reportes/inasistencias/');
         return response.data;
@@ -36,13 +111,10 @@ export const citasService = {
 
     getHistorialPaciente: async (pacienteId) => {
         try {
-            const response = await api.get(`${BASE_URL}/`, { 
-                params: { 
-                    paciente_id: pacienteId,
-                    ordering: '-fecha,-hora_inicio' 
-                } 
+            return await getAllPages({
+                paciente_id: pacienteId,
+                ordering: '-fecha,-hora_inicio'
             });
-            return response.data;
         } catch (error) {
             console.error("Error obteniendo historial", error);
             return [];
@@ -0,0 +1,46 @@
+#!/bin/sh
+# Verifica el preflight CORS del SPA contra el gateway.
+#
+# Uso: gateway/check_cors.sh [URL_DEL_GATEWAY]
+# Sin URL levanta un nginx temporal con gateway/nginx.conf (los upstreams
+# apuntan a 127.0.0.1: el preflight lo responde nginx sin llegar a ellos).
+
+set -eu
+
+ORIGEN="http://localhost:5173"
+URL="${1:-}"
+
+if [ -z "$URL" ]; then
+    HOSTS=""
+    for h in auth-ms patients-ms professionals-ms schedule-ms appointments-ms notification-ms ia-ms portal-ms; do
+        HOSTS="$HOSTS --add-host $h:127.0.0.1"
+    done
+    # shellcheck disable=SC2086
+    docker run -d --rm --name timetrack_cors_check $HOSTS -p 18080:80 \
+        -v "$(pwd)/gateway/nginx.conf:/etc/nginx/nginx.conf:ro" nginx:latest >/dev/null
+    trap 'docker stop timetrack_cors_check >/dev/null' EXIT
+    URL="http://localhost:18080"
+    for _ in 1 2 3 4 5 6 7 8 9 10; do
+        curl -s -o /dev/null "$URL/" && break
+        sleep 1
+    done
+fi
+
+# Lo que manda el navegador antes del POST de NuevaCita.jsx
+HEADERS=$(curl -s -o /dev/null -D - -X OPTIONS "$URL/api/v1/citas/" \
+    -H "Origin: $ORIGEN" \
+    -H "Access-Control-Request-Method: POST" \
+    -H "Access-Control-Request-Headers: authorization,content-type,idempotency-key")
+
+falla() {
+    echo "❌ Preflight CORS: $1"
+    echo "$HEADERS"
+    exit 1
+}
+
+echo "$HEADERS" | grep -qE "^HTTP/[0-9.]+ 204" || falla "el OPTIONS no responde 204"
+echo "$HEADERS" | grep -qi "^access-control-allow-origin: $ORIGEN" || falla "falta Access-Control-Allow-Origin"
+echo "$HEADERS" | grep -qi "^access-control-allow-headers:.*idempotency-key" || falla "Idempotency-Key no está permitido"
+echo "$HEADERS" | grep -qi "^access-control-expose-headers:.*idempotent-replayed" || falla "Idempotent-Replayed no está expuesto"
+
+echo "✅ Preflight CORS del gateway OK"
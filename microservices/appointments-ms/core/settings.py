@@ -73,6 +73,59 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Caché compartida (Redis del docker-compose). Sin REDIS_URL se usa memoria local.
+REDIS_URL = env("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "appointments",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Segundos que vive cada tipo de dato de referencia en la caché compartida
+# (se invalida antes cuando patients-ms/professionals-ms avisan de un cambio)
+REFERENCIAS_TTL = {
+    "pacientes": env.int("REFERENCIAS_TTL_PACIENTES", default=600),
+    "profesionales": env.int("REFERENCIAS_TTL_PROFESIONALES", default=3600),
+    "servicios": env.int("REFERENCIAS_TTL_SERVICIOS", default=3600),
+    "lugares": env.int("REFERENCIAS_TTL_LUGARES", default=86400),
+}
+# LRU en memoria de cada proceso: entradas máximas y segundos que vive una entrada
+REFERENCIAS_LRU_MAX = env.int("REFERENCIAS_LRU_MAX", default=5000)
+REFERENCIAS_LRU_TTL = env.int("REFERENCIAS_LRU_TTL", default=60)
+
+# Segundos que un horario queda reservado (hold) mientras el paciente confirma la cita
+RESERVA_TTL = env.int("RESERVA_TTL", default=180)
+
+# Segundos que se guarda la respuesta de un POST de cita por Idempotency-Key
+IDEMPOTENCIA_TTL = env.int("IDEMPOTENCIA_TTL", default=3600)
+
+# Filas por INSERT al escribir HistoricoCita (un bulk_create por transacción, ver historial.py)
+HISTORIAL_LOTE = env.int("HISTORIAL_LOTE", default=200)
+
+# Días que se guardan las lápidas de citas borradas para "cambios" (comando purgar_eliminadas)
+CAMBIOS_RETENCION_DIAS = env.int("CAMBIOS_RETENCION_DIAS", default=7)
+
+# Citas por bloque al exportar (lectura con cursor y enriquecimiento de nombres)
+EXPORTACION_BLOQUE = env.int("EXPORTACION_BLOQUE", default=1000)
+# El XLSX se arma completo antes del primer byte: tope de filas (rangos largos, en CSV)
+EXPORTACION_XLSX_MAX_FILAS = env.int("EXPORTACION_XLSX_MAX_FILAS", default=20000)
+
+# Plazo común (segundos) para enriquecer el listado con pacientes/profesionales/servicios/lugares
+ENRIQUECIMIENTO_PLAZO_SEGUNDOS = env.float("ENRIQUECIMIENTO_PLAZO_SEGUNDOS", default=2.0)
+
+# Paginación del listado de citas (page_size por defecto y máximo aceptado en ?page_size=)
+CITAS_PAGE_SIZE = env.int("CITAS_PAGE_SIZE", default=50)
+CITAS_MAX_PAGE_SIZE = env.int("CITAS_MAX_PAGE_SIZE", default=200)
+
 JWT_SIGNING_KEY = env("JWT_SIGNING_KEY", default=SECRET_KEY)
 
 SIMPLE_JWT = {
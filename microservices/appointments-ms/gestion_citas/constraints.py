@@ -0,0 +1,31 @@
+"""
+Restricción de exclusión (PostgreSQL) que impide dos citas activas del mismo
+profesional con horarios cruzados, directamente en la base de datos.
+
+En PostgreSQL la creación de citas no consulta cruces del profesional: inserta
+y traduce la violación al 409 de siempre. En otros motores (SQLite en pruebas
+locales) se mantiene la consulta previa.
+"""
+
+from django.db import connections
+
+CITA_SIN_CRUCES = "gestion_citas_cita_sin_cruces"
+
+# Estados que ocupan el horario del profesional
+ESTADOS_BLOQUEANTES = ("PENDIENTE", "ACEPTADA", "EN_SALA", "LLAMADO")
+
+MENSAJE_CRUCE_MEDICO = "Horario no disponible (Cruce médico)."
+
+
+def usa_restricciones_exclusion(using="default"):
+    return connections[using].vendor == "postgresql"
+
+
+def es_violacion(error, nombre):
+    """
+    True si el IntegrityError corresponde a la restricción `nombre`.
+    """
+    diag = getattr(getattr(error, "__cause__", None), "diag", None)
+    if diag is not None and getattr(diag, "constraint_name", None):
+        return diag.constraint_name == nombre
+    return nombre in str(error)
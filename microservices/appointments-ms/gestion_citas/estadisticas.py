@@ -0,0 +1,208 @@
+"""
+Estadísticas diarias de citas (EstadisticaDiaria) para tableros y reportes.
+
+- actualizar() / actualizar_lote(): al crear, editar, borrar o cambiar de
+  estado citas se resta una de la fila anterior y se suma a la nueva, con
+  UPDATE ... SET total = total + n (sin recontar Cita).
+- reconstruir(): rehace las filas de un rango (o todas) desde Cita
+  (comando reconstruir_estadisticas).
+- resumen(): totales, tasa de inasistencia, cancelaciones y anticipación
+  promedio de un rango, leyendo solo EstadisticaDiaria.
+"""
+
+import calendar
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Cita, EstadisticaDiaria
+
+ESTADO_INASISTENCIA = "NO_ASISTIO"
+ESTADO_REALIZADA = "REALIZADA"
+ESTADO_CANCELADA = "CANCELADA"
+
+# servicio_id / lugar_id sin asignar: 0 en vez de NULL para que la llave sea única
+SIN_ID = 0
+
+CAMPOS_CLAVE = ("fecha", "profesional_id", "servicio_id", "lugar_id", "estado")
+AGRUPACIONES = ("profesional_id", "servicio_id", "lugar_id")
+PERIODOS = ("semana", "mes", "anio")
+
+# Rangos más largos que esto se resumen por mes en la serie
+MAX_DIAS_SERIE_DIARIA = 92
+
+
+def _clave(cita: Optional[Cita]):
+    if cita is None or not cita.activo:
+        return None
+    return (cita.fecha, cita.profesional_id, cita.servicio_id or SIN_ID, cita.lugar_id or SIN_ID, cita.estado)
+
+
+def _anticipacion(fecha, hora_inicio, creada) -> int:
+    """
+    Minutos entre que se pidió la cita y su inicio (0 si se registró después de empezar).
+    """
+    if creada is None:
+        return 0
+    inicio = timezone.make_aware(datetime.combine(fecha, hora_inicio))
+    return max(0, int((inicio - creada).total_seconds() // 60))
+
+
+def _sumar(clave, total: int, minutos: int):
+    filtro = dict(zip(CAMPOS_CLAVE, clave))
+    actualizadas = EstadisticaDiaria.objects.filter(**filtro).update(
+        total=F("total") + total, anticipacion_min=F("anticipacion_min") + minutos, updated_at=timezone.now()
+    )
+    if actualizadas or total <= 0:
+        return
+    try:
+        with transaction.atomic():
+            EstadisticaDiaria.objects.create(**filtro, total=total, anticipacion_min=minutos)
+    except IntegrityError:
+        # Otro request creó la fila primero
+        _sumar(clave, total, minutos)
+
+
+def actualizar_lote(pares):
+    """
+    Aplica [(anterior, actual), ...]; anterior=None al crear, actual=None al borrar.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for anterior, actual in pares:
+        antes, ahora = _clave(anterior), _clave(actual)
+        m_antes = _anticipacion(anterior.fecha, anterior.hora_inicio, anterior.created_at) if antes else 0
+        m_ahora = _anticipacion(actual.fecha, actual.hora_inicio, actual.created_at) if ahora else 0
+        if (antes, m_antes) == (ahora, m_ahora):
+            continue
+        if antes:
+            deltas[antes][0] -= 1
+            deltas[antes][1] -= m_antes
+        if ahora:
+            deltas[ahora][0] += 1
+            deltas[ahora][1] += m_ahora
+    # Mismo orden de filas en todas las transacciones: sin bloqueos cruzados
+    for clave in sorted(deltas):
+        total, minutos = deltas[clave]
+        if total or minutos:
+            _sumar(clave, total, minutos)
+
+
+def actualizar(anterior: Optional[Cita], actual: Optional[Cita]):
+    actualizar_lote([(anterior, actual)])
+
+
+def reconstruir(desde: Optional[date] = None, hasta: Optional[date] = None, lote: int = 1000) -> int:
+    """
+    Rehace las filas del rango [desde, hasta] (todo si no se indica).
+    Recorre Cita ordenada por fecha y guarda día por día, sin cargar el rango en memoria.
+    """
+    citas = Cita.objects.filter(activo=True)
+    filas = EstadisticaDiaria.objects.all()
+    if desde:
+        citas, filas = citas.filter(fecha__gte=desde), filas.filter(fecha__gte=desde)
+    if hasta:
+        citas, filas = citas.filter(fecha__lte=hasta), filas.filter(fecha__lte=hasta)
+    citas = citas.order_by("fecha").values(*CAMPOS_CLAVE, "hora_inicio", "created_at")
+
+    creadas = 0
+    dia, acumulado = None, defaultdict(lambda: [0, 0])
+
+    def volcar():
+        EstadisticaDiaria.objects.bulk_create(
+            [
+                EstadisticaDiaria(**dict(zip(CAMPOS_CLAVE, clave)), total=total, anticipacion_min=minutos)
+                for clave, (total, minutos) in acumulado.items()
+            ],
+            batch_size=lote,
+        )
+        return len(acumulado)
+
+    with transaction.atomic():
+        filas.delete()
+        for c in citas.iterator(chunk_size=lote):
+            if c["fecha"] != dia:
+                creadas += volcar()
+                dia, acumulado = c["fecha"], defaultdict(lambda: [0, 0])
+            clave = (c["fecha"], c["profesional_id"], c["servicio_id"] or SIN_ID, c["lugar_id"] or SIN_ID, c["estado"])
+            acumulado[clave][0] += 1
+            acumulado[clave][1] += _anticipacion(c["fecha"], c["hora_inicio"], c["created_at"])
+        creadas += volcar()
+    return creadas
+
+
+def _metricas(por_estado: dict, minutos: int) -> dict:
+    total = sum(por_estado.values())
+    inasistencias = por_estado.get(ESTADO_INASISTENCIA, 0)
+    # Sobre las citas que llegaron a su hora: atendidas + inasistencias
+    esperadas = inasistencias + por_estado.get(ESTADO_REALIZADA, 0)
+    return {
+        "total": total,
+        "por_estado": por_estado,
+        "inasistencias": inasistencias,
+        "cancelaciones": por_estado.get(ESTADO_CANCELADA, 0),
+        "tasa_inasistencia": round(inasistencias / esperadas, 4) if esperadas else None,
+        "anticipacion_promedio_min": round(minutos / total, 1) if total else None,
+    }
+
+
+def _metricas_de(filas) -> dict:
+    """
+    Métricas de filas agregadas (estado, total, minutos).
+    """
+    por_estado = defaultdict(int)
+    minutos = 0
+    for f in filas:
+        if f["total"]:
+            por_estado[f["estado"]] += f["total"]
+        minutos += f["minutos"] or 0
+    return _metricas(dict(por_estado), minutos)
+
+
+def _agrupar(filas, campo) -> dict:
+    grupos = defaultdict(list)
+    for f in filas:
+        grupos[f[campo]].append(f)
+    return {valor: _metricas_de(grupos[valor]) for valor in sorted(grupos)}
+
+
+def rango(periodo: str, fecha: date):
+    """
+    (desde, hasta) de la semana (lunes a domingo), el mes o el año que contiene `fecha`.
+    """
+    if periodo == "semana":
+        desde = fecha - timedelta(days=fecha.weekday())
+        return desde, desde + timedelta(days=6)
+    if periodo == "mes":
+        return fecha.replace(day=1), fecha.replace(day=calendar.monthrange(fecha.year, fecha.month)[1])
+    return date(fecha.year, 1, 1), date(fecha.year, 12, 31)
+
+
+def resumen(desde: date, hasta: date, *, serie: str = "dia", agrupar: Optional[str] = None, **filtros) -> dict:
+    """
+    Métricas del rango con su serie por día (o por mes) y, opcionalmente,
+    desglose por profesional_id / servicio_id / lugar_id.
+    filtros: profesional_id, servicio_id, lugar_id (igualdad).
+    """
+    filas = EstadisticaDiaria.objects.filter(fecha__gte=desde, fecha__lte=hasta, **filtros).exclude(total=0)
+    sumas = {"total": Sum("total"), "minutos": Sum("anticipacion_min")}
+
+    periodo = TruncMonth("fecha") if serie == "mes" else F("fecha")
+    por_periodo = list(filas.annotate(periodo=periodo).values("periodo", "estado").annotate(**sumas).order_by())
+
+    datos = {
+        "desde": desde.isoformat(),
+        "hasta": hasta.isoformat(),
+        **_metricas_de(por_periodo),
+        "serie": [{"periodo": p.isoformat(), **m} for p, m in _agrupar(por_periodo, "periodo").items()],
+    }
+    if agrupar:
+        datos["grupos"] = [
+            {agrupar: valor, **m}
+            for valor, m in _agrupar(filas.values(agrupar, "estado").annotate(**sumas).order_by(), agrupar).items()
+        ]
+    return datos
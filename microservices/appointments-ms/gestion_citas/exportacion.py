@@ -0,0 +1,150 @@
+"""
+Exportación de citas a CSV/XLSX en streaming.
+
+Las citas se leen con .iterator(chunk_size) (cursor del lado del servidor
+en Postgres) y se enriquecen por bloques con resolver_referencias, así que
+la memoria no depende del rango de fechas: solo hay un bloque en vuelo.
+El CSV es el camino de streaming: el primer byte sale con el primer bloque.
+El XLSX no se puede enviar hasta cerrar el libro (write_only de openpyxl a
+un temporal en disco, luego por trozos), así que antes del primer byte se
+arma completo; por eso solo se permite hasta EXPORTACION_XLSX_MAX_FILAS
+filas, para quedar bien por debajo del proxy_read_timeout del gateway.
+
+Los textos que empiezan con =, +, -, @ (o tab/retorno) llevan un apóstrofo
+adelante para que Excel no los evalúe como fórmulas.
+"""
+
+import csv
+import tempfile
+from itertools import islice
+
+from django.conf import settings
+
+CAMPOS = (
+    "id",
+    "fecha",
+    "hora_inicio",
+    "hora_fin",
+    "estado",
+    "paciente_id",
+    "profesional_id",
+    "servicio_id",
+    "lugar_id",
+    "nota",
+    "nota_interna",
+)
+
+CABECERAS = [
+    "ID",
+    "Fecha",
+    "Hora inicio",
+    "Hora fin",
+    "Estado",
+    "Documento paciente",
+    "Paciente",
+    "Profesional",
+    "Servicio",
+    "Sede",
+    "Nota",
+    "Nota interna",
+]
+
+FORMATOS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+# Bytes por trozo al enviar el XLSX ya armado
+TROZO_XLSX = 64 * 1024
+
+# Primer carácter con el que Excel/LibreOffice interpretan una celda como fórmula
+INICIO_FORMULA = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _bloque() -> int:
+    return getattr(settings, "EXPORTACION_BLOQUE", 1000)
+
+
+def max_filas_xlsx() -> int:
+    return getattr(settings, "EXPORTACION_XLSX_MAX_FILAS", 20000)
+
+
+def _texto(valor) -> str:
+    """
+    Texto seguro para una celda: neutraliza la inyección de fórmulas.
+    """
+    valor = valor or ""
+    return "'" + valor if valor.startswith(INICIO_FORMULA) else valor
+
+
+def filas(queryset):
+    """
+    Genera las filas de la exportación (listas en el orden de CABECERAS).
+    """
+    from .views import resolver_referencias
+
+    citas = queryset.values(*CAMPOS).iterator(chunk_size=_bloque())
+    while True:
+        bloque = list(islice(citas, _bloque()))
+        if not bloque:
+            return
+        datos, _ = resolver_referencias(
+            {
+                "pacientes": {c["paciente_id"] for c in bloque},
+                "profesionales": {c["profesional_id"] for c in bloque},
+                "servicios": {c["servicio_id"] for c in bloque},
+                "lugares": {c["lugar_id"] for c in bloque},
+            }
+        )
+        for c in bloque:
+            paciente = datos["pacientes"].get(str(c["paciente_id"])) or {}
+            yield [
+                c["id"],
+                c["fecha"],
+                c["hora_inicio"],
+                c["hora_fin"],
+                c["estado"],
+                _texto(str(paciente.get("numero_documento") or "N/A")),
+                _texto(paciente.get("nombre_completo") or "DESCONOCIDO"),
+                _texto((datos["profesionales"].get(str(c["profesional_id"])) or {}).get("nombre", "No asignado")),
+                _texto((datos["servicios"].get(str(c["servicio_id"])) or {}).get("nombre", "No especificado")),
+                _texto((datos["lugares"].get(str(c["lugar_id"])) or {}).get("nombre", "Sede Principal")),
+                _texto(c["nota"]),
+                _texto(c["nota_interna"]),
+            ]
+
+
+class _Eco:
+    """
+    "Archivo" que devuelve lo escrito en vez de guardarlo (csv.writer por línea).
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def csv_stream(generador):
+    writer = csv.writer(_Eco())
+    # BOM: Excel abre el CSV como UTF-8 (tildes y ñ)
+    yield "\ufeff" + writer.writerow(CABECERAS)
+    for fila in generador:
+        yield writer.writerow(fila)
+
+
+def xlsx_stream(generador):
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet("Citas")
+    hoja.append(CABECERAS)
+    for fila in generador:
+        hoja.append(fila)
+
+    with tempfile.TemporaryFile() as archivo:
+        libro.save(archivo)
+        archivo.seek(0)
+        while True:
+            trozo = archivo.read(TROZO_XLSX)
+            if not trozo:
+                return
+            yield trozo
@@ -0,0 +1,123 @@
+"""
+Escritura de HistoricoCita (solo inserciones, una por lote de cambios).
+
+Cada llamada a registrar() deja las instantáneas de sus citas en un solo
+bulk_create que corre al confirmar la transacción (on_commit): nada queda
+en memoria del proceso, así que un SIGTERM o un worker inactivo no pierden
+filas. Los nombres (paciente, profesional, servicio, sede) se toman solo
+de la caché de referencias, sin llamadas HTTP; los que falten quedan en
+NULL y los completa después completar_nombres() (comando completar_historial).
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import HistoricoCita
+from .utils import reference_cache
+
+logger = logging.getLogger(__name__)
+
+# Entidad de la caché de referencias -> (campo id, campo nombre en HistoricoCita, clave en los datos)
+NOMBRES = {
+    "pacientes": ("paciente_id", "nombre_paciente", "nombre_completo"),
+    "profesionales": ("profesional_id", "nombre_profesional", "nombre"),
+    "servicios": ("servicio_id", "nombre_servicio", "nombre"),
+    "lugares": ("lugar_id", "nombre_lugar", "nombre"),
+}
+
+
+def _lote() -> int:
+    return getattr(settings, "HISTORIAL_LOTE", 200)
+
+
+def _instantanea(cita, usuario_id=None) -> dict:
+    return {
+        "cita_original_id": cita.pk,
+        "profesional_id": cita.profesional_id,
+        "paciente_id": cita.paciente_id,
+        "servicio_id": cita.servicio_id,
+        "lugar_id": cita.lugar_id,
+        "fecha_cita": cita.fecha,
+        "hora_inicio": cita.hora_inicio,
+        "estado": cita.estado,
+        "usuario_responsable": str(usuario_id) if usuario_id is not None else None,
+        "fecha_registro": timezone.now(),
+    }
+
+
+def registrar(*citas, usuario_id=None):
+    """
+    Guarda el estado actual de las citas cuando (y solo si) la transacción confirma.
+    """
+    filas = [_instantanea(c, usuario_id) for c in citas if c is not None]
+    if filas:
+        transaction.on_commit(lambda: _insertar(filas))
+
+
+def _insertar(filas):
+    try:
+        nombres = _nombres_en_cache(filas)
+        HistoricoCita.objects.bulk_create(
+            [
+                HistoricoCita(
+                    **fila,
+                    **{
+                        campo: (nombres[entidad].get(str(fila[campo_id])) or {}).get(clave)
+                        for entidad, (campo_id, campo, clave) in NOMBRES.items()
+                    },
+                )
+                for fila in filas
+            ],
+            batch_size=_lote(),
+        )
+    except Exception:
+        logger.exception("[historial] No se pudo escribir el lote (%s filas)", len(filas))
+
+
+def _nombres_en_cache(filas):
+    versiones = reference_cache.versiones()
+    return {
+        entidad: reference_cache.obtener(
+            entidad, {str(f[campo_id]) for f in filas if f[campo_id] is not None}, versiones[entidad]
+        )[0]
+        for entidad, (campo_id, _, _) in NOMBRES.items()
+    }
+
+
+def completar_nombres(lote: int = 500) -> int:
+    """
+    Rellena los nombres que no estaban en caché al insertar (con los microservicios).
+    Devuelve las filas actualizadas; las que siguen sin nombre no se reintentan en la misma corrida.
+    """
+    from .views import resolver_referencias
+
+    sin_nombre = Q()
+    for campo_id, campo, _ in NOMBRES.values():
+        sin_nombre |= Q(**{f"{campo}__isnull": True, f"{campo_id}__isnull": False})
+    pendientes = HistoricoCita.objects.filter(sin_nombre).order_by("id")
+
+    actualizadas, ultimo_id = 0, 0
+    while True:
+        filas = list(pendientes.filter(id__gt=ultimo_id)[:lote])
+        if not filas:
+            return actualizadas
+        ultimo_id = filas[-1].id
+        datos, _ = resolver_referencias(
+            {entidad: {getattr(f, campo_id) for f in filas} for entidad, (campo_id, _, _) in NOMBRES.items()}
+        )
+        cambiadas = []
+        for fila in filas:
+            cambio = False
+            for entidad, (campo_id, campo, clave) in NOMBRES.items():
+                nombre = (datos[entidad].get(str(getattr(fila, campo_id))) or {}).get(clave)
+                if getattr(fila, campo) is None and nombre:
+                    setattr(fila, campo, nombre)
+                    cambio = True
+            if cambio:
+                cambiadas.append(fila)
+        HistoricoCita.objects.bulk_update(cambiadas, [campo for _, campo, _ in NOMBRES.values()])
+        actualizadas += len(cambiadas)
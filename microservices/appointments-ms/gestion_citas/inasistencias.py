@@ -0,0 +1,104 @@
+"""
+Contadores de inasistencias por paciente (ResumenInasistencias).
+
+- registrar(): una cita pasó a NO_ASISTIO; suma uno con un UPDATE.
+- recalcular(): una cita salió de NO_ASISTIO (o se borró/movió), o hubo un
+  cambio masivo; se recuentan solo esos pacientes, sobre el índice de paciente_id.
+- reconstruir(): backfill completo (comando reconstruir_inasistencias).
+"""
+
+from datetime import date
+from typing import Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Max, Value
+from django.db.models.functions import Greatest
+
+from .models import Cita, ResumenInasistencias
+
+ESTADO_INASISTENCIA = "NO_ASISTIO"
+
+
+def registrar(paciente_id, fecha: date):
+    actualizadas = ResumenInasistencias.objects.filter(paciente_id=paciente_id).update(
+        total=F("total") + 1,
+        ultima_falta=Greatest("ultima_falta", Value(fecha, output_field=DateField())),
+    )
+    if actualizadas:
+        return
+    try:
+        with transaction.atomic():
+            ResumenInasistencias.objects.create(paciente_id=paciente_id, total=1, ultima_falta=fecha)
+    except IntegrityError:
+        # Otro request creó la fila primero
+        registrar(paciente_id, fecha)
+
+
+def recalcular(*paciente_ids):
+    """
+    Recuenta los pacientes indicados con un solo agregado y un upsert en lote.
+    """
+    ids = {p for p in paciente_ids if p is not None}
+    if not ids:
+        return
+    filas = [
+        ResumenInasistencias(**datos)
+        for datos in Cita.objects.filter(paciente_id__in=ids, estado=ESTADO_INASISTENCIA)
+        .values("paciente_id")
+        .annotate(total=Count("id"), ultima_falta=Max("fecha"))
+        .order_by()
+    ]
+    if filas:
+        ResumenInasistencias.objects.bulk_create(
+            filas,
+            update_conflicts=True,
+            unique_fields=["paciente_id"],
+            update_fields=["total", "ultima_falta", "updated_at"],
+        )
+    ResumenInasistencias.objects.filter(paciente_id__in=ids - {f.paciente_id for f in filas}).delete()
+
+
+def actualizar(anterior: Optional[Cita], actual: Optional[Cita]):
+    """
+    Ajusta los contadores tras crear (anterior=None), editar o borrar (actual=None) una cita.
+    """
+    estaba = anterior is not None and anterior.estado == ESTADO_INASISTENCIA
+    esta = actual is not None and actual.estado == ESTADO_INASISTENCIA
+    if not estaba and not esta:
+        return
+    if esta and not estaba:
+        registrar(actual.paciente_id, actual.fecha)
+    elif estaba and esta and (anterior.paciente_id, anterior.fecha) == (actual.paciente_id, actual.fecha):
+        return
+    else:
+        recalcular(anterior.paciente_id if anterior else None, actual.paciente_id if actual else None)
+
+
+def contar_desde(paciente_id, fecha_corte: Optional[date] = None) -> int:
+    """
+    Inasistencias del paciente posteriores a fecha_corte (su último desbloqueo).
+    """
+    resumen = ResumenInasistencias.objects.filter(paciente_id=paciente_id).values("total", "ultima_falta").first()
+    if not resumen:
+        return 0
+    if fecha_corte is None:
+        return resumen["total"]
+    if resumen["ultima_falta"] <= fecha_corte:
+        return 0
+    # Desbloqueado y con faltas nuevas: se cuentan solo las posteriores al corte
+    return Cita.objects.filter(paciente_id=paciente_id, estado=ESTADO_INASISTENCIA, fecha__gt=fecha_corte).count()
+
+
+def reconstruir(lote: int = 1000) -> int:
+    filas = (
+        Cita.objects.filter(estado=ESTADO_INASISTENCIA)
+        .values("paciente_id")
+        .annotate(total=Count("id"), ultima_falta=Max("fecha"))
+        .order_by()
+    )
+    with transaction.atomic():
+        ResumenInasistencias.objects.all().delete()
+        creadas = ResumenInasistencias.objects.bulk_create(
+            (ResumenInasistencias(**fila) for fila in filas.iterator()), batch_size=lote
+        )
+    return len(creadas)
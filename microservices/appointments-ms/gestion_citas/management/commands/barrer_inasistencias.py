@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from gestion_citas.transiciones import ESTADO_INASISTENCIA, barrer_inasistencias
+from gestion_citas.utils import config_cache
+from gestion_citas.utils.audit_client import audit_log_lote
+
+
+class Command(BaseCommand):
+    help = "Marca NO_ASISTIO las citas ACEPTADA que ya terminaron (pensado para correr programado al cierre del día)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--gracia", type=int, default=60, help="Minutos tras la hora fin antes de marcar (default 60)."
+        )
+        parser.add_argument("--estado", default="ACEPTADA", help="Estado de origen a barrer (default ACEPTADA).")
+        parser.add_argument("--batch", type=int, default=1000, help="Citas por UPDATE (default 1000).")
+        parser.add_argument("--dry-run", action="store_true", help="Solo cuenta, no modifica.")
+
+    def handle(self, *args, **options):
+        desde = options["estado"]
+        _, workflow = config_cache.obtener()
+        if not workflow.permite(desde, ESTADO_INASISTENCIA):
+            raise CommandError(f"El workflow no permite {desde} -> {ESTADO_INASISTENCIA}.")
+
+        limite = timezone.now() - timedelta(minutes=options["gracia"])
+        filas = barrer_inasistencias(limite, desde=desde, lote=options["batch"], simular=options["dry_run"])
+
+        if not options["dry_run"]:
+            audit_log_lote(
+                [
+                    {
+                        "descripcion": f"STATE_CHANGE Cita #{f['id']}: {desde} -> {ESTADO_INASISTENCIA}",
+                        "modulo": "APPOINTMENTS",
+                        "accion": "STATE_CHANGE",
+                        "recurso": "Cita",
+                        "recurso_id": str(f["id"]),
+                        "metadata": {
+                            "from": desde,
+                            "to": ESTADO_INASISTENCIA,
+                            "paciente_id": f["paciente_id"],
+                            "profesional_id": f["profesional_id"],
+                            "fecha": str(f["fecha"]),
+                            "hora_inicio": str(f["hora_inicio"]),
+                            "origen": "barrer_inasistencias",
+                        },
+                    }
+                    for f in filas
+                ]
+            )
+
+        prefijo = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(f"[barrer_inasistencias] {prefijo}citas={len(filas)}"))
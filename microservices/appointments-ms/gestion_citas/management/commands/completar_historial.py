@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from gestion_citas.historial import completar_nombres
+
+
+class Command(BaseCommand):
+    help = (
+        "Completa los nombres de paciente/profesional/servicio/sede del histórico de citas "
+        "que no estaban en la caché de referencias al registrarse."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=500, help="Filas por consulta a los microservicios.")
+
+    def handle(self, *args, **options):
+        filas = completar_nombres(lote=options["batch"])
+        self.stdout.write(self.style.SUCCESS(f"[completar_historial] listo. filas={filas}"))
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from gestion_citas.models import CitaEliminada
+from gestion_citas.views import CAMBIOS_RETENCION_DIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las lápidas de citas eliminadas más viejas que la retención de 'cambios' "
+        "(los clientes con una marca de agua anterior reciben 410 y recargan todo)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias",
+            type=int,
+            default=CAMBIOS_RETENCION_DIAS,
+            help=f"Días a conservar (default CAMBIOS_RETENCION_DIAS={CAMBIOS_RETENCION_DIAS}).",
+        )
+        parser.add_argument(
+            "--batch", type=int, default=5000, help="Filas por DELETE, para no bloquear la tabla (default 5000)."
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options["dias"])
+        viejas = CitaEliminada.objects.filter(eliminado_en__lt=limite)
+        borradas = 0
+        while True:
+            ids = list(viejas.values_list("id", flat=True)[: options["batch"]])
+            if not ids:
+                break
+            borradas += CitaEliminada.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"[purgar_eliminadas] listo. borradas={borradas}"))
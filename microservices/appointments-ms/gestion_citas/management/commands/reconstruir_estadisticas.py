@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from gestion_citas.estadisticas import reconstruir
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d").date() if valor else None
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {valor} (formato YYYY-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = "Reconstruye las estadísticas diarias de citas a partir de Cita (todo, o solo un rango de fechas)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Primera fecha a reconstruir (YYYY-MM-DD).")
+        parser.add_argument("--hasta", help="Última fecha a reconstruir (YYYY-MM-DD).")
+        parser.add_argument(
+            "--batch", type=int, default=1000, help="Tamaño del lote de lectura/inserción (default 1000)."
+        )
+
+    def handle(self, *args, **options):
+        filas = reconstruir(desde=_fecha(options["desde"]), hasta=_fecha(options["hasta"]), lote=options["batch"])
+        self.stdout.write(self.style.SUCCESS(f"[reconstruir_estadisticas] listo. filas={filas}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from gestion_citas.inasistencias import reconstruir
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los contadores de inasistencias por paciente a partir de las citas NO_ASISTIO."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=1000, help="Tamaño del lote de inserción (default 1000).")
+
+    def handle(self, *args, **options):
+        pacientes = reconstruir(lote=options["batch"])
+        self.stdout.write(self.style.SUCCESS(f"[reconstruir_inasistencias] listo. pacientes={pacientes}"))
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.11 on 2026-10-18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("gestion_citas", "0013_configuracionglobal_grupos_excepcion_agendar_terceros"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cita",
+            index=models.Index(fields=["fecha", "hora_inicio", "id"], name="cita_fecha_hora_id_idx"),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.11 on 2026-10-18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("gestion_citas", "0014_cita_fecha_hora_id_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cita",
+            index=models.Index(fields=["profesional_id", "fecha", "updated_at"], name="cita_prof_fecha_upd_idx"),
+        ),
+        migrations.CreateModel(
+            name="CitaEliminada",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("cita_id", models.BigIntegerField()),
+                ("profesional_id", models.BigIntegerField()),
+                ("paciente_id", models.BigIntegerField()),
+                ("fecha", models.DateField()),
+                ("eliminado_en", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["profesional_id", "fecha", "eliminado_en"], name="cita_elim_prof_fecha_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.11 on 2026-10-18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("gestion_citas", "0015_cita_cambios"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="configuracionglobal",
+            name="version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.11 on 2026-10-18
+
+from django.db import migrations, models
+
+
+def poblar_resumen(apps, schema_editor):
+    Cita = apps.get_model("gestion_citas", "Cita")
+    ResumenInasistencias = apps.get_model("gestion_citas", "ResumenInasistencias")
+    filas = (
+        Cita.objects.filter(estado="NO_ASISTIO")
+        .values("paciente_id")
+        .annotate(total=models.Count("id"), ultima_falta=models.Max("fecha"))
+    )
+    ResumenInasistencias.objects.bulk_create(
+        (ResumenInasistencias(**fila) for fila in filas.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("gestion_citas", "0016_configuracionglobal_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResumenInasistencias",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("paciente_id", models.BigIntegerField(unique=True)),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("ultima_falta", models.DateField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
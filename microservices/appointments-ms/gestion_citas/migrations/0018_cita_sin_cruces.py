@@ -0,0 +1,96 @@
+# Generated by Django 5.2.11 on 2026-10-18
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations, models
+
+CITA_SIN_CRUCES = "gestion_citas_cita_sin_cruces"
+
+# fecha + hora da un timestamp: el rango de la cita dentro de su día
+CITA_EXCLUSION_SQL = f"""
+ALTER TABLE gestion_citas_cita ADD CONSTRAINT {CITA_SIN_CRUCES}
+EXCLUDE USING gist (
+    profesional_id WITH =,
+    tsrange(fecha + hora_inicio, fecha + hora_fin, '[)') WITH &&
+) WHERE (estado IN ('PENDIENTE', 'ACEPTADA', 'EN_SALA', 'LLAMADO'))
+"""
+
+CRUCES_CITA_SQL = """
+SELECT a.id, b.id FROM gestion_citas_cita a
+JOIN gestion_citas_cita b
+  ON a.profesional_id = b.profesional_id AND a.fecha = b.fecha AND a.id < b.id
+WHERE a.estado IN ('PENDIENTE', 'ACEPTADA', 'EN_SALA', 'LLAMADO')
+  AND b.estado IN ('PENDIENTE', 'ACEPTADA', 'EN_SALA', 'LLAMADO')
+  AND a.hora_inicio < b.hora_fin AND b.hora_inicio < a.hora_fin
+LIMIT 20
+"""
+
+
+# Duración que se asume al reparar citas con hora_fin <= hora_inicio (la de servicios sin duración)
+DURACION_REPARACION = timedelta(minutes=20)
+
+
+def reparar_horarios(apps, schema_editor):
+    """
+    Citas con hora_fin <= hora_inicio (p. ej. pasadas de medianoche) romperían
+    tsrange() y el CHECK: se les da fin = inicio + 20 min, sin pasar del día.
+    """
+    Cita = apps.get_model("gestion_citas", "Cita")
+    invertidas = Cita.objects.filter(hora_fin__lte=models.F("hora_inicio"), hora_inicio__lt=time.max)
+    for pk, fecha, hora_inicio in invertidas.values_list("id", "fecha", "hora_inicio").iterator():
+        fin = datetime.combine(fecha, hora_inicio) + DURACION_REPARACION
+        Cita.objects.filter(pk=pk).update(hora_fin=fin.time() if fin.date() == fecha else time.max)
+    # Un inicio en el último microsegundo del día no deja lugar para el fin
+    Cita.objects.filter(hora_inicio=time.max).update(hora_inicio=time(23, 40), hora_fin=time.max)
+
+
+def crear_restriccion(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CRUCES_CITA_SQL)
+        cruces = cursor.fetchall()
+        if cruces:
+            raise RuntimeError(
+                "Hay citas activas del mismo profesional que se cruzan y deben corregirse antes de migrar "
+                f"(pares de ids, máximo 20): {cruces}"
+            )
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(CITA_EXCLUSION_SQL)
+
+
+def eliminar_restriccion(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"ALTER TABLE gestion_citas_cita DROP CONSTRAINT IF EXISTS {CITA_SIN_CRUCES}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("gestion_citas", "0017_resumeninasistencias"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cita",
+            index=models.Index(
+                condition=models.Q(("estado__in", ["PENDIENTE", "ACEPTADA", "EN_SALA", "LLAMADO"])),
+                fields=["profesional_id", "fecha", "hora_inicio"],
+                name="cita_prof_fecha_hora_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cita",
+            index=models.Index(fields=["paciente_id", "fecha"], name="cita_pac_fecha_idx"),
+        ),
+        migrations.RunPython(reparar_horarios, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="cita",
+            constraint=models.CheckConstraint(
+                condition=models.Q(("hora_fin__gt", models.F("hora_inicio"))), name="cita_hora_fin_posterior"
+            ),
+        ),
+        migrations.RunPython(crear_restriccion, eliminar_restriccion),
+    ]
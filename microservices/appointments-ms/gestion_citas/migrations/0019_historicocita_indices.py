@@ -0,0 +1,27 @@
+# Generated by Django 5.2.11 on 2026-10-18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("gestion_citas", "0018_cita_sin_cruces"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="historicocita",
+            name="fecha_registro",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name="historicocita",
+            index=models.Index(fields=["fecha_cita", "estado"], name="hist_fecha_estado_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="historicocita",
+            index=models.Index(fields=["profesional_id", "fecha_cita"], name="hist_prof_fecha_idx"),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.11 on 2026-10-18
+
+from collections import defaultdict
+from datetime import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def poblar_estadisticas(apps, schema_editor):
+    Cita = apps.get_model("gestion_citas", "Cita")
+    EstadisticaDiaria = apps.get_model("gestion_citas", "EstadisticaDiaria")
+    acumulado = defaultdict(lambda: [0, 0])
+    citas = Cita.objects.filter(activo=True).values(
+        "fecha", "profesional_id", "servicio_id", "lugar_id", "estado", "hora_inicio", "created_at"
+    )
+    for c in citas.iterator(chunk_size=1000):
+        clave = (c["fecha"], c["profesional_id"], c["servicio_id"] or 0, c["lugar_id"] or 0, c["estado"])
+        inicio = timezone.make_aware(datetime.combine(c["fecha"], c["hora_inicio"]))
+        acumulado[clave][0] += 1
+        acumulado[clave][1] += max(0, int((inicio - c["created_at"]).total_seconds() // 60))
+    EstadisticaDiaria.objects.bulk_create(
+        (
+            EstadisticaDiaria(
+                fecha=fecha,
+                profesional_id=profesional_id,
+                servicio_id=servicio_id,
+                lugar_id=lugar_id,
+                estado=estado,
+                total=total,
+                anticipacion_min=minutos,
+            )
+            for (fecha, profesional_id, servicio_id, lugar_id, estado), (total, minutos) in acumulado.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("gestion_citas", "0019_historicocita_indices"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EstadisticaDiaria",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("fecha", models.DateField()),
+                ("profesional_id", models.BigIntegerField()),
+                ("servicio_id", models.BigIntegerField(default=0)),
+                ("lugar_id", models.BigIntegerField(default=0)),
+                ("estado", models.CharField(max_length=50)),
+                ("total", models.IntegerField(default=0)),
+                ("anticipacion_min", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [models.Index(fields=["profesional_id", "fecha"], name="estadistica_prof_fecha_idx")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("fecha", "profesional_id", "servicio_id", "lugar_id", "estado"),
+                        name="estadistica_diaria_unica",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(poblar_estadisticas, migrations.RunPython.noop),
+    ]
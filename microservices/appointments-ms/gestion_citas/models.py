@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 import copy
 
+from .utils.config_cache import publicar_version
+
 # ESTADOS CRÍTICOS: Protegidos para que el backend pueda aplicar reglas de negocio
 PROTECTED_SLUGS = ['PENDIENTE', 'ACEPTADA', 'EN_SALA', 'LLAMADO', 'REALIZADA', 'CANCELADA', 'RECHAZADA', 'NO_ASISTIO']
 
@@ -102,11 +105,94 @@ class Cita(models.Model):
         ordering = ["-fecha", "-hora_inicio"]
         verbose_name = "Cita"
         verbose_name_plural = "Citas"
+        indexes = [
+            # Llave de la paginación del listado (CitaKeysetPagination)
+            models.Index(fields=["fecha", "hora_inicio", "id"], name="cita_fecha_hora_id_idx"),
+            # Consultas "cambios desde" de los tableros (acción cambios del CitaViewSet)
+            models.Index(fields=["profesional_id", "fecha", "updated_at"], name="cita_prof_fecha_upd_idx"),
+            # Cruces del profesional y del paciente al agendar (solo estados que ocupan horario)
+            models.Index(
+                fields=["profesional_id", "fecha", "hora_inicio"],
+                name="cita_prof_fecha_hora_idx",
+                condition=models.Q(estado__in=["PENDIENTE", "ACEPTADA", "EN_SALA", "LLAMADO"]),
+            ),
+            models.Index(fields=["paciente_id", "fecha"], name="cita_pac_fecha_idx"),
+        ]
+        constraints = [
+            # Rango no vacío dentro del día (la exclusión de cruces arma tsrange con él)
+            models.CheckConstraint(
+                condition=models.Q(hora_fin__gt=models.F("hora_inicio")), name="cita_hora_fin_posterior"
+            ),
+        ]
 
     def __str__(self):
         return f"Cita {self.id} - {self.fecha} ({self.estado})"
 
 
+class CitaEliminada(models.Model):
+    """
+    Lápida de una cita borrada (o movida a otro profesional/fecha) para que
+    los tableros que piden cambios sepan que deben quitarla.
+    """
+    cita_id = models.BigIntegerField()
+    profesional_id = models.BigIntegerField()
+    paciente_id = models.BigIntegerField()
+    fecha = models.DateField()
+    eliminado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["profesional_id", "fecha", "eliminado_en"], name="cita_elim_prof_fecha_idx"),
+        ]
+
+    def __str__(self):
+        return f"Cita eliminada {self.cita_id} - {self.fecha}"
+
+
+class ResumenInasistencias(models.Model):
+    """
+    Inasistencias (citas NO_ASISTIO) por paciente, mantenidas al cambiar el
+    estado de las citas (ver inasistencias.py). Solo hay fila si total > 0.
+    """
+    paciente_id = models.BigIntegerField(unique=True)
+    total = models.PositiveIntegerField(default=0)
+    ultima_falta = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Inasistencias paciente {self.paciente_id}: {self.total}"
+
+
+class EstadisticaDiaria(models.Model):
+    """
+    Citas por día, profesional, servicio, sede y estado, mantenidas al
+    cambiar las citas (ver estadisticas.py). servicio_id/lugar_id 0 = sin asignar.
+    """
+    fecha = models.DateField()
+    profesional_id = models.BigIntegerField()
+    servicio_id = models.BigIntegerField(default=0)
+    lugar_id = models.BigIntegerField(default=0)
+    estado = models.CharField(max_length=50)
+    total = models.IntegerField(default=0)
+    # Suma de minutos entre que se pidió cada cita y su hora de inicio (promedio = anticipacion_min / total)
+    anticipacion_min = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["fecha", "profesional_id", "servicio_id", "lugar_id", "estado"],
+                name="estadistica_diaria_unica",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["profesional_id", "fecha"], name="estadistica_prof_fecha_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} prof {self.profesional_id} {self.estado}: {self.total}"
+
+
 class NotaMedica(models.Model):
     cita = models.OneToOneField(Cita, on_delete=models.CASCADE, related_name="nota_medica")
     contenido = models.TextField(verbose_name="Evolución / Nota Médica")
@@ -132,9 +218,17 @@ class HistoricoCita(models.Model):
     fecha_cita = models.DateField()
     hora_inicio = models.TimeField()
     estado = models.CharField(max_length=50)
-    fecha_registro = models.DateTimeField(auto_now_add=True)
+    # Momento del cambio (no el de la inserción: se escribe en lote, ver historial.py)
+    fecha_registro = models.DateTimeField(default=timezone.now)
     usuario_responsable = models.CharField(max_length=100, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Reportes por rango de fechas de la cita (y por profesional dentro del rango)
+            models.Index(fields=["fecha_cita", "estado"], name="hist_fecha_estado_idx"),
+            models.Index(fields=["profesional_id", "fecha_cita"], name="hist_prof_fecha_idx"),
+        ]
+
     def __str__(self):
         return f"Histórico {self.cita_original_id} - {self.estado}"
 
@@ -168,6 +262,9 @@ class ConfiguracionGlobal(models.Model):
         help_text="Grupos autorizados para agendar citas a nombre de otros pacientes."
     )
 
+    # Sube en cada save(); las copias en memoria (utils/config_cache) se recargan al cambiar
+    version = models.PositiveIntegerField(default=0, editable=False)
+
     def save(self, *args, **kwargs):
         self.pk = 1
         # Aseguramos consistencia de Slugs protegidos
@@ -180,6 +277,10 @@ class ConfiguracionGlobal(models.Model):
                     self.workflow_citas.append(default_state)
         
         super().save(*args, **kwargs)
+        # Con F(): dos guardados concurrentes nunca quedan con la misma versión
+        ConfiguracionGlobal.objects.filter(pk=self.pk).update(version=models.F("version") + 1)
+        self.refresh_from_db(fields=["version"])
+        transaction.on_commit(lambda v=self.version: publicar_version(v))
 
     def __str__(self):
         return "Configuración Global del Sistema"
@@ -0,0 +1,114 @@
+"""
+Paginación por llave (keyset) del listado de citas.
+
+El cursor guarda la última fila entregada (fecha, hora_inicio, id) y la
+página siguiente se pide con un WHERE sobre esa tupla, apoyado en el índice
+compuesto de Cita. El costo de cada página no depende de qué tan atrás esté.
+"""
+
+import base64
+import binascii
+from datetime import date, time
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .permissions import es_llamada_interna
+
+# ?ordering aceptados por el cursor -> ascendente; el cursor solo sabe recorrer (fecha, hora_inicio, id)
+ORDENAMIENTOS = {
+    "fecha": True,
+    "fecha,hora_inicio": True,
+    "fecha,hora_inicio,id": True,
+    "-fecha": False,
+    "-fecha,-hora_inicio": False,
+    "-fecha,-hora_inicio,-id": False,
+}
+
+
+class CitaKeysetPagination(BasePagination):
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    # Solo llamadas internas (X-INTERNAL-TOKEN) pueden pedir la lista completa
+    legacy_query_param = "paginar"
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, "CITAS_PAGE_SIZE", 50)
+        max_page_size = getattr(settings, "CITAS_MAX_PAGE_SIZE", 200)
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, page_size))
+        except ValueError:
+            pass
+        return max(1, min(page_size, max_page_size))
+
+    @staticmethod
+    def es_ascendente(request):
+        # Por defecto "-fecha,-hora_inicio" (desc); otro orden daría páginas que el cursor no puede continuar
+        ordering = request.query_params.get("ordering", "").replace(" ", "") or "-fecha"
+        if ordering not in ORDENAMIENTOS:
+            raise ValidationError(
+                {"ordering": f"Orden no soportado en el listado paginado. Usa uno de: {', '.join(ORDENAMIENTOS)}."}
+            )
+        return ORDENAMIENTOS[ordering]
+
+    def _decodificar(self, valor):
+        try:
+            relleno = "=" * (-len(valor) % 4)
+            fecha, hora, pk = base64.urlsafe_b64decode(valor + relleno).decode().split("|")
+            return date.fromisoformat(fecha), time.fromisoformat(hora), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound("Cursor inválido.")
+
+    @staticmethod
+    def _codificar(cita):
+        valor = f"{cita.fecha.isoformat()}|{cita.hora_inicio.isoformat()}|{cita.pk}"
+        return base64.urlsafe_b64encode(valor.encode()).decode().rstrip("=")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.legacy_query_param) == "false" and es_llamada_interna(request):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        asc = self.es_ascendente(request)
+        orden = ("fecha", "hora_inicio", "id") if asc else ("-fecha", "-hora_inicio", "-id")
+        queryset = queryset.order_by(*orden)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            fecha, hora, pk = self._decodificar(cursor)
+            op = "gt" if asc else "lt"
+            queryset = queryset.filter(
+                Q(**{f"fecha__{op}": fecha})
+                | Q(fecha=fecha, **{f"hora_inicio__{op}": hora})
+                | Q(fecha=fecha, hora_inicio=hora, **{f"id__{op}": pk})
+            )
+
+        filas = list(queryset[: self.page_size + 1])
+        self.hay_siguiente = len(filas) > self.page_size
+        filas = filas[: self.page_size]
+        self.ultima = filas[-1] if filas else None
+        return filas
+
+    def get_next_link(self):
+        if not self.hay_siguiente:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self._codificar(self.ultima))
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
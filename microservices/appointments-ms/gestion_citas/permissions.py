@@ -2,6 +2,11 @@ from django.conf import settings
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
 
+def es_llamada_interna(request):
+    token = request.headers.get("X-INTERNAL-TOKEN")
+    return bool(token) and token == getattr(settings, "INTERNAL_SERVICE_TOKEN", None)
+
+
 class InternalTokenOrAuthenticatedReadOnly(BasePermission):
     """
     Permite llamadas internas (solo lectura) con X-INTERNAL-TOKEN.
@@ -9,8 +14,15 @@ class InternalTokenOrAuthenticatedReadOnly(BasePermission):
     """
 
     def has_permission(self, request, view):
-        token = request.headers.get("X-INTERNAL-TOKEN")
-        if request.method in SAFE_METHODS and token and token == getattr(settings, "INTERNAL_SERVICE_TOKEN", None):
+        if request.method in SAFE_METHODS and es_llamada_interna(request):
             return True
         return bool(getattr(request, "user", None) and request.user.is_authenticated)
 
+
+class InternalToken(BasePermission):
+    """
+    Solo llamadas entre microservicios con X-INTERNAL-TOKEN válido.
+    """
+
+    def has_permission(self, request, view):
+        return es_llamada_interna(request)
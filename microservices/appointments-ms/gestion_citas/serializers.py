@@ -25,6 +25,13 @@ class CitaSerializer(serializers.ModelSerializer):
         model = Cita
         fields = "__all__"
 
+    def validate(self, attrs):
+        inicio = attrs.get("hora_inicio", getattr(self.instance, "hora_inicio", None))
+        fin = attrs.get("hora_fin", getattr(self.instance, "hora_fin", None))
+        if inicio is not None and fin is not None and fin <= inicio:
+            raise serializers.ValidationError({"hora_fin": "La hora de fin debe ser posterior a la de inicio."})
+        return attrs
+
     def get_paciente_nombre(self, obj):
         return getattr(obj, "paciente_nombre", None)
 
@@ -0,0 +1,129 @@
+from datetime import date, time, timedelta
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from gestion_citas.models import Cita, CitaEliminada
+from gestion_citas.utils import reference_cache
+from gestion_citas.views import CitaViewSet
+
+
+@patch("gestion_citas.views.notificar_cambio_agenda")
+@patch("gestion_citas.views.audit_log")
+@patch("gestion_citas.utils.bulk_client.requests.get", return_value=Mock(status_code=200, json=lambda: {}))
+class CitaCambiosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache._lru.limpiar()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(username="medico", password="x", is_staff=True)
+        self.hoy = date.today()
+        self.citas = [
+            Cita.objects.create(
+                profesional_id=7, paciente_id=i, fecha=self.hoy, hora_inicio=time(8 + i), hora_fin=time(8 + i, 20)
+            )
+            for i in range(1, 4)
+        ]
+        Cita.objects.create(profesional_id=8, paciente_id=9, fecha=self.hoy, hora_inicio="08:00", hora_fin="08:20")
+        # Filas viejas: así la marca de agua de la carga inicial ya las deja atrás
+        Cita.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+
+    def _cambios(self, **params):
+        request = self.factory.get(
+            "/api/v1/citas/cambios/", {"profesional_id": 7, "fecha": self.hoy.isoformat(), **params}
+        )
+        force_authenticate(request, user=self.user)
+        return CitaViewSet.as_view({"get": "cambios"})(request)
+
+    def _view(self, metodo, accion, cita, data=None):
+        request = getattr(self.factory, metodo)(f"/api/v1/citas/{cita.pk}/", data, format="json")
+        force_authenticate(request, user=self.user)
+        return CitaViewSet.as_view({metodo: accion})(request, pk=cita.pk)
+
+    def test_initial_load_then_only_changed_rows(self, mock_get, mock_audit, mock_agenda):
+        inicial = self._cambios()
+        self.assertEqual(inicial.status_code, 200)
+        self.assertEqual(len(inicial.data["cambios"]), 3)
+        self.assertTrue(inicial.data["completo"])
+
+        self.assertEqual(self._cambios(updated_after=inicial.data["watermark"]).status_code, 304)
+
+        cita = self.citas[1]
+        cita.nota_interna = "Llegó tarde"
+        cita.save()
+
+        with self.assertNumQueries(2):
+            response = self._cambios(updated_after=inicial.data["watermark"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c["id"] for c in response.data["cambios"]], [cita.pk])
+        self.assertEqual(response.data["eliminados"], [])
+
+    def test_reports_deleted_inactivated_and_moved_citas(self, mock_get, mock_audit, mock_agenda):
+        watermark = self._cambios().data["watermark"]
+        borrada, inactiva, movida = self.citas
+
+        self.assertEqual(self._view("delete", "destroy", borrada).status_code, 204)
+        inactiva.activo = False
+        inactiva.save()
+        self.assertEqual(self._view("patch", "partial_update", movida, {"profesional_id": 8}).status_code, 200)
+
+        response = self._cambios(updated_after=watermark)
+
+        self.assertEqual(response.data["cambios"], [])
+        self.assertEqual(response.data["eliminados"], sorted([borrada.pk, inactiva.pk, movida.pk]))
+
+        # Para el otro profesional la cita movida es un cambio
+        response = self._cambios(updated_after=watermark, profesional_id=8)
+        self.assertEqual([c["id"] for c in response.data["cambios"]], [movida.pk])
+        self.assertEqual(response.data["eliminados"], [])
+
+    def test_rejects_invalid_watermark(self, mock_get, mock_audit, mock_agenda):
+        self.assertEqual(self._cambios(updated_after="ayer").status_code, 400)
+
+    def test_pages_rows_sharing_the_same_updated_at(self, mock_get, mock_audit, mock_agenda):
+        watermark = self._cambios().data["watermark"]
+        # Más filas con la misma marca que el tope por respuesta
+        Cita.objects.update(updated_at=timezone.now())
+
+        vistos, cursor = [], {"updated_after": watermark}
+        with patch("gestion_citas.views.MAX_CAMBIOS", 2):
+            for _ in range(3):
+                data = self._cambios(**cursor).data
+                vistos += [c["id"] for c in data["cambios"]]
+                cursor = {"updated_after": data["watermark"], "after_id": data["ultimo_id"] or ""}
+                if data["completo"]:
+                    break
+
+        self.assertTrue(data["completo"])
+        self.assertEqual(vistos, [c.pk for c in self.citas])
+
+    def test_tombstones_follow_the_list_filters(self, mock_get, mock_audit, mock_agenda):
+        watermark = self._cambios().data["watermark"]
+        self._view("delete", "destroy", self.citas[0])
+
+        response = self._cambios(updated_after=watermark, profesional_id="", profesional_id__in="8,9")
+        self.assertEqual(response.status_code, 304)
+        response = self._cambios(updated_after=watermark, profesional_id="", profesional_id__in="7,8")
+        self.assertEqual(response.data["eliminados"], [self.citas[0].pk])
+
+        # Sin profesional ni paciente, solo administradores
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self._cambios(profesional_id="").status_code, 400)
+
+    def test_expired_watermark_and_purge(self, mock_get, mock_audit, mock_agenda):
+        self._view("delete", "destroy", self.citas[0])
+        CitaEliminada.objects.update(eliminado_en=timezone.now() - timedelta(days=30))
+        self._view("delete", "destroy", self.citas[1])
+
+        vieja = (timezone.now() - timedelta(days=30)).isoformat()
+        self.assertEqual(self._cambios(updated_after=vieja).status_code, 410)
+
+        call_command("purgar_eliminadas", stdout=StringIO())
+        self.assertEqual(list(CitaEliminada.objects.values_list("cita_id", flat=True)), [self.citas[1].pk])
@@ -0,0 +1,51 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from gestion_citas.models import DEFAULT_WORKFLOW, ConfiguracionGlobal
+from gestion_citas.utils import config_cache
+from gestion_citas.workflow import WorkflowCompilado
+
+
+class ConfiguracionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        config_cache.limpiar()
+
+    def tearDown(self):
+        config_cache.limpiar()
+
+    def test_reads_the_database_once_per_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            config, _ = config_cache.obtener()
+        self.assertEqual(config.version, 1)
+
+        with self.assertNumQueries(0):
+            mismo, workflow = config_cache.obtener()
+        self.assertIs(mismo, config)
+        self.assertTrue(workflow.permite("ACEPTADA", "EN_SALA"))
+
+    def test_save_bumps_the_version_and_reloads(self):
+        config_cache.obtener()
+        config = ConfiguracionGlobal.objects.get(pk=1)
+        config.limite_inasistencias = 7
+        with self.captureOnCommitCallbacks(execute=True):
+            config.save()
+
+        nueva, _ = config_cache.obtener()
+        self.assertEqual(nueva.limite_inasistencias, 7)
+        self.assertEqual(nueva.version, config.version)
+        self.assertGreater(config.version, 1)
+
+
+class WorkflowCompiladoTests(TestCase):
+    def test_compiles_transitions_final_states_and_reason_flags(self):
+        workflow = WorkflowCompilado(DEFAULT_WORKFLOW)
+
+        self.assertTrue(workflow.es_valido("EN_SALA"))
+        self.assertFalse(workflow.es_valido("INVENTADO"))
+        self.assertEqual(workflow.finales, {"REALIZADA", "CANCELADA", "RECHAZADA", "NO_ASISTIO"})
+        self.assertTrue(workflow.permite("LLAMADO", "LLAMADO"))
+        self.assertFalse(workflow.permite("PENDIENTE", "REALIZADA"))
+        self.assertFalse(workflow.permite("DESCONOCIDO", "ACEPTADA"))
+        self.assertTrue(workflow.requiere_motivo("PENDIENTE", "RECHAZADA"))
+        self.assertFalse(workflow.requiere_motivo("PENDIENTE", "ACEPTADA"))
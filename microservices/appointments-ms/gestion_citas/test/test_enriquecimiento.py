@@ -0,0 +1,60 @@
+import time
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from gestion_citas.utils import reference_cache
+from gestion_citas.utils.bulk_client import obtener_bulk_paralelo, server_timing
+from gestion_citas.views import LUGARES_MS_URL, PATIENTS_MS_URL, STAFF_MS_URL, CitaViewSet
+
+
+def _respuesta(url, params=None, **kwargs):
+    time.sleep(0.2)
+    if url == LUGARES_MS_URL:
+        time.sleep(1)
+        return Mock(status_code=200, json=lambda: {"3": {"nombre": "Sede Norte"}})
+    if url == PATIENTS_MS_URL:
+        return Mock(status_code=200, json=lambda: {"1": {"nombre_completo": "Ana Pérez", "numero_documento": "123"}})
+    if url == STAFF_MS_URL:
+        raise ConnectionError("caído")
+    return Mock(status_code=200, json=lambda: {"2": {"nombre": "Consulta"}})
+
+
+@patch("gestion_citas.utils.bulk_client.requests.get", side_effect=_respuesta)
+class EnriquecimientoTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache._lru.limpiar()
+
+    def test_calls_sources_concurrently_and_degrades_per_source(self, mock_get):
+        inicio = time.monotonic()
+        with self.settings(ENRIQUECIMIENTO_PLAZO_SEGUNDOS=0.6):
+            view = CitaViewSet()
+            citas = view._enrich_data([{"paciente_id": 1, "profesional_id": 9, "servicio_id": 2, "lugar_id": 3}])
+        transcurrido = time.monotonic() - inicio
+
+        # Cuatro llamadas de 0.2s en paralelo, cortadas por el plazo común
+        self.assertLess(transcurrido, 0.75)
+        self.assertEqual(mock_get.call_count, 4)
+        self.assertEqual(citas[0]["paciente_nombre"], "Ana Pérez")
+        self.assertEqual(citas[0]["servicio_nombre"], "Consulta")
+        self.assertEqual(citas[0]["profesional_nombre"], "No asignado")
+        self.assertEqual(citas[0]["lugar_nombre"], "Sede Principal")
+
+        estados = {nombre: t["estado"] for nombre, t in view._tiempos_enriquecimiento.items()}
+        self.assertEqual(
+            estados, {"pacientes": "ok", "profesionales": "error", "servicios": "ok", "lugares": "timeout"}
+        )
+
+    def test_skips_sources_without_ids(self, mock_get):
+        datos, tiempos = obtener_bulk_paralelo({"lugares": (LUGARES_MS_URL, [None, "None"])})
+        self.assertEqual(datos, {"lugares": {}})
+        self.assertEqual(tiempos, {})
+        mock_get.assert_not_called()
+
+    def test_server_timing_header_marks_degraded_sources(self, mock_get):
+        valor = server_timing(
+            {"pacientes": {"ms": 12.3, "estado": "ok"}, "lugares": {"ms": 600.0, "estado": "timeout"}}
+        )
+        self.assertEqual(valor, 'pacientes;dur=12.3, lugares;dur=600.0;desc="timeout"')
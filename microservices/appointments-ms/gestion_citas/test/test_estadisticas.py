@@ -0,0 +1,133 @@
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from gestion_citas import estadisticas
+from gestion_citas.models import Cita, EstadisticaDiaria
+from gestion_citas.utils import config_cache, reference_cache
+from gestion_citas.views import SERVICES_MS_URL, CitaViewSet
+
+
+def _respuesta(url, **kwargs):
+    if url.startswith(SERVICES_MS_URL):
+        return Mock(status_code=200, json=lambda: {"5": {"nombre": "Consulta", "duracion": 20}})
+    return Mock(status_code=200, json=lambda: {"id": 1, "user_id": None, "tipo_usuario": None})
+
+
+@patch("gestion_citas.views.requests.get", side_effect=_respuesta)
+@patch("gestion_citas.views.notificar_cambio_agenda")
+@patch("gestion_citas.views.audit_log")
+@patch("gestion_citas.utils.bulk_client.requests.get", return_value=Mock(status_code=200, json=lambda: {}))
+class EstadisticasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        config_cache.limpiar()
+        reference_cache._lru.limpiar()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(username="admin", password="x", is_staff=True)
+        self.lunes = date(2026, 3, 2)
+
+    def tearDown(self):
+        config_cache.limpiar()
+
+    def _cita(self, fecha, hora, estado="ACEPTADA", profesional_id=7, servicio_id=5):
+        return Cita.objects.create(
+            paciente_id=1,
+            profesional_id=profesional_id,
+            servicio_id=servicio_id,
+            fecha=fecha,
+            hora_inicio=time(hora),
+            hora_fin=time(hora, 20),
+            estado=estado,
+        )
+
+    def _poblar(self):
+        citas = [
+            self._cita(self.lunes, 8, "REALIZADA"),
+            self._cita(self.lunes, 9, "REALIZADA"),
+            self._cita(self.lunes, 10, "REALIZADA"),
+            self._cita(self.lunes + timedelta(days=1), 8, "NO_ASISTIO"),
+            self._cita(self.lunes + timedelta(days=2), 8, "CANCELADA", profesional_id=8, servicio_id=None),
+            self._cita(self.lunes + timedelta(days=7), 8, "REALIZADA"),
+        ]
+        # Pedidas dos días antes de su inicio
+        for c in citas:
+            Cita.objects.filter(pk=c.pk).update(
+                created_at=timezone.make_aware(datetime.combine(c.fecha, c.hora_inicio)) - timedelta(days=2)
+            )
+        estadisticas.reconstruir()
+        return citas
+
+    def _estadisticas(self, **params):
+        request = self.factory.get("/api/v1/citas/reportes/estadisticas/", params)
+        force_authenticate(request, user=self.user)
+        return CitaViewSet.as_view({"get": "reporte_estadisticas"})(request)
+
+    def test_week_summary_from_rollups(self, *mocks):
+        self._poblar()
+
+        with self.assertNumQueries(2):
+            response = self._estadisticas(periodo="semana", fecha="2026-03-04", agrupar="profesional_id")
+
+        data = response.data
+        self.assertEqual((data["desde"], data["hasta"]), ("2026-03-02", "2026-03-08"))
+        self.assertEqual(data["total"], 5)
+        self.assertEqual((data["inasistencias"], data["cancelaciones"]), (1, 1))
+        self.assertEqual(data["tasa_inasistencia"], 0.25)
+        self.assertEqual(data["anticipacion_promedio_min"], 2880.0)
+        self.assertEqual([d["periodo"] for d in data["serie"]], ["2026-03-02", "2026-03-03", "2026-03-04"])
+        self.assertEqual([(g["profesional_id"], g["total"]) for g in data["grupos"]], [(7, 4), (8, 1)])
+
+    def test_year_series_is_monthly(self, *mocks):
+        self._poblar()
+
+        data = self._estadisticas(periodo="anio", fecha="2026-06-01", profesional_id=7).data
+
+        self.assertEqual(data["total"], 5)
+        self.assertEqual([(d["periodo"], d["total"]) for d in data["serie"]], [("2026-03-01", 5)])
+
+    def test_state_changes_keep_rollups_in_sync(self, *mocks):
+        crear = self.factory.post(
+            "/api/v1/citas/",
+            {
+                "paciente_id": 1,
+                "profesional_id": 7,
+                "servicio_id": 5,
+                "fecha": (date.today() + timedelta(days=3)).isoformat(),
+                "hora_inicio": "09:00",
+            },
+            format="json",
+        )
+        force_authenticate(crear, user=self.user)
+        cita_id = CitaViewSet.as_view({"post": "create"})(crear).data["id"]
+
+        cambio = self.factory.patch(
+            f"/api/v1/citas/{cita_id}/", {"estado": "CANCELADA", "nota_interna": "x"}, format="json"
+        )
+        force_authenticate(cambio, user=self.user)
+        CitaViewSet.as_view({"patch": "partial_update"})(cambio, pk=cita_id)
+
+        campos = (*estadisticas.CAMPOS_CLAVE, "total", "anticipacion_min")
+        incremental = list(EstadisticaDiaria.objects.filter(total__gt=0).values_list(*campos))
+        self.assertEqual([fila[4:6] for fila in incremental], [("CANCELADA", 1)])
+
+        # Lo mantenido en cada cambio coincide con reconstruir desde Cita
+        call_command("reconstruir_estadisticas", stdout=StringIO())
+        self.assertEqual(list(EstadisticaDiaria.objects.values_list(*campos)), incremental)
+
+        borrar = self.factory.delete(f"/api/v1/citas/{cita_id}/")
+        force_authenticate(borrar, user=self.user)
+        CitaViewSet.as_view({"delete": "destroy"})(borrar, pk=cita_id)
+        self.assertFalse(EstadisticaDiaria.objects.filter(total__gt=0).exists())
+
+    def test_rejects_invalid_parameters(self, *mocks):
+        self.assertEqual(self._estadisticas(periodo="siglo").status_code, 400)
+        self.assertEqual(self._estadisticas(desde="2026-03-08", hasta="2026-03-01").status_code, 400)
+        self.assertEqual(self._estadisticas(agrupar="paciente_id").status_code, 400)
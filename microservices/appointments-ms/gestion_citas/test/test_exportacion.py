@@ -0,0 +1,91 @@
+import csv
+import io
+from datetime import date, time
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from openpyxl import load_workbook
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from gestion_citas.models import Cita
+from gestion_citas.utils import reference_cache
+from gestion_citas.views import PATIENTS_MS_URL, CitaViewSet
+
+
+def _respuesta(url, params=None, **kwargs):
+    if url == PATIENTS_MS_URL:
+        ids = params["ids"].split(",")
+        return Mock(status_code=200, json=lambda: {i: {"nombre_completo": f"Paciente {i}"} for i in ids})
+    return Mock(status_code=200, json=lambda: {})
+
+
+@patch("gestion_citas.utils.bulk_client.requests.get", side_effect=_respuesta)
+class ExportacionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache._lru.limpiar()
+        self.factory = APIRequestFactory()
+        self.admin = get_user_model().objects.create_user(username="admin", password="x", is_staff=True)
+        self.fecha = date(2026, 3, 2)
+        for i in range(1, 6):
+            Cita.objects.create(
+                paciente_id=i, profesional_id=7, fecha=self.fecha, hora_inicio=time(7 + i), hora_fin=time(7 + i, 20)
+            )
+        Cita.objects.create(
+            paciente_id=9, profesional_id=8, fecha=self.fecha, hora_inicio=time(8), hora_fin=time(8, 20)
+        )
+
+    def _exportar(self, user=None, **params):
+        request = self.factory.get("/api/v1/citas/exportar/", params)
+        force_authenticate(request, user=user or self.admin)
+        return CitaViewSet.as_view({"get": "exportar"})(request)
+
+    def test_streams_csv_enriched_by_chunks(self, mock_get):
+        with self.settings(EXPORTACION_BLOQUE=2):
+            response = self._exportar(profesional_id=7, ordering="hora_inicio")
+            self.assertTrue(response.streaming)
+            # Nada se consulta hasta que se consume el cuerpo
+            mock_get.assert_not_called()
+            contenido = b"".join(response.streaming_content).decode("utf-8-sig")
+
+        filas = list(csv.reader(io.StringIO(contenido)))
+        self.assertEqual(filas[0][:3], ["ID", "Fecha", "Hora inicio"])
+        self.assertEqual([f[6] for f in filas[1:]], [f"Paciente {i}" for i in range(1, 6)])
+        self.assertEqual(filas[1][1], "2026-03-02")
+        # Tres bloques de a 2: una consulta de pacientes por bloque
+        pacientes = [c for c in mock_get.call_args_list if c.args[0] == PATIENTS_MS_URL]
+        self.assertEqual(len(pacientes), 3)
+        self.assertIn("attachment;", response["Content-Disposition"])
+
+    def test_xlsx(self, mock_get):
+        response = self._exportar(formato="xlsx", profesional_id=8)
+        libro = load_workbook(io.BytesIO(b"".join(response.streaming_content)), read_only=True)
+
+        filas = list(libro.active.values)
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[1][6], "Paciente 9")
+
+    def test_neutralizes_formulas_in_csv_and_xlsx(self, mock_get):
+        Cita.objects.filter(profesional_id=8).update(nota='=HYPERLINK("http://x","clic")', nota_interna="-2+3")
+
+        contenido = b"".join(self._exportar(profesional_id=8).streaming_content).decode("utf-8-sig")
+        fila = list(csv.reader(io.StringIO(contenido)))[1]
+        self.assertEqual(fila[10:], ['\'=HYPERLINK("http://x","clic")', "'-2+3"])
+
+        response = self._exportar(formato="xlsx", profesional_id=8)
+        libro = load_workbook(io.BytesIO(b"".join(response.streaming_content)), read_only=True)
+        self.assertEqual(list(libro.active.values)[1][10:], ('\'=HYPERLINK("http://x","clic")', "'-2+3"))
+
+    def test_xlsx_is_limited_to_short_ranges(self, mock_get):
+        with self.settings(EXPORTACION_XLSX_MAX_FILAS=5):
+            self.assertEqual(self._exportar(formato="xlsx").status_code, 400)
+            self.assertEqual(self._exportar(formato="xlsx", profesional_id=7).status_code, 200)
+            # CSV no tiene tope: se envía a medida que se lee
+            self.assertEqual(self._exportar().status_code, 200)
+
+    def test_only_admins_and_known_formats(self, mock_get):
+        recepcion = get_user_model().objects.create_user(username="recepcion", password="x")
+        self.assertEqual(self._exportar(user=recepcion).status_code, 403)
+        self.assertEqual(self._exportar(formato="pdf").status_code, 400)
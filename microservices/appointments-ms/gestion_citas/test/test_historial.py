@@ -0,0 +1,123 @@
+from datetime import date, time, timedelta
+from io import StringIO
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from gestion_citas import historial
+from gestion_citas.models import Cita, HistoricoCita
+from gestion_citas.utils import config_cache, reference_cache
+from gestion_citas.views import PATIENTS_MS_URL, SERVICES_MS_URL, STAFF_MS_URL, CitaViewSet, resolver_referencias
+
+
+def _respuesta(url, params=None, **kwargs):
+    if url == PATIENTS_MS_URL:
+        return Mock(status_code=200, json=lambda: {"1": {"nombre_completo": "Ana Pérez"}})
+    if url == STAFF_MS_URL:
+        return Mock(status_code=200, json=lambda: {"7": {"nombre": "Dr. Gómez"}})
+    if url == SERVICES_MS_URL:
+        return Mock(status_code=200, json=lambda: {"5": {"nombre": "Consulta"}})
+    return Mock(status_code=200, json=lambda: {})
+
+
+@patch("gestion_citas.views.notificar_cambio_agenda")
+@patch("gestion_citas.views.audit_log")
+@patch("gestion_citas.views.audit_log_lote")
+@patch("gestion_citas.utils.bulk_client.requests.get", side_effect=_respuesta)
+class HistorialTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        config_cache.limpiar()
+        reference_cache._lru.limpiar()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(username="recepcion", password="x", is_staff=True)
+        self.ayer = date.today() - timedelta(days=1)
+
+    def tearDown(self):
+        config_cache.limpiar()
+
+    def _cita(self, paciente_id=1, hora=8):
+        return Cita.objects.create(
+            paciente_id=paciente_id,
+            profesional_id=7,
+            servicio_id=5,
+            fecha=self.ayer,
+            hora_inicio=time(hora),
+            hora_fin=time(hora, 20),
+            estado="ACEPTADA",
+        )
+
+    def test_state_change_is_written_on_commit_then_names_backfilled(self, mock_get, *mocks):
+        cita = self._cita()
+        request = self.factory.patch(f"/api/v1/citas/{cita.pk}/", {"estado": "EN_SALA"}, format="json")
+        force_authenticate(request, user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = CitaViewSet.as_view({"patch": "partial_update"})(request, pk=cita.pk)
+            # Antes de confirmar no hay fila
+            self.assertFalse(HistoricoCita.objects.exists())
+        self.assertEqual(response.status_code, 200, response.data)
+
+        fila = HistoricoCita.objects.get()
+        self.assertEqual((fila.cita_original_id, fila.estado, fila.fecha_cita), (cita.pk, "EN_SALA", self.ayer))
+        self.assertEqual(fila.usuario_responsable, str(self.user.pk))
+
+        # Los nombres que no estaban en caché se completan después
+        reference_cache._lru.limpiar()
+        cache.clear()
+        HistoricoCita.objects.update(nombre_paciente=None, nombre_profesional=None, nombre_servicio=None)
+        call_command("completar_historial", stdout=StringIO())
+        fila.refresh_from_db()
+        self.assertEqual(
+            (fila.nombre_paciente, fila.nombre_profesional, fila.nombre_servicio),
+            ("Ana Pérez", "Dr. Gómez", "Consulta"),
+        )
+
+    def test_names_come_from_the_cache_without_http(self, mock_get, *mocks):
+        resolver_referencias({"pacientes": {1}, "profesionales": {7}, "servicios": {5}})
+        mock_get.reset_mock()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            historial.registrar(self._cita())
+
+        mock_get.assert_not_called()
+        fila = HistoricoCita.objects.get()
+        self.assertEqual(
+            (fila.nombre_paciente, fila.nombre_profesional, fila.nombre_lugar), ("Ana Pérez", "Dr. Gómez", None)
+        )
+
+    def test_rolled_back_changes_are_not_recorded(self, *mocks):
+        with self.captureOnCommitCallbacks(execute=False):
+            historial.registrar(self._cita())
+        self.assertFalse(HistoricoCita.objects.exists())
+
+    def test_bulk_transitions_record_one_row_per_cita(self, *mocks):
+        citas = [self._cita(1, 8), self._cita(2, 9)]
+        request = self.factory.post(
+            "/api/v1/citas/transiciones/", {"ids": [c.pk for c in citas], "estado": "NO_ASISTIO"}, format="json"
+        )
+        force_authenticate(request, user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            CitaViewSet.as_view({"post": "transiciones"})(request)
+
+        self.assertEqual(
+            sorted(HistoricoCita.objects.values_list("cita_original_id", "estado")),
+            [(citas[0].pk, "NO_ASISTIO"), (citas[1].pk, "NO_ASISTIO")],
+        )
+
+    @patch("gestion_citas.management.commands.barrer_inasistencias.audit_log_lote")
+    def test_sweeper_writes_history(self, mock_barrido, *mocks):
+        cita = self._cita()
+
+        # Cada lote del barrido escribe su histórico al confirmar
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("barrer_inasistencias", stdout=StringIO())
+        call_command("completar_historial", stdout=StringIO())
+
+        fila = HistoricoCita.objects.get()
+        self.assertEqual(
+            (fila.cita_original_id, fila.estado, fila.nombre_paciente), (cita.pk, "NO_ASISTIO", "Ana Pérez")
+        )
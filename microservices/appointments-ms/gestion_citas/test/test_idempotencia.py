@@ -0,0 +1,80 @@
+from datetime import date, timedelta
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from gestion_citas.models import Cita
+from gestion_citas.utils import config_cache, reference_cache
+from gestion_citas.views import SERVICES_MS_URL, CitaViewSet
+
+
+def _respuesta(url, **kwargs):
+    if url.startswith(SERVICES_MS_URL):
+        return Mock(status_code=200, json=lambda: {"5": {"nombre": "Consulta", "duracion": 30}})
+    return Mock(status_code=200, json=lambda: {"id": 1, "user_id": None, "tipo_usuario": None})
+
+
+@patch("gestion_citas.views.notificar_cambio_agenda")
+@patch("gestion_citas.views.audit_log")
+@patch("gestion_citas.views.requests.get", side_effect=_respuesta)
+class IdempotenciaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        config_cache.limpiar()
+        reference_cache._lru.limpiar()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(username="paciente", password="x", is_superuser=True)
+        self.datos = {
+            "paciente_id": 1,
+            "profesional_id": 7,
+            "servicio_id": 5,
+            "fecha": (date.today() + timedelta(days=3)).isoformat(),
+            "hora_inicio": "09:00",
+        }
+
+    def tearDown(self):
+        config_cache.limpiar()
+
+    def _crear(self, datos, llave=None):
+        headers = {"HTTP_IDEMPOTENCY_KEY": llave} if llave else {}
+        request = self.factory.post("/api/v1/citas/", datos, format="json", **headers)
+        force_authenticate(request, user=self.user)
+        return CitaViewSet.as_view({"post": "create"})(request)
+
+    def test_retry_replays_the_original_response(self, mock_get, mock_audit, mock_agenda):
+        original = self._crear(self.datos, llave="reintento-1")
+        self.assertEqual(original.status_code, 201, original.data)
+        llamadas = mock_get.call_count
+
+        repetida = self._crear(self.datos, llave="reintento-1")
+
+        self.assertEqual(repetida.status_code, 201)
+        self.assertEqual(repetida.data["id"], original.data["id"])
+        self.assertEqual(repetida["Idempotent-Replayed"], "true")
+        self.assertEqual(Cita.objects.count(), 1)
+        self.assertEqual(mock_get.call_count, llamadas)
+        mock_audit.assert_called_once()
+
+    def test_without_key_the_retry_runs_again(self, mock_get, mock_audit, mock_agenda):
+        self._crear(self.datos)
+        response = self._crear(self.datos)
+
+        # El reintento choca con la cita que creó el primer intento
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(mock_audit.call_count, 1)
+
+    def test_same_key_with_another_body_is_rejected(self, mock_get, mock_audit, mock_agenda):
+        self._crear(self.datos, llave="reintento-1")
+        response = self._crear({**self.datos, "hora_inicio": "10:00"}, llave="reintento-1")
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Cita.objects.count(), 1)
+
+    def test_server_errors_are_not_stored(self, mock_get, mock_audit, mock_agenda):
+        with patch.object(CitaViewSet, "perform_create", side_effect=RuntimeError("caída")):
+            self.assertEqual(self._crear(self.datos, llave="reintento-1").status_code, 500)
+
+        self.assertEqual(self._crear(self.datos, llave="reintento-1").status_code, 201)
@@ -0,0 +1,85 @@
+from datetime import date, time, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from gestion_citas import inasistencias
+from gestion_citas.models import Cita, ResumenInasistencias
+from gestion_citas.utils import config_cache
+from gestion_citas.views import CitaViewSet
+
+
+@patch("gestion_citas.views.notificar_cambio_agenda")
+@patch("gestion_citas.views.audit_log")
+class InasistenciasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        config_cache.limpiar()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(username="recepcion", password="x", is_staff=True)
+        self.ayer = date.today() - timedelta(days=1)
+
+    def tearDown(self):
+        config_cache.limpiar()
+
+    def _cita(self, paciente_id, fecha, estado="ACEPTADA"):
+        return Cita.objects.create(
+            paciente_id=paciente_id,
+            profesional_id=7,
+            fecha=fecha,
+            hora_inicio=time(8),
+            hora_fin=time(8, 20),
+            estado=estado,
+        )
+
+    def _cambiar_estado(self, cita, estado):
+        request = self.factory.patch(f"/api/v1/citas/{cita.pk}/", {"estado": estado}, format="json")
+        force_authenticate(request, user=self.user)
+        response = CitaViewSet.as_view({"patch": "partial_update"})(request, pk=cita.pk)
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_counters_follow_transitions_in_and_out(self, mock_audit, mock_agenda):
+        primera = self._cita(1, self.ayer - timedelta(days=3))
+        segunda = self._cita(1, self.ayer)
+
+        self._cambiar_estado(primera, "NO_ASISTIO")
+        self._cambiar_estado(segunda, "NO_ASISTIO")
+        resumen = ResumenInasistencias.objects.get(paciente_id=1)
+        self.assertEqual((resumen.total, resumen.ultima_falta), (2, self.ayer))
+
+        self._cambiar_estado(segunda, "REALIZADA")
+        resumen.refresh_from_db()
+        self.assertEqual((resumen.total, resumen.ultima_falta), (1, primera.fecha))
+
+        self._cambiar_estado(primera, "REALIZADA")
+        self.assertFalse(ResumenInasistencias.objects.exists())
+
+    def test_report_reads_the_counters(self, mock_audit, mock_agenda):
+        self._cita(1, self.ayer, estado="NO_ASISTIO")
+        self._cita(1, self.ayer - timedelta(days=1), estado="NO_ASISTIO")
+        self._cita(2, self.ayer, estado="NO_ASISTIO")
+        call_command("reconstruir_inasistencias", stdout=StringIO())
+        config_cache.obtener()
+
+        request = self.factory.get("/api/v1/citas/reportes/inasistencias/")
+        force_authenticate(request, user=self.user)
+        with self.assertNumQueries(1):
+            response = CitaViewSet.as_view({"get": "reporte_inasistencias"})(request)
+
+        self.assertEqual(response.data["1"]["inasistencias"], 2)
+        self.assertFalse(response.data["1"]["bloqueado_por_inasistencias"])
+        self.assertEqual(response.data["2"]["ultima_falta"], self.ayer.isoformat())
+
+    def test_count_since_unblock_date(self, mock_audit, mock_agenda):
+        for dias in (1, 5, 9):
+            inasistencias.registrar(1, self._cita(1, self.ayer - timedelta(days=dias), estado="NO_ASISTIO").fecha)
+
+        self.assertEqual(inasistencias.contar_desde(1), 3)
+        self.assertEqual(inasistencias.contar_desde(1, self.ayer), 0)
+        self.assertEqual(inasistencias.contar_desde(1, self.ayer - timedelta(days=6)), 2)
+        self.assertEqual(inasistencias.contar_desde(99), 0)
@@ -0,0 +1,60 @@
+from datetime import date, time
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from gestion_citas.models import Cita
+from gestion_citas.views import CitaViewSet
+
+
+@override_settings(INTERNAL_SERVICE_TOKEN="token-interno")
+class OcupacionTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        base = {"paciente_id": 1, "hora_inicio": time(8), "hora_fin": time(8, 20)}
+        Cita.objects.create(profesional_id=1, fecha=date(2030, 1, 1), estado="ACEPTADA", **base)
+        Cita.objects.create(profesional_id=1, fecha=date(2030, 1, 5), estado="CANCELADA", **base)
+        Cita.objects.create(profesional_id=2, fecha=date(2030, 1, 3), estado="PENDIENTE", **base)
+        Cita.objects.create(profesional_id=3, fecha=date(2030, 1, 3), estado="PENDIENTE", **base)
+        Cita.objects.create(profesional_id=1, fecha=date(2030, 2, 1), estado="ACEPTADA", **base)
+
+    def _ocupacion(self, params):
+        request = self.factory.get("/api/v1/citas/ocupacion/", params, HTTP_X_INTERNAL_TOKEN="token-interno")
+        return CitaViewSet.as_view({"get": "ocupacion"})(request)
+
+    def test_filters_by_date_range_professionals_and_states(self):
+        response = self._ocupacion(
+            {
+                "profesional_id__in": "1,2",
+                "fecha__gte": "2030-01-01",
+                "fecha__lte": "2030-01-31",
+                "estado__in": "PENDIENTE,ACEPTADA",
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(c["profesional_id"], str(c["fecha"])) for c in response.data],
+            [(1, "2030-01-01"), (2, "2030-01-03")],
+        )
+        self.assertEqual(
+            set(response.data[0]),
+            {"profesional_id", "fecha", "hora_inicio", "hora_fin", "estado"},
+        )
+
+    def test_filters_by_weekday_and_start_time_window(self):
+        Cita.objects.create(
+            profesional_id=1, paciente_id=1, fecha=date(2030, 1, 8), hora_inicio=time(12), hora_fin=time(12, 20)
+        )
+        # 2030-01-01 y 2030-01-08 son martes (ISO 2); 2030-02-01 es viernes
+        response = self._ocupacion(
+            {
+                "profesional_id__in": "1",
+                "fecha__iso_week_day": "2",
+                "hora_inicio__gte": "08:00:00",
+                "hora_inicio__lt": "12:00:00",
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([str(c["fecha"]) for c in response.data], ["2030-01-01"])
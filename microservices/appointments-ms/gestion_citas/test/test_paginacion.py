@@ -0,0 +1,72 @@
+from datetime import date, time
+from unittest.mock import Mock, patch
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from gestion_citas.models import Cita
+from gestion_citas.views import CitaViewSet
+
+
+@override_settings(INTERNAL_SERVICE_TOKEN="token-interno", CITAS_PAGE_SIZE=3, CITAS_MAX_PAGE_SIZE=4)
+@patch("gestion_citas.views.requests.get", return_value=Mock(status_code=200, json=lambda: {}))
+class CitaPaginacionTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(username="paginador", password="x")
+        # Varias citas comparten fecha y hora: el id desempata
+        for dia in (1, 2, 3):
+            for hora in (8, 8, 9):
+                Cita.objects.create(
+                    profesional_id=1,
+                    paciente_id=1,
+                    fecha=date(2030, 1, dia),
+                    hora_inicio=time(hora),
+                    hora_fin=time(hora, 20),
+                )
+
+    def _list(self, params=None, user=True, **headers):
+        request = self.factory.get("/api/v1/citas/", params or {}, **headers)
+        if user:
+            force_authenticate(request, user=self.user)
+        return CitaViewSet.as_view({"get": "list"})(request)
+
+    def _recorrer(self, params):
+        vistos, response = [], self._list(params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            vistos.extend(c["id"] for c in response.data["results"])
+            if not response.data["next"]:
+                return vistos
+            cursor = parse_qs(urlparse(response.data["next"]).query)["cursor"][0]
+            response = self._list({**params, "cursor": cursor})
+
+    def test_walks_all_rows_in_descending_order_without_repeats(self, mock_get):
+        esperado = list(Cita.objects.order_by("-fecha", "-hora_inicio", "-id").values_list("id", flat=True))
+        self.assertEqual(self._recorrer({}), esperado)
+
+    def test_supports_ascending_order_and_caps_page_size(self, mock_get):
+        response = self._list({"ordering": "fecha,hora_inicio", "page_size": "100"})
+        self.assertEqual(len(response.data["results"]), 4)
+
+        esperado = list(Cita.objects.order_by("fecha", "hora_inicio", "id").values_list("id", flat=True))
+        self.assertEqual(self._recorrer({"ordering": "fecha,hora_inicio"}), esperado)
+
+    def test_rejects_orderings_the_cursor_cannot_follow(self, mock_get):
+        for ordering in ("hora_inicio", "-fecha,hora_inicio", "estado"):
+            response = self._list({"ordering": ordering})
+            self.assertEqual(response.status_code, 400, ordering)
+            self.assertIn("ordering", response.data)
+
+    def test_only_internal_callers_can_opt_out(self, mock_get):
+        interno = self._list({"paginar": "false"}, user=False, HTTP_X_INTERNAL_TOKEN="token-interno")
+        self.assertIsInstance(interno.data, list)
+        self.assertEqual(len(interno.data), 9)
+
+        usuario = self._list({"paginar": "false"})
+        self.assertEqual(len(usuario.data["results"]), 3)
+
+    def test_rejects_tampered_cursor(self, mock_get):
+        self.assertEqual(self._list({"cursor": "no-es-un-cursor"}).status_code, 404)
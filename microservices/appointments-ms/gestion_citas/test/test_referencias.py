@@ -0,0 +1,81 @@
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory
+
+from gestion_citas.utils import reference_cache
+from gestion_citas.views import PATIENTS_MS_URL, STAFF_MS_URL, CitaViewSet, ReferenciaInvalidationView
+
+NOMBRES = {
+    PATIENTS_MS_URL: {"1": "Ana Pérez", "2": "Luis Gómez"},
+    STAFF_MS_URL: {"7": "Dra. Ruiz"},
+}
+
+
+def _respuesta(url, params=None, **kwargs):
+    nombres = NOMBRES.get(url, {})
+    data = {i: {"nombre": nombres.get(i), "nombre_completo": nombres.get(i)} for i in params["ids"].split(",")}
+    return Mock(status_code=200, json=lambda: data)
+
+
+@patch("gestion_citas.utils.bulk_client.requests.get", side_effect=_respuesta)
+class ReferenciasCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache._lru.limpiar()
+        NOMBRES[PATIENTS_MS_URL]["1"] = "Ana Pérez"
+
+    def _enriquecer(self, *citas):
+        return CitaViewSet()._enrich_data([dict(c) for c in citas])
+
+    def test_second_listing_is_served_from_cache(self, mock_get):
+        cita = {"paciente_id": 1, "profesional_id": 7}
+        self._enriquecer(cita)
+        self.assertEqual(mock_get.call_count, 2)
+
+        citas = self._enriquecer(cita)
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(citas[0]["paciente_nombre"], "Ana Pérez")
+        self.assertEqual(citas[0]["profesional_nombre"], "Dra. Ruiz")
+
+        # Otro proceso: LRU vacío, pero la caché compartida sigue sirviendo
+        reference_cache._lru.limpiar()
+        self._enriquecer(cita)
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_only_missing_ids_are_requested(self, mock_get):
+        self._enriquecer({"paciente_id": 1})
+        mock_get.reset_mock()
+
+        citas = self._enriquecer({"paciente_id": 1}, {"paciente_id": 2})
+
+        mock_get.assert_called_once()
+        self.assertEqual(mock_get.call_args.kwargs["params"], {"ids": "2"})
+        self.assertEqual([c["paciente_nombre"] for c in citas], ["Ana Pérez", "Luis Gómez"])
+
+    def test_invalidation_endpoint_forces_refetch(self, mock_get):
+        self._enriquecer({"paciente_id": 1})
+        NOMBRES[PATIENTS_MS_URL]["1"] = "Ana Pérez de Ruiz"
+
+        request = APIRequestFactory().post(
+            "/api/v1/internal/referencias/invalidar/",
+            {"entidad": "pacientes", "ids": [1]},
+            format="json",
+            HTTP_X_INTERNAL_TOKEN="secreto",
+        )
+        with self.settings(INTERNAL_SERVICE_TOKEN="secreto"):
+            response = ReferenciaInvalidationView.as_view()(request)
+        self.assertEqual(response.status_code, 204)
+
+        citas = self._enriquecer({"paciente_id": 1})
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(citas[0]["paciente_nombre"], "Ana Pérez de Ruiz")
+
+    def test_invalidation_requires_internal_token(self, mock_get):
+        request = APIRequestFactory().post(
+            "/api/v1/internal/referencias/invalidar/", {"entidad": "pacientes", "ids": [1]}, format="json"
+        )
+        with self.settings(INTERNAL_SERVICE_TOKEN="secreto"):
+            response = ReferenciaInvalidationView.as_view()(request)
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,157 @@
+import importlib
+import threading
+from datetime import date, time, timedelta
+from unittest import skipUnless
+from unittest.mock import Mock, patch
+
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from gestion_citas.constraints import MENSAJE_CRUCE_MEDICO
+from gestion_citas.models import Cita
+from gestion_citas.utils import config_cache, reference_cache
+from gestion_citas.views import SERVICES_MS_URL, CitaViewSet
+
+
+@patch("gestion_citas.views.notificar_cambio_agenda")
+@patch("gestion_citas.views.audit_log")
+class ReservaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        config_cache.limpiar()
+        reference_cache._lru.limpiar()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(username="recepcion", password="x", is_superuser=True)
+        self.fecha = (date.today() + timedelta(days=3)).isoformat()
+        self.llamadas = []
+        self.eventos = []
+
+    def tearDown(self):
+        config_cache.limpiar()
+
+    def _respuesta(self, url, **kwargs):
+        self.eventos.append("red")
+        self.llamadas.append(url)
+        if url.startswith(SERVICES_MS_URL):
+            return Mock(status_code=200, json=lambda: {"5": {"nombre": "Consulta", "duracion": 30}})
+        return Mock(status_code=200, json=lambda: {"id": 1, "user_id": None, "tipo_usuario": None})
+
+    def _crear(self, hora, paciente_id=1):
+        request = self.factory.post(
+            "/api/v1/citas/",
+            {
+                "paciente_id": paciente_id,
+                "profesional_id": 7,
+                "servicio_id": 5,
+                "fecha": self.fecha,
+                "hora_inicio": hora,
+            },
+            format="json",
+        )
+        force_authenticate(request, user=self.user)
+        return CitaViewSet.as_view({"post": "create"})(request)
+
+    def test_lookups_run_concurrently_before_the_transaction(self, mock_audit, mock_agenda):
+        config_cache.obtener()  # el get_or_create de la configuración también abre un atomic
+        atomic = transaction.atomic
+
+        # Cada consulta espera a la otra: solo pasan si las dos están en curso a la vez
+        barrera = threading.Barrier(2, timeout=5)
+
+        def respuesta_en_paralelo(url, **kwargs):
+            barrera.wait()
+            return self._respuesta(url, **kwargs)
+
+        def atomic_registrado(*args, **kwargs):
+            self.eventos.append("transaccion")
+            return atomic(*args, **kwargs)
+
+        with (
+            patch("gestion_citas.views.requests.get", side_effect=respuesta_en_paralelo),
+            patch("gestion_citas.views.transaction.atomic", side_effect=atomic_registrado),
+        ):
+            response = self._crear("09:00")
+
+        self.assertFalse(barrera.broken)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Cita.objects.get().hora_fin.isoformat(), "09:30:00")
+        self.assertEqual(len(self.llamadas), 2)
+        # Las dos consultas terminan antes de abrir cualquier transacción
+        self.assertEqual(self.eventos[:3], ["red", "red", "transaccion"])
+        self.assertNotIn("red", self.eventos[2:])
+        self.assertTrue(any("perfil-reserva" in url for url in self.llamadas))
+
+    def test_service_profile_is_cached_between_bookings(self, mock_audit, mock_agenda):
+        with patch("gestion_citas.views.requests.get", side_effect=self._respuesta):
+            self._crear("09:00")
+            self.llamadas.clear()
+            response = self._crear("11:00")
+
+        # El límite diario (1 por defecto) rechaza la segunda, pero ya después de las consultas
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.llamadas), 1)
+        self.assertEqual([url for url in self.llamadas if url.startswith(SERVICES_MS_URL)], [])
+
+    def test_overlapping_booking_for_the_professional_is_a_conflict(self, mock_audit, mock_agenda):
+        with patch("gestion_citas.views.requests.get", side_effect=self._respuesta):
+            self.assertEqual(self._crear("09:00").status_code, 201)
+            response = self._crear("09:15", paciente_id=2)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["detalle"], MENSAJE_CRUCE_MEDICO)
+
+    def test_cita_must_end_after_it_starts(self, mock_audit, mock_agenda):
+        with patch("gestion_citas.views.requests.get", side_effect=self._respuesta):
+            response = self._crear("23:45")
+            self.assertEqual(response.status_code, 400)
+            cita = self._crear("09:00")
+
+        request = self.factory.patch(f"/api/v1/citas/{cita.data['id']}/", {"hora_fin": "08:30"}, format="json")
+        force_authenticate(request, user=self.user)
+        response = CitaViewSet.as_view({"patch": "partial_update"})(request, pk=cita.data["id"])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("hora_fin", response.data)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Cita.objects.filter(pk=cita.data["id"]).update(hora_fin="08:00")
+
+    @skipUnless(connection.vendor == "sqlite", "Desactiva los CHECK con un PRAGMA de SQLite")
+    def test_migration_repairs_inverted_ranges(self, mock_audit, mock_agenda):
+        migracion = importlib.import_module("gestion_citas.migrations.0018_cita_sin_cruces")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA ignore_check_constraints = ON")
+            try:
+                pasada = Cita.objects.create(
+                    paciente_id=1, profesional_id=7, fecha=self.fecha, hora_inicio="23:50", hora_fin="00:10"
+                )
+                vacia = Cita.objects.create(
+                    paciente_id=2, profesional_id=7, fecha=self.fecha, hora_inicio="10:00", hora_fin="10:00"
+                )
+            finally:
+                cursor.execute("PRAGMA ignore_check_constraints = OFF")
+
+        migracion.reparar_horarios(django_apps, None)
+
+        pasada.refresh_from_db()
+        vacia.refresh_from_db()
+        self.assertEqual(pasada.hora_fin, time.max)
+        self.assertEqual(vacia.hora_fin.isoformat(), "10:20:00")
+
+    @patch("gestion_citas.views.usa_restricciones_exclusion", return_value=True)
+    def test_exclusion_constraint_violation_maps_to_conflict(self, _, mock_audit, mock_agenda):
+        violacion = IntegrityError(
+            'conflicting key value violates exclusion constraint "gestion_citas_cita_sin_cruces"'
+        )
+        with (
+            patch("gestion_citas.views.requests.get", side_effect=self._respuesta),
+            patch.object(Cita.objects, "create", side_effect=violacion),
+        ):
+            response = self._crear("09:00")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["detalle"], MENSAJE_CRUCE_MEDICO)
+        mock_audit.assert_not_called()
@@ -0,0 +1,153 @@
+import threading
+from datetime import date, time, timedelta
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from gestion_citas.models import Cita
+from gestion_citas.utils import config_cache, reference_cache, slot_holds
+from gestion_citas.views import MENSAJE_HORARIO_RESERVADO, SERVICES_MS_URL, CitaViewSet
+
+
+def _respuesta(url, **kwargs):
+    if url.startswith(SERVICES_MS_URL):
+        return Mock(status_code=200, json=lambda: {"5": {"nombre": "Consulta", "duracion": 30}})
+    return Mock(status_code=200, json=lambda: {"id": 1, "user_id": None, "tipo_usuario": None})
+
+
+@override_settings(INTERNAL_SERVICE_TOKEN="token-interno")
+@patch("gestion_citas.views.notificar_cambio_agenda")
+@patch("gestion_citas.views.audit_log")
+@patch("gestion_citas.views.requests.get", side_effect=_respuesta)
+class ReservaTemporalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        config_cache.limpiar()
+        reference_cache._lru.limpiar()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(username="recepcion", password="x", is_superuser=True)
+        self.fecha = date.today() + timedelta(days=3)
+
+    def tearDown(self):
+        config_cache.limpiar()
+
+    def _tomar(self, hora="09:00", token=None):
+        data = {"profesional_id": 7, "fecha": self.fecha.isoformat(), "hora_inicio": hora, "servicio_id": 5}
+        if token:
+            data["token"] = token
+        request = self.factory.post("/api/v1/citas/reservas/", data, format="json")
+        force_authenticate(request, user=self.user)
+        return CitaViewSet.as_view({"post": "reservas"})(request)
+
+    def _crear(self, hora="09:00", paciente_id=1, reserva_token=None):
+        data = {
+            "paciente_id": paciente_id,
+            "profesional_id": 7,
+            "servicio_id": 5,
+            "fecha": self.fecha.isoformat(),
+            "hora_inicio": hora,
+        }
+        if reserva_token:
+            data["reserva_token"] = reserva_token
+        request = self.factory.post("/api/v1/citas/", data, format="json")
+        force_authenticate(request, user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return CitaViewSet.as_view({"post": "create"})(request)
+
+    def test_first_client_wins_the_slot(self, mock_get, mock_audit, mock_agenda):
+        primero = self._tomar()
+        self.assertEqual(primero.status_code, 201)
+        self.assertEqual((primero.data["hora_inicio"], primero.data["hora_fin"]), ("09:00", "09:30"))
+        mock_agenda.assert_called_with(7, [self.fecha], vigencia=180)
+
+        # Otro cliente pierde, también si el horario solo se cruza
+        self.assertEqual(self._tomar().status_code, 409)
+        self.assertEqual(self._tomar("09:15").data["detalle"], MENSAJE_HORARIO_RESERVADO)
+        # El dueño renueva su hold
+        self.assertEqual(self._tomar(token=primero.data["token"]).status_code, 201)
+
+        request = self.factory.delete(f"/api/v1/citas/reservas/?token={primero.data['token']}")
+        force_authenticate(request, user=self.user)
+        self.assertEqual(CitaViewSet.as_view({"delete": "reservas"})(request).status_code, 204)
+        self.assertEqual(slot_holds.vigentes([7], [self.fecha]), [])
+        self.assertEqual(self._tomar().status_code, 201)
+
+    def test_moving_to_another_slot_releases_the_previous_one(self, mock_get, mock_audit, mock_agenda):
+        token = self._tomar("09:00").data["token"]
+        self.assertEqual(self._tomar("10:00", token=token).status_code, 201)
+
+        self.assertEqual([h["hora_inicio"] for h in slot_holds.vigentes([7], [self.fecha])], ["10:00"])
+        # El horario anterior queda libre para otro cliente
+        self.assertEqual(self._tomar("09:00").status_code, 201)
+
+        # Consumir o soltar el token libera el horario nuevo
+        slot_holds.liberar(token)
+        self.assertEqual([h["hora_inicio"] for h in slot_holds.vigentes([7], [self.fecha])], ["09:00"])
+
+    def test_overlapping_holds_with_different_start_are_exclusive(self, mock_get, mock_audit, mock_agenda):
+        self.assertIsNotNone(slot_holds.tomar(7, self.fecha, time(8), time(8, 30), "a"))
+        self.assertIsNone(slot_holds.tomar(7, self.fecha, time(8, 15), time(8, 45), "b"))
+        self.assertIsNotNone(slot_holds.tomar(7, self.fecha, time(8, 30), time(9), "b"))
+
+    def test_concurrent_overlapping_holds_have_a_single_winner(self, mock_get, mock_audit, mock_agenda):
+        horarios = [(time(10), time(10, 30)), (time(10, 15), time(10, 45))]
+        barrera = threading.Barrier(len(horarios), timeout=5)
+        ganadores = []
+
+        def tomar(inicio, fin, token):
+            barrera.wait()
+            if slot_holds.tomar(7, self.fecha, inicio, fin, token):
+                ganadores.append(token)
+
+        hilos = [threading.Thread(target=tomar, args=(*h, f"t{i}")) for i, h in enumerate(horarios)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(len(ganadores), 1)
+        self.assertEqual([h["token"] for h in slot_holds.vigentes([7], [self.fecha])], ganadores)
+
+    def test_occupancy_projection_includes_holds(self, mock_get, mock_audit, mock_agenda):
+        self._tomar()
+        params = {
+            "profesional_id__in": "7",
+            "fecha__gte": self.fecha.isoformat(),
+            "fecha__lte": self.fecha.isoformat(),
+        }
+        request = self.factory.get("/api/v1/citas/ocupacion/", params, HTTP_X_INTERNAL_TOKEN="token-interno")
+        self.assertEqual(CitaViewSet.as_view({"get": "ocupacion"})(request).data, [])
+
+        request = self.factory.get(
+            "/api/v1/citas/ocupacion/", {**params, "incluir_reservas": 1}, HTTP_X_INTERNAL_TOKEN="token-interno"
+        )
+        response = CitaViewSet.as_view({"get": "ocupacion"})(request)
+
+        self.assertEqual(
+            response.data,
+            [
+                {
+                    "profesional_id": 7,
+                    "fecha": self.fecha.isoformat(),
+                    "hora_inicio": "09:00:00",
+                    "hora_fin": "09:30:00",
+                    "estado": "RESERVADA",
+                }
+            ],
+        )
+
+    def test_create_consumes_own_hold_and_rejects_others(self, mock_get, mock_audit, mock_agenda):
+        token = self._tomar().data["token"]
+
+        response = self._crear(paciente_id=2)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Cita.objects.exists())
+
+        response = self._crear(reserva_token=token)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(slot_holds.vigentes([7], [self.fecha]), [])
+        # Ya es una cita: el horario sigue ocupado para los demás
+        self.assertEqual(self._tomar().status_code, 409)
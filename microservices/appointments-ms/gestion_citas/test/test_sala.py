@@ -0,0 +1,89 @@
+import threading
+import time
+from datetime import date
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from gestion_citas.models import Cita
+from gestion_citas.utils import reference_cache, sala_feed
+from gestion_citas.views import PATIENTS_MS_URL, CitaViewSet
+
+
+def _respuesta(url, params=None, **kwargs):
+    if url == PATIENTS_MS_URL:
+        data = {"1": {"nombre_completo": "Ana María Pérez Ruiz", "numero_documento": "1.020.345"}}
+    else:
+        data = {"7": {"nombre": "Ruiz"}}
+    return Mock(status_code=200, json=lambda: data)
+
+
+@patch("gestion_citas.views.notificar_cambio_agenda")
+@patch("gestion_citas.views.audit_log")
+@patch("gestion_citas.utils.bulk_client.requests.get", side_effect=_respuesta)
+class SalaEsperaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reference_cache._lru.limpiar()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(username="recepcion", password="x", is_staff=True)
+        self.hoy = date.today()
+        base = {"profesional_id": 7, "paciente_id": 1, "lugar_id": 3, "fecha": self.hoy, "hora_fin": "09:00"}
+        self.en_sala = Cita.objects.create(estado="EN_SALA", hora_inicio="08:00", **base)
+        Cita.objects.create(estado="ACEPTADA", hora_inicio="08:20", **base)
+
+    def _sala(self, **params):
+        request = self.factory.get("/api/v1/citas/sala/", {"fecha": self.hoy.isoformat(), **params})
+        force_authenticate(request, user=self.user)
+        return CitaViewSet.as_view({"get": "sala"})(request)
+
+    def _cambiar_estado(self, cita, estado):
+        request = self.factory.patch(f"/api/v1/citas/{cita.pk}/", {"estado": estado}, format="json")
+        force_authenticate(request, user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = CitaViewSet.as_view({"patch": "partial_update"})(request, pk=cita.pk)
+        self.assertEqual(response.status_code, 200)
+
+    def test_snapshot_only_carries_waiting_room_fields(self, mock_get, mock_audit, mock_agenda):
+        response = self._sala(lugar_id=3)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["version"], 0)
+        self.assertEqual(len(response.data["citas"]), 1)
+        cita = response.data["citas"][0]
+        self.assertEqual(
+            set(cita),
+            {"id", "estado", "hora_inicio", "paciente_nombre", "paciente_doc", "profesional_nombre", "updated_at"},
+        )
+        self.assertEqual(cita["paciente_nombre"], "Ana María")
+        self.assertEqual(cita["paciente_doc"], "345")
+        self.assertEqual(cita["profesional_nombre"], "Ruiz")
+
+    def test_returns_no_content_when_nothing_changed(self, mock_get, mock_audit, mock_agenda):
+        response = self._sala(version=0, espera=0)
+        self.assertEqual(response.status_code, 204)
+        mock_get.assert_not_called()
+
+    def test_call_and_recall_bump_the_version(self, mock_get, mock_audit, mock_agenda):
+        self._cambiar_estado(self.en_sala, "LLAMADO")
+        self.assertEqual(sala_feed.version(self.hoy, 3), 1)
+        self.assertEqual(sala_feed.version(self.hoy), 1)
+
+        self._cambiar_estado(self.en_sala, "LLAMADO")
+        response = self._sala(lugar_id=3, version=1, espera=0)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["version"], 2)
+        self.assertEqual(response.data["citas"][0]["estado"], "LLAMADO")
+
+    def test_waiting_screen_wakes_up_on_change(self, mock_get, mock_audit, mock_agenda):
+        threading.Timer(0.2, sala_feed.publicar, args=(self.hoy, 3)).start()
+
+        inicio = time.monotonic()
+        version = sala_feed.esperar_cambio(self.hoy, 3, desde=0, plazo=5, intervalo=0.05)
+
+        self.assertEqual(version, 1)
+        self.assertLess(time.monotonic() - inicio, 1)
@@ -0,0 +1,138 @@
+from datetime import date, time, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from gestion_citas.models import Cita, ResumenInasistencias
+from gestion_citas.utils import config_cache
+from gestion_citas.views import CitaViewSet
+
+
+@patch("gestion_citas.views.notificar_cambio_agenda")
+@patch("gestion_citas.views.audit_log")
+@patch("gestion_citas.views.audit_log_lote")
+class TransicionesMasivasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        config_cache.limpiar()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(username="recepcion", password="x")
+        self.ayer = date.today() - timedelta(days=1)
+
+    def tearDown(self):
+        config_cache.limpiar()
+
+    def _cita(self, paciente_id, fecha, hora=8, estado="ACEPTADA"):
+        return Cita.objects.create(
+            paciente_id=paciente_id,
+            profesional_id=7,
+            fecha=fecha,
+            hora_inicio=time(hora),
+            hora_fin=time(hora, 20),
+            estado=estado,
+        )
+
+    def _transiciones(self, datos):
+        request = self.factory.post("/api/v1/citas/transiciones/", datos, format="json")
+        force_authenticate(request, user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return CitaViewSet.as_view({"post": "transiciones"})(request)
+
+    def test_applies_valid_transitions_and_reports_the_rest(self, mock_lote, mock_audit, mock_agenda):
+        validas = [self._cita(1, self.ayer, hora=8), self._cita(2, self.ayer, hora=9)]
+        futura = self._cita(3, date.today() + timedelta(days=2))
+        realizada = self._cita(4, self.ayer, hora=10, estado="REALIZADA")
+
+        ids = [c.pk for c in validas] + [futura.pk, realizada.pk, 999]
+        config_cache.obtener()
+        # Lectura con bloqueo, bulk_update y recuento de inasistencias (más el savepoint),
+        # un UPDATE por fila de estadísticas del día (más el alta de la que no existía)
+        # y el INSERT del histórico al confirmar
+        with self.assertNumQueries(12):
+            response = self._transiciones({"ids": ids, "estado": "NO_ASISTIO"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["actualizadas"], [c.pk for c in validas])
+        self.assertEqual(
+            {r["id"]: r["detalle"] for r in response.data["rechazadas"]},
+            {
+                futura.pk: "No puedes marcar asistencia futura.",
+                realizada.pk: "Cita en estado final.",
+                999: "La cita no existe.",
+            },
+        )
+        self.assertEqual(Cita.objects.filter(estado="NO_ASISTIO").count(), 2)
+        self.assertEqual(set(ResumenInasistencias.objects.values_list("paciente_id", flat=True)), {1, 2})
+
+        # Un solo lote de auditoría, sin los POST por cita de update()
+        mock_lote.assert_called_once()
+        self.assertEqual([e["metadata"]["to"] for e in mock_lote.call_args.args[0]], ["NO_ASISTIO"] * 2)
+        mock_audit.assert_not_called()
+        mock_agenda.assert_called_once_with(7, {self.ayer})
+
+    def test_transition_that_needs_a_reason(self, mock_lote, mock_audit, mock_agenda):
+        cita = self._cita(1, date.today() + timedelta(days=2))
+
+        response = self._transiciones({"ids": [cita.pk], "estado": "CANCELADA"})
+        self.assertEqual(response.data["rechazadas"][0]["detalle"], "La transición requiere un motivo.")
+
+        response = self._transiciones({"ids": [cita.pk], "estado": "CANCELADA", "motivo": "Profesional incapacitado"})
+        cita.refresh_from_db()
+        self.assertEqual(response.data["actualizadas"], [cita.pk])
+        self.assertEqual((cita.estado, cita.nota_interna), ("CANCELADA", "Profesional incapacitado"))
+
+    def test_rejects_unknown_state(self, mock_lote, mock_audit, mock_agenda):
+        response = self._transiciones({"ids": [1], "estado": "PERDIDA"})
+        self.assertEqual(response.status_code, 400)
+
+
+@patch("gestion_citas.management.commands.barrer_inasistencias.audit_log_lote")
+class BarrerInasistenciasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        config_cache.limpiar()
+
+    def tearDown(self):
+        config_cache.limpiar()
+
+    def _cita(self, paciente_id, fecha, estado="ACEPTADA"):
+        return Cita.objects.create(
+            paciente_id=paciente_id,
+            profesional_id=7,
+            fecha=fecha,
+            hora_inicio=time(8),
+            hora_fin=time(8, 20),
+            estado=estado,
+        )
+
+    def test_sweeps_finished_accepted_citas(self, mock_lote):
+        ayer = date.today() - timedelta(days=1)
+        vencidas = [self._cita(1, ayer), self._cita(1, ayer - timedelta(days=3)), self._cita(2, ayer)]
+        manana = self._cita(3, date.today() + timedelta(days=1))
+        realizada = self._cita(4, ayer, estado="REALIZADA")
+
+        call_command("barrer_inasistencias", "--batch", "2", stdout=StringIO())
+
+        self.assertEqual(
+            set(Cita.objects.filter(estado="NO_ASISTIO").values_list("id", flat=True)), {c.pk for c in vencidas}
+        )
+        manana.refresh_from_db()
+        realizada.refresh_from_db()
+        self.assertEqual((manana.estado, realizada.estado), ("ACEPTADA", "REALIZADA"))
+        self.assertEqual(ResumenInasistencias.objects.get(paciente_id=1).total, 2)
+        self.assertEqual(len(mock_lote.call_args.args[0]), 3)
+
+    def test_dry_run_does_not_modify(self, mock_lote):
+        self._cita(1, date.today() - timedelta(days=1))
+        salida = StringIO()
+
+        call_command("barrer_inasistencias", "--dry-run", stdout=salida)
+
+        self.assertIn("citas=1", salida.getvalue())
+        self.assertFalse(Cita.objects.filter(estado="NO_ASISTIO").exists())
+        mock_lote.assert_not_called()
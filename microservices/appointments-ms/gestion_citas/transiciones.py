@@ -0,0 +1,133 @@
+"""
+Cambios de estado masivos.
+
+- aplicar(): varias citas a un mismo estado (recepción al cierre del día, o
+  cancelación cuando un profesional no viene). Valida cada cita contra el
+  workflow compilado con las reglas de CitaViewSet.update() y guarda todas
+  con un bulk_update.
+- barrer_inasistencias(): pasa a NO_ASISTIO las citas ACEPTADA que ya
+  terminaron, con un UPDATE por lote (comando barrer_inasistencias).
+"""
+
+import copy
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import estadisticas, historial, inasistencias
+from .models import Cita
+from .workflow import WorkflowCompilado
+
+ESTADO_INASISTENCIA = inasistencias.ESTADO_INASISTENCIA
+
+# Citas máximas por solicitud de cambio masivo
+MAX_TRANSICIONES = 500
+
+
+def validar(cita: Cita, estado: str, workflow: WorkflowCompilado, es_admin: bool, motivo=None, ahora=None):
+    """
+    Motivo del rechazo de la transición, o None si es válida.
+    """
+    if cita.estado == estado:
+        return "La cita ya está en ese estado."
+    if workflow.es_final(cita.estado) and not es_admin:
+        return "Cita en estado final."
+    if not workflow.permite(cita.estado, estado) and not es_admin:
+        return f"Transición no permitida: {cita.estado} -> {estado}"
+    if workflow.requiere_motivo(cita.estado, estado) and not motivo:
+        return "La transición requiere un motivo."
+    if estado == ESTADO_INASISTENCIA:
+        inicio = timezone.make_aware(datetime.combine(cita.fecha, cita.hora_inicio))
+        if inicio > (ahora or timezone.now()):
+            return "No puedes marcar asistencia futura."
+    return None
+
+
+def aplicar(
+    ids, estado: str, *, workflow: WorkflowCompilado, es_admin: bool, usuario_id=None, motivo: Optional[str] = None
+) -> Tuple[List[Tuple[Cita, Cita]], List[dict]]:
+    """
+    Aplica `estado` a las citas válidas dentro de la transacción en curso.
+    Devuelve ([(anterior, actual), ...], [{"id", "detalle"}, ...]).
+    """
+    ahora = timezone.now()
+    # Orden por pk: dos cambios masivos concurrentes bloquean filas en el mismo orden
+    citas = {c.pk: c for c in Cita.objects.select_for_update().filter(pk__in=ids).order_by("pk")}
+
+    cambios, rechazadas = [], []
+    for pk in ids:
+        cita = citas.get(pk)
+        if cita is None:
+            rechazadas.append({"id": pk, "detalle": "La cita no existe."})
+            continue
+        detalle = validar(cita, estado, workflow, es_admin, motivo, ahora)
+        if detalle:
+            rechazadas.append({"id": pk, "detalle": detalle})
+            continue
+
+        anterior = copy.copy(cita)
+        cita.estado = estado
+        cita.usuario_id = usuario_id
+        cita.updated_at = ahora
+        if motivo:
+            cita.nota_interna = f"{cita.nota_interna or ''} | {motivo}".strip(" |")
+        cambios.append((anterior, cita))
+
+    if cambios:
+        Cita.objects.bulk_update([c for _, c in cambios], ["estado", "usuario_id", "updated_at", "nota_interna"])
+        inasistencias.recalcular(
+            *(
+                anterior.paciente_id
+                for anterior, cita in cambios
+                if ESTADO_INASISTENCIA in (anterior.estado, cita.estado)
+            )
+        )
+        estadisticas.actualizar_lote(cambios)
+    return cambios, rechazadas
+
+
+def barrer_inasistencias(limite: datetime, desde: str = "ACEPTADA", lote: int = 1000, simular: bool = False):
+    """
+    Pasa a NO_ASISTIO las citas en estado `desde` que terminaron antes de
+    `limite` (hora local). Devuelve las filas afectadas como dicts con
+    id, paciente_id, profesional_id, servicio_id, lugar_id, fecha, hora_inicio,
+    activo y created_at.
+    """
+    limite = timezone.localtime(limite)
+    terminadas = Cita.objects.filter(
+        Q(fecha__lt=limite.date()) | Q(fecha=limite.date(), hora_fin__lte=limite.time()),
+        estado=desde,
+    )
+    campos = (
+        "id",
+        "paciente_id",
+        "profesional_id",
+        "servicio_id",
+        "lugar_id",
+        "fecha",
+        "hora_inicio",
+        "activo",
+        "created_at",
+    )
+    if simular:
+        return list(terminadas.values(*campos))
+
+    afectadas = []
+    while True:
+        with transaction.atomic():
+            filas = list(terminadas.select_for_update().order_by("id").values(*campos)[:lote])
+            if not filas:
+                break
+            Cita.objects.filter(pk__in=[f["id"] for f in filas], estado=desde).update(
+                estado=ESTADO_INASISTENCIA, updated_at=timezone.now()
+            )
+            inasistencias.recalcular(*(f["paciente_id"] for f in filas))
+            estadisticas.actualizar_lote(
+                (Cita(**f, estado=desde), Cita(**f, estado=ESTADO_INASISTENCIA)) for f in filas
+            )
+            historial.registrar(*(Cita(**f, estado=ESTADO_INASISTENCIA) for f in filas))
+        afectadas.extend(filas)
+    return afectadas
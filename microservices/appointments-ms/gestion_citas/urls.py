@@ -6,6 +6,7 @@ from .views import (
     ConfiguracionViewSet,
     HistoricoCitaViewSet,
     NotaMedicaViewSet,
+    ReferenciaInvalidationView,
 )
 
 router = DefaultRouter()
@@ -15,5 +16,6 @@ router.register(r"historico", HistoricoCitaViewSet)
 router.register(r"citas/configuracion", ConfiguracionViewSet)
 
 urlpatterns = [
+    path("internal/referencias/invalidar/", ReferenciaInvalidationView.as_view(), name="referencias-invalidar"),
     path("", include(router.urls)),
 ]
@@ -1,12 +1,15 @@
 import os
 import logging
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Union
 
 import requests
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_AUDIT_URL = "http://auth-ms:8000/api/v1/users/admin/auditoria/registrar/"
+DEFAULT_AUDIT_BATCH_URL = "http://auth-ms:8000/api/v1/users/admin/auditoria/registrar-lote/"
+# Eventos por POST en audit_log_lote (auth-ms acepta hasta 500)
+MAX_EVENTOS_LOTE = 500
 SENSITIVE_KEYS = {"password", "token", "refresh", "access", "secret"}
 
 # Para evitar meter payloads gigantes a la DB (y al auth-ms)
@@ -75,7 +78,7 @@ def _safe_str(value: Any) -> Optional[str]:
         return None
 
 
-def audit_log(
+def _construir_payload(
     *,
     descripcion: str,
     modulo: str,
@@ -86,23 +89,8 @@ def audit_log(
     metadata: Optional[Dict[str, Any]] = None,
     ip: Optional[str] = None,
     user_agent: Optional[str] = None,
-    timeout: int = 2,
     request_id: Optional[str] = None,
-) -> bool:
-    """
-    Emite evento a auth-ms. Si falla, NO rompe flujo.
-    Ajustes:
-    - Normaliza usuario_id/recurso_id
-    - Agrega Content-Type
-    - No envía campos None (reduce errores de validación en serializer)
-    """
-    audit_url = os.getenv("AUDIT_URL", DEFAULT_AUDIT_URL).strip()
-    token = os.getenv("INTERNAL_AUDIT_TOKEN", "").strip()
-
-    if not token:
-        logger.warning("[audit_log] INTERNAL_AUDIT_TOKEN no configurado. Auditoría deshabilitada.")
-        return False
-
+) -> Dict[str, Any]:
     safe_meta = _sanitize(metadata or {})
 
     # tag del emisor
@@ -136,6 +124,50 @@ def audit_log(
     if rid is not None:
         payload["recurso_id"] = rid
 
+    return payload
+
+
+def audit_log(
+    *,
+    descripcion: str,
+    modulo: str,
+    accion: Optional[str] = None,
+    usuario_id: Optional[Union[int, str]] = None,
+    recurso: Optional[str] = None,
+    recurso_id: Optional[Union[str, int]] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    ip: Optional[str] = None,
+    user_agent: Optional[str] = None,
+    timeout: int = 2,
+    request_id: Optional[str] = None,
+) -> bool:
+    """
+    Emite evento a auth-ms. Si falla, NO rompe flujo.
+    Ajustes:
+    - Normaliza usuario_id/recurso_id
+    - Agrega Content-Type
+    - No envía campos None (reduce errores de validación en serializer)
+    """
+    audit_url = os.getenv("AUDIT_URL", DEFAULT_AUDIT_URL).strip()
+    token = os.getenv("INTERNAL_AUDIT_TOKEN", "").strip()
+
+    if not token:
+        logger.warning("[audit_log] INTERNAL_AUDIT_TOKEN no configurado. Auditoría deshabilitada.")
+        return False
+
+    payload = _construir_payload(
+        descripcion=descripcion,
+        modulo=modulo,
+        accion=accion,
+        usuario_id=usuario_id,
+        recurso=recurso,
+        recurso_id=recurso_id,
+        metadata=metadata,
+        ip=ip,
+        user_agent=user_agent,
+        request_id=request_id,
+    )
+
     headers = {
         "X-INTERNAL-TOKEN": token,              # ✅ coincide con Auth
         "Content-Type": "application/json",     # ✅ ayuda con proxies/validaciones
@@ -165,4 +197,38 @@ def audit_log(
 
     except requests.RequestException as e:
         logger.warning("[audit_log] Error enviando auditoría: %s", str(e))
-        return False
\ No newline at end of file
+        return False
+
+
+def audit_log_lote(eventos: List[Dict[str, Any]], *, timeout: int = 5, request_id: Optional[str] = None) -> int:
+    """
+    Emite varios eventos (mismos argumentos que audit_log) en POSTs de hasta
+    MAX_EVENTOS_LOTE. Devuelve cuántos quedaron registrados; si falla, NO rompe flujo.
+    """
+    if not eventos:
+        return 0
+
+    audit_url = os.getenv("AUDIT_BATCH_URL", DEFAULT_AUDIT_BATCH_URL).strip()
+    token = os.getenv("INTERNAL_AUDIT_TOKEN", "").strip()
+    if not token:
+        logger.warning("[audit_log_lote] INTERNAL_AUDIT_TOKEN no configurado. Auditoría deshabilitada.")
+        return 0
+
+    headers = {"X-INTERNAL-TOKEN": token, "Content-Type": "application/json"}
+    if request_id:
+        headers["X-Request-ID"] = request_id
+
+    payloads = [_construir_payload(request_id=request_id, **evento) for evento in eventos]
+    registrados = 0
+    for i in range(0, len(payloads), MAX_EVENTOS_LOTE):
+        lote = payloads[i : i + MAX_EVENTOS_LOTE]
+        try:
+            resp = requests.post(audit_url, json={"eventos": lote}, headers=headers, timeout=timeout)
+        except requests.RequestException as e:
+            logger.warning("[audit_log_lote] Error enviando auditoría: %s", str(e))
+            continue
+        if resp.status_code in (200, 201):
+            registrados += len(lote)
+        else:
+            logger.warning("[audit_log_lote] Respuesta no OK (%s) %s", resp.status_code, audit_url)
+    return registrados
@@ -0,0 +1,96 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Compartido entre requests: cada listado usa a lo sumo un hilo por fuente
+_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="bulk-info")
+
+
+def _fetch(url: str, ids: Iterable[str], timeout: float, headers: Mapping[str, str]) -> Tuple[dict, float, str]:
+    inicio = time.monotonic()
+    try:
+        r = requests.get(url, params={"ids": ",".join(ids)}, timeout=timeout, headers=dict(headers))
+        estado = "ok" if r.status_code == 200 else f"http_{r.status_code}"
+        data = r.json() if r.status_code == 200 else {}
+    except Exception as e:
+        logger.warning("[bulk_client] Error consultando %s: %s", url, str(e))
+        estado, data = "error", {}
+    return (data if isinstance(data, dict) else {}), (time.monotonic() - inicio) * 1000, estado
+
+
+def obtener_bulk_paralelo(
+    fuentes: Mapping[str, Tuple[str, Iterable[str]]],
+    *,
+    plazo: float = 2.0,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+    """
+    Consulta varios endpoints bulk-info a la vez con un plazo común.
+
+    - fuentes: {nombre: (url, ids)}; las fuentes sin ids no generan llamada.
+    - Devuelve ({nombre: datos}, {nombre: {"ms": float, "estado": str}}).
+      Una fuente que falla o no responde dentro del plazo queda con {} y
+      estado "error"/"timeout"/"http_XXX"; las demás se usan igual.
+    """
+    headers = headers or {}
+    inicio = time.monotonic()
+    limite = inicio + plazo
+
+    futuros = {}
+    datos = {}
+    tiempos = {}
+    for nombre, (url, ids) in fuentes.items():
+        ids = sorted({str(i) for i in ids if i and str(i) != "None"})
+        if not ids:
+            datos[nombre] = {}
+            continue
+        futuros[nombre] = _POOL.submit(_fetch, url, ids, plazo, headers)
+
+    for nombre, futuro in futuros.items():
+        try:
+            datos[nombre], ms, estado = futuro.result(timeout=max(0.0, limite - time.monotonic()))
+        except FuturesTimeout:
+            datos[nombre], ms, estado = {}, (time.monotonic() - inicio) * 1000, "timeout"
+            logger.warning("[bulk_client] %s no respondió dentro del plazo (%.1fs)", nombre, plazo)
+        tiempos[nombre] = {"ms": round(ms, 1), "estado": estado}
+
+    return datos, tiempos
+
+
+def ejecutar_en_paralelo(tareas: Mapping[str, Callable[[], Any]], *, plazo: float = 2.0) -> Dict[str, Any]:
+    """
+    Ejecuta varias consultas sin argumentos a la vez con un plazo común.
+    Devuelve {nombre: resultado}; una tarea que falla o no termina a tiempo queda en None.
+    """
+    limite = time.monotonic() + plazo
+    futuros = {nombre: _POOL.submit(tarea) for nombre, tarea in tareas.items()}
+    resultados = {}
+    for nombre, futuro in futuros.items():
+        try:
+            resultados[nombre] = futuro.result(timeout=max(0.0, limite - time.monotonic()))
+        except FuturesTimeout:
+            logger.warning("[bulk_client] %s no respondió dentro del plazo (%.1fs)", nombre, plazo)
+            resultados[nombre] = None
+        except Exception as e:
+            logger.warning("[bulk_client] Error en %s: %s", nombre, str(e))
+            resultados[nombre] = None
+    return resultados
+
+
+def server_timing(tiempos: Mapping[str, Mapping]) -> str:
+    """
+    Valor para la cabecera Server-Timing, p.ej. 'pacientes;dur=12.3, lugares;dur=2000.0;desc="timeout"'.
+    """
+    partes = []
+    for nombre, t in tiempos.items():
+        parte = f"{nombre};dur={t['ms']}"
+        if t["estado"] != "ok":
+            parte += f';desc="{t["estado"]}"'
+        partes.append(parte)
+    return ", ".join(partes)
@@ -0,0 +1,48 @@
+"""
+ConfiguracionGlobal en memoria del proceso, con el workflow ya compilado.
+
+La fila tiene un campo `version` que sube en cada save(). La versión vigente
+se publica en la caché compartida al confirmar la transacción; cada lectura
+solo compara esa llave con la versión en memoria y va a la base de datos
+cuando difieren (o cuando la llave no está).
+"""
+
+import threading
+
+from django.core.cache import cache
+
+from ..workflow import WorkflowCompilado
+
+VERSION_KEY = "config:ver"
+
+_lock = threading.Lock()
+_actual = {"version": None, "config": None, "workflow": None}
+
+
+def publicar_version(version: int):
+    cache.set(VERSION_KEY, version, timeout=None)
+
+
+def obtener():
+    """
+    (config, workflow) vigentes. La instancia se comparte entre requests:
+    solo lectura.
+    """
+    version = cache.get(VERSION_KEY)
+    actual = _actual
+    if version is not None and version == actual["version"]:
+        return actual["config"], actual["workflow"]
+
+    from ..models import ConfiguracionGlobal
+
+    with _lock:
+        config, _ = ConfiguracionGlobal.objects.get_or_create(pk=1)
+        _actual.update(version=config.version, config=config, workflow=WorkflowCompilado(config.workflow_citas))
+        # add y no set: un save() concurrente ya pudo publicar una versión más nueva
+        cache.add(VERSION_KEY, config.version, timeout=None)
+        return config, _actual["workflow"]
+
+
+def limpiar():
+    with _lock:
+        _actual.update(version=None, config=None, workflow=None)
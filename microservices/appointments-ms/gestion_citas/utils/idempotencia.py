@@ -0,0 +1,90 @@
+"""
+Idempotency-Key para la creación de citas.
+
+El cliente manda la misma llave en cada reintento de un POST. La primera
+ejecución deja la llave "en curso" (cache.add atómico) y al terminar guarda
+el hash del cuerpo y la respuesta; los duplicados reciben esa respuesta sin
+volver a correr validaciones, consultas a otros servicios ni auditoría.
+
+- Misma llave con otro cuerpo: 422.
+- Duplicado mientras la primera sigue en curso: 409 (reintentar luego).
+- Respuestas 5xx no se guardan: el siguiente reintento vuelve a ejecutar.
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+HEADER = "Idempotency-Key"
+MAX_LARGO_LLAVE = 255
+# Lo que puede tardar una creación antes de que la marca "en curso" se abandone
+EN_CURSO_TTL = 30
+
+
+def _ttl() -> int:
+    return getattr(settings, "IDEMPOTENCIA_TTL", 3600)
+
+
+def _key(usuario_id, llave) -> str:
+    digest = hashlib.sha256(llave.encode()).hexdigest()[:32]
+    return f"idem:{usuario_id or '-'}:{digest}"
+
+
+def huella(datos) -> str:
+    return hashlib.sha256(json.dumps(datos, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def ejecutar(usuario_id, llave, datos, operacion):
+    """
+    Corre `operacion()` (que devuelve un Response) una sola vez por llave y
+    usuario; los duplicados reciben la respuesta guardada.
+    """
+    if len(llave) > MAX_LARGO_LLAVE:
+        return Response({"detalle": f"{HEADER} demasiado larga."}, status=400)
+
+    key = _key(usuario_id, llave)
+    hash_datos = huella(datos)
+    if not cache.add(key, {"hash": hash_datos, "estado": "en_curso"}, timeout=EN_CURSO_TTL):
+        previa = cache.get(key)
+        if previa is not None:
+            return _repetir(previa, hash_datos)
+        # La marca expiró entre add y get: se vuelve a intentar tomarla
+        return ejecutar(usuario_id, llave, datos, operacion)
+
+    try:
+        response = operacion()
+    except Exception:
+        cache.delete(key)
+        raise
+
+    if response.status_code >= 500:
+        cache.delete(key)
+        return response
+
+    cuerpo = json.loads(JSONRenderer().render(response.data)) if response.data is not None else None
+    cache.set(
+        key,
+        {"hash": hash_datos, "estado": "listo", "status": response.status_code, "data": cuerpo},
+        timeout=_ttl(),
+    )
+    return response
+
+
+def _repetir(previa, hash_datos):
+    if previa["hash"] != hash_datos:
+        return Response(
+            {"detalle": f"La {HEADER} ya se usó con una solicitud diferente."},
+            status=422,
+        )
+    if previa["estado"] == "en_curso":
+        return Response(
+            {"detalle": "La solicitud original aún se está procesando. Intenta de nuevo en unos segundos."},
+            status=409,
+        )
+    response = Response(previa["data"], status=previa["status"])
+    response["Idempotent-Replayed"] = "true"
+    return response
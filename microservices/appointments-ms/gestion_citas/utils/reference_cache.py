@@ -0,0 +1,125 @@
+"""
+Caché de datos de referencia (nombres de pacientes, profesionales, servicios
+y lugares) usados para enriquecer el listado de citas.
+
+Dos niveles:
+- LRU en memoria del proceso, para las pantallas que sondean seguido.
+- Caché de Django (Redis en docker-compose), compartida entre procesos.
+
+Cada entidad tiene una versión en la caché compartida. Invalidar borra las
+llaves compartidas de esos ids y sube la versión, con lo que las entradas del
+LRU de todos los procesos dejan de servir en la siguiente lectura.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+ENTIDADES = ("pacientes", "profesionales", "servicios", "lugares")
+
+# TTL (segundos) por entidad en la caché compartida; los pacientes cambian más seguido
+TTL_POR_DEFECTO = {"pacientes": 600, "profesionales": 3600, "servicios": 3600, "lugares": 86400}
+
+
+def _ttl(entidad: str) -> int:
+    return {**TTL_POR_DEFECTO, **getattr(settings, "REFERENCIAS_TTL", {})}[entidad]
+
+
+def _ver_key(entidad: str) -> str:
+    return f"ref:ver:{entidad}"
+
+
+def _key(entidad: str, ref_id: str) -> str:
+    return f"ref:{entidad}:{ref_id}"
+
+
+class _LRU:
+    def __init__(self):
+        self._datos: "OrderedDict[Tuple[str, str], Tuple[dict, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, entidad: str, ids: Iterable[str], version: int) -> Dict[str, dict]:
+        ahora = time.monotonic()
+        encontrados = {}
+        with self._lock:
+            for ref_id in ids:
+                entrada = self._datos.get((entidad, ref_id))
+                if entrada is None:
+                    continue
+                valor, expira, ver = entrada
+                if expira < ahora or ver != version:
+                    del self._datos[(entidad, ref_id)]
+                    continue
+                self._datos.move_to_end((entidad, ref_id))
+                encontrados[ref_id] = valor
+        return encontrados
+
+    def guardar(self, entidad: str, datos: Mapping[str, dict], version: int):
+        expira = time.monotonic() + min(_ttl(entidad), getattr(settings, "REFERENCIAS_LRU_TTL", 60))
+        maximo = getattr(settings, "REFERENCIAS_LRU_MAX", 5000)
+        with self._lock:
+            for ref_id, valor in datos.items():
+                self._datos[(entidad, ref_id)] = (valor, expira, version)
+                self._datos.move_to_end((entidad, ref_id))
+            while len(self._datos) > maximo:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+
+_lru = _LRU()
+
+
+def versiones(entidades: Iterable[str] = ENTIDADES) -> Dict[str, int]:
+    """Versión vigente de cada entidad (una sola lectura a la caché compartida)."""
+    valores = cache.get_many([_ver_key(e) for e in entidades])
+    return {e: valores.get(_ver_key(e), 0) for e in entidades}
+
+
+def obtener(entidad: str, ids: Iterable[str], version: int) -> Tuple[Dict[str, dict], List[str]]:
+    """
+    ({id: datos} encontrados en LRU o caché compartida, [ids faltantes]).
+    """
+    ids = sorted({str(i) for i in ids if i and str(i) != "None"})
+    encontrados = _lru.obtener(entidad, ids, version)
+
+    pendientes = [i for i in ids if i not in encontrados]
+    if pendientes:
+        compartidos = cache.get_many([_key(entidad, i) for i in pendientes])
+        desde_cache = {i: compartidos[_key(entidad, i)] for i in pendientes if _key(entidad, i) in compartidos}
+        _lru.guardar(entidad, desde_cache, version)
+        encontrados.update(desde_cache)
+
+    return encontrados, [i for i in ids if i not in encontrados]
+
+
+def guardar(entidad: str, datos: Mapping[str, dict], version: int):
+    """
+    Guarda lo traído de la fuente. Si la entidad se invalidó mientras se
+    consultaba (cambió la versión), no se guarda para no revivir datos viejos.
+    """
+    if not datos or versiones([entidad])[entidad] != version:
+        return
+    cache.set_many({_key(entidad, str(i)): v for i, v in datos.items()}, timeout=_ttl(entidad))
+    _lru.guardar(entidad, {str(i): v for i, v in datos.items()}, version)
+
+
+def invalidar(entidad: str, ids: Iterable):
+    """
+    Borra esos ids de la caché compartida y sube la versión de la entidad para
+    que los LRU de los demás procesos se recarguen desde la caché compartida.
+    """
+    if entidad not in ENTIDADES:
+        raise ValueError(f"Entidad desconocida: {entidad}")
+    cache.delete_many([_key(entidad, str(i)) for i in ids])
+    cache.add(_ver_key(entidad), 0, timeout=None)
+    try:
+        cache.incr(_ver_key(entidad))
+    except ValueError:
+        cache.set(_ver_key(entidad), 1, timeout=None)
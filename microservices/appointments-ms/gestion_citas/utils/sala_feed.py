@@ -0,0 +1,52 @@
+"""
+Versión de la sala de espera por fecha y sede, guardada en la caché compartida.
+
+Cada cambio que afecta a la pantalla de sala (cita que entra o sale de
+EN_SALA/LLAMADO, re-llamado) sube la versión. Las pantallas esperan (long-poll)
+a que la versión cambie en vez de pedir el listado completo cada segundo.
+"""
+
+import time
+
+from django.core.cache import cache
+
+ESTADOS_SALA = ("EN_SALA", "LLAMADO")
+
+# Las versiones viven un par de días: solo interesan las de hoy
+VERSION_TTL = 60 * 60 * 48
+
+
+def _key(fecha, lugar_id=None) -> str:
+    return f"sala:ver:{fecha}:{lugar_id or '*'}"
+
+
+def version(fecha, lugar_id=None) -> int:
+    return cache.get(_key(fecha, lugar_id), 0)
+
+
+def _incrementar(key: str):
+    cache.add(key, 0, timeout=VERSION_TTL)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=VERSION_TTL)
+
+
+def publicar(fecha, lugar_id=None):
+    """Sube la versión de la sede y la de "todas las sedes" de esa fecha."""
+    if lugar_id:
+        _incrementar(_key(fecha, lugar_id))
+    _incrementar(_key(fecha))
+
+
+def esperar_cambio(fecha, lugar_id, desde: int, plazo: float, intervalo: float = 0.5) -> int:
+    """
+    Espera hasta `plazo` segundos a que la versión deje de ser `desde`.
+    Devuelve la versión vigente (igual a `desde` si no hubo cambios).
+    """
+    limite = time.monotonic() + plazo
+    actual = version(fecha, lugar_id)
+    while actual == desde and time.monotonic() < limite:
+        time.sleep(min(intervalo, max(0.0, limite - time.monotonic())))
+        actual = version(fecha, lugar_id)
+    return actual
@@ -0,0 +1,52 @@
+import logging
+import os
+from typing import Iterable, Optional, Union
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SLOTS_INVALIDATE_URL = "http://schedule-ms:8003/api/v1/agenda/slots/invalidar/"
+
+
+def notificar_cambio_agenda(
+    profesional_id: Optional[Union[int, str]],
+    fechas: Iterable,
+    *,
+    vigencia: Optional[int] = None,
+    timeout: int = 1,
+) -> bool:
+    """
+    Avisa a schedule-ms que cambió la ocupación de un profesional en esos días
+    para que invalide su caché de slots. Con `vigencia` (segundos) los días
+    recalculados no se cachean más allá de ese plazo (un hold que expira).
+    Si falla, NO rompe flujo (la caché expira sola por TTL).
+    """
+    fechas = sorted({str(f) for f in fechas if f})
+    if profesional_id is None or not fechas:
+        return False
+
+    url = os.getenv("SLOTS_INVALIDATE_URL", DEFAULT_SLOTS_INVALIDATE_URL).strip()
+    token = os.getenv("INTERNAL_SERVICE_TOKEN", "").strip()
+    if not token:
+        logger.warning("[schedule_client] INTERNAL_SERVICE_TOKEN no configurado. Invalidación deshabilitada.")
+        return False
+
+    payload = {"profesional_id": int(profesional_id), "fechas": fechas}
+    if vigencia:
+        payload["vigencia"] = int(vigencia)
+
+    try:
+        resp = requests.post(
+            url,
+            json=payload,
+            headers={"X-INTERNAL-TOKEN": token, "Content-Type": "application/json"},
+            timeout=timeout,
+        )
+        if resp.status_code in (200, 204):
+            return True
+        logger.warning("[schedule_client] Respuesta no OK (%s) %s", resp.status_code, url)
+        return False
+    except requests.RequestException as e:
+        logger.warning("[schedule_client] Error invalidando slots: %s", str(e))
+        return False
@@ -0,0 +1,179 @@
+"""
+Reservas temporales de horarios (holds) durante el asistente de agendamiento.
+
+Al elegir un horario el asistente toma el hold: si otro usuario ya tiene
+un horario que se cruza, pierde de inmediato (409) en vez de al confirmar.
+El hold vive settings.RESERVA_TTL segundos; create() lo consume al insertar la cita.
+
+Llaves en la caché compartida:
+- hold:{profesional}:{fecha}:{HH:MM} -> {token, hora_inicio, hora_fin, expira}
+- hold:idx:{profesional}:{fecha}     -> {HH:MM: expira} (para listar los del día)
+- hold:tok:{token}                   -> (profesional, fecha, HH:MM)
+- hold:lock:{profesional}:{fecha}    -> candado del día (cache.add)
+
+Revisar cruces y tomar (o soltar) se hace con el candado del día, así que
+dos clientes no pueden quedarse con horarios que se cruzan aunque empiecen
+a distinta hora. vigentes() cruza el índice con las llaves reales: un hold
+vencido desaparece aunque siga en el índice.
+"""
+
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Segundos que vive el candado si quien lo tiene muere sin soltarlo
+CANDADO_TTL = 5
+# Segundos que se espera el candado antes de responder que el horario está tomado
+CANDADO_ESPERA = 2
+
+
+def ttl() -> int:
+    return getattr(settings, "RESERVA_TTL", 180)
+
+
+def _hora(hora) -> str:
+    return str(hora)[:5]
+
+
+def _key(profesional_id, fecha, hora) -> str:
+    return f"hold:{int(profesional_id)}:{fecha}:{_hora(hora)}"
+
+
+def _idx_key(profesional_id, fecha) -> str:
+    return f"hold:idx:{int(profesional_id)}:{fecha}"
+
+
+def _tok_key(token) -> str:
+    return f"hold:tok:{token}"
+
+
+def _lock_key(profesional_id, fecha) -> str:
+    return f"hold:lock:{int(profesional_id)}:{fecha}"
+
+
+@contextmanager
+def _candado(profesional_id, fecha):
+    """
+    Candado del día del profesional; entrega False si no se obtuvo a tiempo.
+    """
+    key = _lock_key(profesional_id, fecha)
+    marca = uuid.uuid4().hex
+    limite = time.monotonic() + CANDADO_ESPERA
+    while not cache.add(key, marca, timeout=CANDADO_TTL):
+        if time.monotonic() >= limite:
+            yield False
+            return
+        time.sleep(0.01)
+    try:
+        yield True
+    finally:
+        if cache.get(key) == marca:
+            cache.delete(key)
+
+
+def _indexar(profesional_id, fecha, hora, expira):
+    key = _idx_key(profesional_id, fecha)
+    ahora = time.time()
+    indice = {h: e for h, e in (cache.get(key) or {}).items() if e > ahora}
+    if expira is None:
+        indice.pop(_hora(hora), None)
+    else:
+        indice[_hora(hora)] = expira
+    if indice:
+        cache.set(key, indice, timeout=max(1, int(max(indice.values()) - ahora) + 1))
+    else:
+        cache.delete(key)
+
+
+def _soltar(token, profesional_id, fecha, hora):
+    with _candado(profesional_id, fecha):
+        # Sin candado a tiempo se suelta igual: quitar un hold propio no crea cruces
+        key = _key(profesional_id, fecha, hora)
+        actual = cache.get(key)
+        if actual and actual["token"] == token:
+            cache.delete(key)
+        _indexar(profesional_id, fecha, hora, None)
+
+
+def tomar(profesional_id, fecha, hora_inicio, hora_fin, token=None):
+    """
+    Toma el horario para `token` (nuevo si no se indica) si ningún hold de
+    otro token se cruza con [hora_inicio, hora_fin). Si el mismo token ya lo
+    tenía, renueva el plazo. Un token tiene un solo hold: si tenía otro
+    horario, lo suelta al tomar el nuevo y lo informa en "anterior"
+    (profesional_id, fecha). Devuelve el hold o None si lo tiene otro.
+    """
+    token = token or uuid.uuid4().hex
+    segundos = ttl()
+    hold = {
+        "token": token,
+        "profesional_id": int(profesional_id),
+        "fecha": str(fecha),
+        "hora_inicio": _hora(hora_inicio),
+        "hora_fin": _hora(hora_fin),
+        "expira": time.time() + segundos,
+    }
+    ubicacion = (int(profesional_id), str(fecha), _hora(hora_inicio))
+    with _candado(profesional_id, fecha) as obtenido:
+        if not obtenido or en_conflicto(profesional_id, fecha, hora_inicio, hora_fin, token):
+            return None
+        cache.set(_key(profesional_id, fecha, hora_inicio), hold, timeout=segundos)
+        _indexar(profesional_id, fecha, hora_inicio, hold["expira"])
+        anterior = cache.get(_tok_key(token))
+        cache.set(_tok_key(token), ubicacion, timeout=segundos)
+
+    # Fuera del candado: el anterior puede ser del mismo día
+    if anterior and tuple(anterior) != ubicacion:
+        _soltar(token, *anterior)
+        return {**hold, "anterior": tuple(anterior[:2])}
+    return hold
+
+
+def liberar(token):
+    """
+    Suelta el hold del token. Devuelve (profesional_id, fecha) o None si ya no existía.
+    """
+    if not token:
+        return None
+    ubicacion = cache.get(_tok_key(token))
+    if not ubicacion:
+        return None
+    profesional_id, fecha, hora = ubicacion
+    _soltar(token, profesional_id, fecha, hora)
+    cache.delete(_tok_key(token))
+    return profesional_id, fecha
+
+
+# Consumir es liberar: la cita ya insertada ocupa el horario
+consumir = liberar
+
+
+def vigentes(profesional_ids, fechas):
+    """
+    Holds vigentes de esos profesionales y días, verificados contra sus llaves.
+    """
+    pares = [(int(p), str(f)) for p in profesional_ids for f in fechas]
+    indices = cache.get_many([_idx_key(*par) for par in pares])
+    llaves = [
+        _key(profesional_id, fecha, hora)
+        for profesional_id, fecha in pares
+        for hora in indices.get(_idx_key(profesional_id, fecha), {})
+    ]
+    if not llaves:
+        return []
+    holds = cache.get_many(llaves)
+    return sorted(holds.values(), key=lambda h: (h["profesional_id"], h["fecha"], h["hora_inicio"]))
+
+
+def en_conflicto(profesional_id, fecha, hora_inicio, hora_fin, token=None):
+    """
+    Hold de OTRO token que se cruza con [hora_inicio, hora_fin), o None.
+    """
+    inicio, fin = _hora(hora_inicio), _hora(hora_fin)
+    for hold in vigentes([profesional_id], [fecha]):
+        if hold["token"] != token and hold["hora_inicio"] < fin and hold["hora_fin"] > inicio:
+            return hold
+    return None
@@ -3,30 +3,62 @@ import os
 from datetime import datetime, timedelta
 
 import requests
-from django.db import transaction
-from django.db.models import Count, Max
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from django_filters.rest_framework import DjangoFilterBackend
+from django.utils.dateparse import parse_datetime
+from django_filters.rest_framework import DjangoFilterBackend, FilterSet
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
-
-from .models import Cita, ConfiguracionGlobal, HistoricoCita, NotaMedica
-from .permissions import InternalTokenOrAuthenticatedReadOnly
+from rest_framework.views import APIView
+
+from . import estadisticas, exportacion, historial, inasistencias, transiciones
+from .constraints import (
+    CITA_SIN_CRUCES,
+    ESTADOS_BLOQUEANTES,
+    MENSAJE_CRUCE_MEDICO,
+    es_violacion,
+    usa_restricciones_exclusion,
+)
+from .models import Cita, CitaEliminada, ConfiguracionGlobal, HistoricoCita, NotaMedica, ResumenInasistencias
+from .pagination import CitaKeysetPagination
+from .permissions import InternalToken, InternalTokenOrAuthenticatedReadOnly, es_llamada_interna
 from .serializers import (
     CitaSerializer,
     ConfiguracionGlobalSerializer,
     HistoricoCitaSerializer,
     NotaMedicaSerializer,
 )
-from .utils.audit_client import audit_log
+from .utils import config_cache, idempotencia, reference_cache, sala_feed, slot_holds
+from .utils.audit_client import audit_log, audit_log_lote
+from .utils.bulk_client import ejecutar_en_paralelo, obtener_bulk_paralelo, server_timing
+from .utils.schedule_client import notificar_cambio_agenda
 
 # URLs de Microservicios
 PATIENTS_MS_URL = "http://patients-ms:8001/api/v1/pacientes/internal/bulk-info/"
+PATIENTS_PERFIL_RESERVA_URL = "http://patients-ms:8001/api/v1/pacientes/internal/{paciente_id}/perfil-reserva/"
 STAFF_MS_URL = "http://professionals-ms:8002/api/v1/staff/internal/bulk-info/"
 SERVICES_MS_URL = "http://professionals-ms:8002/api/v1/staff/servicios/internal/bulk-info/"
 LUGARES_MS_URL = "http://professionals-ms:8002/api/v1/staff/lugares/internal/bulk-info/"
 
+# Tope del long-poll de la sala de espera (por debajo del proxy_read_timeout del gateway)
+MAX_ESPERA_SALA = 25
+
+# Filas máximas por respuesta de "cambios"; si hay más, completo=False y se pide de nuevo
+MAX_CAMBIOS = 500
+# Una fila guardada justo antes de consultar puede confirmarse después: la marca de agua
+# se queda este margen atrás y esas filas se reenvían en la siguiente consulta.
+MARGEN_CAMBIOS = timedelta(seconds=2)
+# Días que se guardan las lápidas (CitaEliminada); una marca de agua más vieja recibe 410
+CAMBIOS_RETENCION_DIAS = getattr(settings, "CAMBIOS_RETENCION_DIAS", 7)
+
+MENSAJE_HORARIO_RESERVADO = "Otro usuario está reservando este horario. Por favor elige otro."
+# Días máximos de holds que se agregan a la proyección de ocupación
+MAX_DIAS_RESERVAS = 62
+
 logger = logging.getLogger(__name__)
 
 
@@ -71,11 +103,15 @@ def _is_in_exception_groups(request, configured_groups_csv):
 
 
 def _fetch_patient_profile(paciente_id):
+    """
+    Perfil de reserva del paciente (user_id, tipo_usuario, ultima_fecha_desbloqueo).
+    No se cachea: el desbloqueo por inasistencias debe verse de inmediato.
+    """
     if not paciente_id:
         return None
     try:
         resp = requests.get(
-            f"http://patients-ms:8001/api/v1/pacientes/listado/{paciente_id}/",
+            PATIENTS_PERFIL_RESERVA_URL.format(paciente_id=paciente_id),
             timeout=2,
             headers=_internal_headers(),
         )
@@ -87,8 +123,17 @@ def _fetch_patient_profile(paciente_id):
 
 
 def _fetch_service_profile(servicio_id):
+    """
+    Datos del servicio (duración, tipos de paciente habilitados, ...) desde la
+    caché de referencias; professionals-ms la invalida cuando el servicio cambia.
+    """
     if not servicio_id:
         return None
+    servicio_id = str(servicio_id)
+    version = reference_cache.versiones(["servicios"])["servicios"]
+    encontrados, _ = reference_cache.obtener("servicios", [servicio_id], version)
+    if servicio_id in encontrados:
+        return encontrados[servicio_id]
     try:
         resp = requests.get(
             f"{SERVICES_MS_URL}?ids={servicio_id}",
@@ -97,12 +142,117 @@ def _fetch_service_profile(servicio_id):
         )
         if resp.status_code == 200:
             data = resp.json() or {}
-            return data.get(str(servicio_id))
+            reference_cache.guardar("servicios", data, version)
+            return data.get(servicio_id)
     except Exception:
         return None
     return None
 
 
+def _notificar_agenda(*citas):
+    """
+    Invalida en schedule-ms los días afectados, una vez confirmada la transacción.
+    """
+    por_profesional = {}
+    for c in citas:
+        if c is not None and c.profesional_id:
+            por_profesional.setdefault(c.profesional_id, set()).add(c.fecha)
+
+    for profesional_id, fechas in por_profesional.items():
+        transaction.on_commit(lambda p=profesional_id, f=fechas: notificar_cambio_agenda(p, f))
+
+
+def _notificar_sala(*citas):
+    """
+    Sube la versión de la sala de espera (fecha/sede) de las citas que están o
+    estaban en EN_SALA/LLAMADO, una vez confirmada la transacción.
+    """
+    salas = {(c.fecha, c.lugar_id) for c in citas if c is not None and c.estado in sala_feed.ESTADOS_SALA}
+    for fecha, lugar_id in salas:
+        transaction.on_commit(lambda f=fecha, lugar=lugar_id: sala_feed.publicar(f, lugar))
+
+
+def _registrar_eliminada(cita):
+    CitaEliminada.objects.create(
+        cita_id=cita.pk, profesional_id=cita.profesional_id, paciente_id=cita.paciente_id, fecha=cita.fecha
+    )
+
+
+class CitaEliminadaFilter(FilterSet):
+    """
+    Los filtros del listado de citas que aplican a las lápidas, para que
+    "cambios" no reporte bajas fuera de lo que el cliente puede ver.
+    """
+
+    class Meta:
+        model = CitaEliminada
+        fields = {
+            "fecha": ["exact", "gte", "lte", "iso_week_day"],
+            "paciente_id": ["exact"],
+            "profesional_id": ["exact", "in"],
+        }
+
+
+def resolver_referencias(ids_por_entidad):
+    """
+    {entidad: {id: datos}} de pacientes/profesionales/servicios/lugares.
+    Primero la caché de referencias; a los microservicios solo se piden los
+    faltantes, todos a la vez. Devuelve (datos, tiempos por fuente).
+    """
+    urls = {
+        "pacientes": PATIENTS_MS_URL,
+        "profesionales": STAFF_MS_URL,
+        "servicios": SERVICES_MS_URL,
+        "lugares": LUGARES_MS_URL,
+    }
+    versiones = reference_cache.versiones()
+    datos, fuentes = {}, {}
+    for nombre, url in urls.items():
+        ids = {str(i) for i in ids_por_entidad.get(nombre) or () if i is not None}
+        datos[nombre], faltantes = reference_cache.obtener(nombre, ids, versiones[nombre])
+        fuentes[nombre] = (url, faltantes)
+
+    traidos, tiempos = obtener_bulk_paralelo(
+        fuentes,
+        plazo=getattr(settings, "ENRIQUECIMIENTO_PLAZO_SEGUNDOS", 2.0),
+        headers=_internal_headers(),
+    )
+    for nombre, nuevos in traidos.items():
+        if tiempos.get(nombre, {}).get("estado") == "ok":
+            reference_cache.guardar(nombre, nuevos, versiones[nombre])
+        datos[nombre].update(nuevos)
+    return datos, tiempos
+
+
+def _reservas_como_ocupacion(params):
+    """
+    Holds vigentes como filas de ocupación (estado RESERVADA) para los
+    profesionales y el rango de fechas pedidos.
+    """
+    try:
+        ids = params.get("profesional_id__in") or params.get("profesional_id") or ""
+        profesional_ids = [int(p) for p in ids.split(",") if p.strip()]
+        desde = datetime.strptime(params["fecha__gte"], "%Y-%m-%d").date()
+        hasta = datetime.strptime(params["fecha__lte"], "%Y-%m-%d").date()
+    except (KeyError, ValueError):
+        return []
+    dias = (hasta - desde).days + 1
+    if not profesional_ids or not 0 < dias <= MAX_DIAS_RESERVAS:
+        return []
+
+    fechas = [desde + timedelta(days=i) for i in range(dias)]
+    return [
+        {
+            "profesional_id": h["profesional_id"],
+            "fecha": h["fecha"],
+            "hora_inicio": f"{h['hora_inicio']}:00",
+            "hora_fin": f"{h['hora_fin']}:00",
+            "estado": "RESERVADA",
+        }
+        for h in slot_holds.vigentes(profesional_ids, fechas)
+    ]
+
+
 def _audit_from_view(request, *, descripcion, accion, recurso, recurso_id=None, metadata=None):
     audit_log(
         descripcion=descripcion,
@@ -122,7 +272,7 @@ class ConfiguracionViewSet(viewsets.ModelViewSet):
     serializer_class = ConfiguracionGlobalSerializer
 
     def list(self, request, *args, **kwargs):
-        obj, _ = ConfiguracionGlobal.objects.get_or_create(pk=1)
+        obj, _ = config_cache.obtener()
         serializer = self.get_serializer(obj)
         return Response(serializer.data)
 
@@ -131,20 +281,338 @@ class CitaViewSet(viewsets.ModelViewSet):
     permission_classes = [InternalTokenOrAuthenticatedReadOnly]
     queryset = Cita.objects.all().order_by("-fecha", "-hora_inicio")
     serializer_class = CitaSerializer
+    pagination_class = CitaKeysetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ["fecha", "paciente_id", "profesional_id", "estado", "lugar_id"]
+    filterset_fields = {
+        "fecha": ["exact", "gte", "lte", "iso_week_day"],
+        "hora_inicio": ["gte", "lt"],
+        "paciente_id": ["exact"],
+        "profesional_id": ["exact", "in"],
+        "estado": ["exact", "in"],
+        "lugar_id": ["exact"],
+    }
     ordering_fields = ["fecha", "hora_inicio"]
 
+    @action(detail=False, methods=["get"], url_path="ocupacion")
+    def ocupacion(self, request):
+        """
+        Proyección compacta para schedule-ms: solo lo necesario para saber
+        qué horarios están ocupados (sin serializer ni enriquecimiento).
+        Acepta los mismos filtros que el listado (fecha__gte, estado__in, ...).
+        Con ?incluir_reservas=1 agrega los holds vigentes del rango como filas
+        en estado RESERVADA (requiere profesional_id__in, fecha__gte y fecha__lte).
+        """
+        queryset = self.filter_queryset(self.get_queryset()).order_by("fecha", "hora_inicio")
+        data = list(queryset.values("profesional_id", "fecha", "hora_inicio", "hora_fin", "estado"))
+        if request.query_params.get("incluir_reservas") in ("1", "true"):
+            data.extend(_reservas_como_ocupacion(request.query_params))
+        return Response(data)
+
+    @action(detail=False, methods=["post", "delete"], url_path="reservas")
+    def reservas(self, request):
+        """
+        Hold temporal de un horario mientras el paciente completa el asistente.
+
+        POST {profesional_id, fecha, hora_inicio, servicio_id[, token]}
+          -> 201 {token, hora_inicio, hora_fin, expira_en}; 409 si el horario
+             ya está ocupado o lo tiene otro usuario. Con el token propio renueva,
+             o cambia de horario soltando el que tenía.
+        DELETE ?token=... -> 204 (suelta el hold; no falla si ya expiró).
+        """
+        if request.method == "DELETE":
+            token = request.query_params.get("token") or request.data.get("token")
+            liberado = slot_holds.liberar(token)
+            if liberado:
+                notificar_cambio_agenda(liberado[0], [liberado[1]])
+            return Response(status=204)
+
+        token = request.data.get("token") or None
+        try:
+            profesional_id = int(request.data.get("profesional_id"))
+            fecha = datetime.strptime(str(request.data.get("fecha")), "%Y-%m-%d").date()
+            hora_str = str(request.data.get("hora_inicio"))
+            h_ini = datetime.strptime(hora_str[:5], "%H:%M")
+        except (TypeError, ValueError):
+            return Response({"detalle": "Parámetros inválidos."}, status=400)
+
+        service_profile = _fetch_service_profile(request.data.get("servicio_id"))
+        duracion = (service_profile or {}).get("duracion", 20) or 20
+        h_fin = h_ini + timedelta(minutes=duracion)
+
+        ocupado = Cita.objects.filter(
+            profesional_id=profesional_id,
+            fecha=fecha,
+            estado__in=ESTADOS_BLOQUEANTES,
+            hora_inicio__lt=h_fin.time(),
+            hora_fin__gt=h_ini.time(),
+        ).exists()
+        if ocupado:
+            return Response({"detalle": MENSAJE_CRUCE_MEDICO}, status=409)
+
+        hold = slot_holds.tomar(profesional_id, fecha, h_ini.time(), h_fin.time(), token)
+        if hold is None:
+            return Response({"detalle": MENSAJE_HORARIO_RESERVADO}, status=409)
+
+        notificar_cambio_agenda(profesional_id, [fecha], vigencia=slot_holds.ttl())
+        if hold.get("anterior") and hold["anterior"] != (profesional_id, str(fecha)):
+            # El token cambió de horario a otro profesional o día: ese también se liberó
+            notificar_cambio_agenda(hold["anterior"][0], [hold["anterior"][1]])
+        return Response(
+            {
+                "token": hold["token"],
+                "hora_inicio": hold["hora_inicio"],
+                "hora_fin": hold["hora_fin"],
+                "expira_en": slot_holds.ttl(),
+            },
+            status=201,
+        )
+
+    @action(detail=False, methods=["get"], url_path="cambios")
+    def cambios(self, request):
+        """
+        Citas cambiadas desde una marca de agua, para tableros que refrescan seguido.
+
+        ?updated_after=<ISO datetime>[&after_id=<id>] + los mismos filtros del listado.
+        - Sin updated_after devuelve todo lo que cumpla los filtros (carga inicial).
+        - eliminados: ids borrados, inactivados o movidos fuera del filtro.
+        - watermark / ultimo_id: valores para la siguiente consulta (updated_after /
+          after_id); completo=False indica que quedaron cambios pendientes y
+          conviene pedir de nuevo enseguida.
+        - 304 si no hubo cambios; 410 si updated_after es anterior a la retención
+          de lápidas (CAMBIOS_RETENCION_DIAS): el cliente debe recargar todo.
+        - Fuera de administradores y llamadas internas se exige profesional_id o paciente_id.
+        """
+        es_admin = getattr(request.user, "is_staff", False) or getattr(request.user, "is_superuser", False)
+        if not (es_admin or es_llamada_interna(request)) and not (
+            request.query_params.get("profesional_id") or request.query_params.get("paciente_id")
+        ):
+            return Response({"error": "Indica profesional_id o paciente_id."}, status=400)
+
+        ahora = timezone.now()
+        desde, after_id = None, None
+        if request.query_params.get("updated_after"):
+            desde = parse_datetime(request.query_params["updated_after"])
+            if desde is None:
+                return Response({"error": "updated_after inválido."}, status=400)
+            if timezone.is_naive(desde):
+                desde = timezone.make_aware(desde)
+            if desde < ahora - timedelta(days=CAMBIOS_RETENCION_DIAS):
+                return Response({"error": "Marca de agua vencida; recarga completa."}, status=410)
+        if request.query_params.get("after_id"):
+            try:
+                after_id = int(request.query_params["after_id"])
+            except ValueError:
+                return Response({"error": "after_id inválido."}, status=400)
+
+        queryset = (
+            self.filter_queryset(self.get_queryset()).select_related("nota_medica").order_by("updated_at", "id")
+        )
+        lapidas = CitaEliminadaFilter(request.query_params, queryset=CitaEliminada.objects.all()).qs
+        if desde:
+            # Cursor compuesto (updated_at, id): avanza aunque muchas filas compartan la marca
+            avance = Q(updated_at__gt=desde)
+            if after_id is not None:
+                avance |= Q(updated_at=desde, id__gt=after_id)
+            queryset = queryset.filter(avance)
+            lapidas = lapidas.filter(eliminado_en__gt=desde)
+        else:
+            queryset = queryset.filter(activo=True)
+            lapidas = lapidas.none()
+
+        filas = list(queryset[: MAX_CAMBIOS + 1])
+        completo = len(filas) <= MAX_CAMBIOS
+        filas = filas[:MAX_CAMBIOS]
+        activas = [c for c in filas if c.activo]
+        # Una cita movida y luego devuelta al filtro tiene lápida y fila vigente: gana la fila
+        eliminados = sorted(
+            (set(lapidas.values_list("cita_id", flat=True)) | {c.pk for c in filas if not c.activo})
+            - {c.pk for c in activas}
+        )
+
+        if desde and not filas and not eliminados:
+            return Response(status=304)
+
+        if not completo:
+            watermark, ultimo_id = filas[-1].updated_at, filas[-1].pk
+        elif desde and desde >= ahora - MARGEN_CAMBIOS:
+            # No se retrocede la marca: se conserva el cursor recibido
+            watermark, ultimo_id = desde, after_id
+        else:
+            watermark, ultimo_id = ahora - MARGEN_CAMBIOS, None
+
+        data = self._enrich_data(self.get_serializer(activas, many=True).data)
+        return Response(
+            {
+                "watermark": watermark.isoformat(),
+                "ultimo_id": ultimo_id,
+                "completo": completo,
+                "cambios": data,
+                "eliminados": eliminados,
+            }
+        )
+
+    @action(detail=False, methods=["get"], url_path="exportar")
+    def exportar(self, request):
+        """
+        Descarga de citas para hojas de cálculo (solo administradores).
+
+        ?formato=csv|xlsx (default csv) + los mismos filtros y ordering del listado.
+        CSV: las filas se leen y enriquecen por bloques y se envían a medida que salen.
+        XLSX: se arma completo antes de enviar; solo rangos cortos (EXPORTACION_XLSX_MAX_FILAS).
+        """
+        es_admin = getattr(request.user, "is_staff", False) or getattr(request.user, "is_superuser", False)
+        if not es_admin and not es_llamada_interna(request):
+            return Response({"detalle": "Solo administradores pueden exportar citas."}, status=403)
+
+        formato = request.query_params.get("formato", "csv")
+        if formato not in exportacion.FORMATOS:
+            return Response({"detalle": "formato debe ser csv o xlsx."}, status=400)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if formato == "xlsx" and queryset.count() > exportacion.max_filas_xlsx():
+            return Response(
+                {
+                    "detalle": f"XLSX admite hasta {exportacion.max_filas_xlsx()} citas; "
+                    "acota el rango de fechas o descarga en CSV."
+                },
+                status=400,
+            )
+
+        filas = exportacion.filas(queryset)
+        contenido = exportacion.xlsx_stream(filas) if formato == "xlsx" else exportacion.csv_stream(filas)
+        tipo, extension = exportacion.FORMATOS[formato]
+        response = StreamingHttpResponse(contenido, content_type=tipo)
+        response["Content-Disposition"] = f'attachment; filename="citas_{timezone.localdate():%Y%m%d}.{extension}"'
+        return response
+
+    @action(detail=False, methods=["get"], url_path="sala")
+    def sala(self, request):
+        """
+        Pantalla de sala de espera (long-poll).
+
+        ?fecha=YYYY-MM-DD[&lugar_id=][&version=N][&espera=segundos]
+        - Sin version (o con una distinta a la vigente) responde de inmediato.
+        - Con la version vigente espera hasta `espera` segundos a un cambio;
+          si no hay ninguno responde 204 y la pantalla vuelve a preguntar.
+        Solo trae citas EN_SALA/LLAMADO con lo que la pantalla muestra.
+        """
+        try:
+            fecha = datetime.strptime(request.query_params.get("fecha", ""), "%Y-%m-%d").date()
+            lugar_id = int(request.query_params["lugar_id"]) if request.query_params.get("lugar_id") else None
+            desde = int(request.query_params["version"]) if request.query_params.get("version") else None
+            espera = min(float(request.query_params.get("espera", MAX_ESPERA_SALA)), MAX_ESPERA_SALA)
+        except (TypeError, ValueError):
+            return Response({"error": "Parámetros inválidos."}, status=400)
+
+        version = sala_feed.version(fecha, lugar_id)
+        if desde == version:
+            version = sala_feed.esperar_cambio(fecha, lugar_id, desde, max(0.0, espera))
+            if version == desde:
+                return Response(status=204)
+
+        queryset = Cita.objects.filter(fecha=fecha, estado__in=sala_feed.ESTADOS_SALA)
+        if lugar_id:
+            queryset = queryset.filter(lugar_id=lugar_id)
+        citas = list(
+            queryset.order_by("hora_inicio").values(
+                "id", "estado", "hora_inicio", "paciente_id", "profesional_id", "updated_at"
+            )
+        )
+        self._enrich_data(citas)
+
+        return Response(
+            {
+                "version": version,
+                "citas": [
+                    {
+                        "id": c["id"],
+                        "estado": c["estado"],
+                        "hora_inicio": c["hora_inicio"].strftime("%H:%M"),
+                        "paciente_nombre": " ".join(c["paciente_nombre"].split()[:2]),
+                        "paciente_doc": "".join(ch for ch in str(c["paciente_doc"]) if ch.isdigit())[-3:],
+                        "profesional_nombre": c["profesional_nombre"],
+                        "updated_at": c["updated_at"],
+                    }
+                    for c in citas
+                ],
+            }
+        )
+
+    @action(detail=False, methods=["post"], url_path="transiciones")
+    def transiciones(self, request):
+        """
+        Cambio de estado masivo (cierre del día, cancelación por ausencia del profesional).
+
+        POST {ids: [...], estado, motivo?}
+        Cada cita se valida con las reglas de update() contra el workflow compilado;
+        las válidas se guardan con un bulk_update en una transacción y se auditan en lote.
+        Responde {actualizadas: [ids], rechazadas: [{id, detalle}]}.
+        """
+        estado = request.data.get("estado")
+        motivo = (request.data.get("motivo") or "").strip() or None
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in request.data.get("ids") or []))
+        except (TypeError, ValueError):
+            return Response({"detalle": "ids debe ser una lista de números."}, status=400)
+
+        if not ids:
+            return Response({"detalle": "Indica al menos una cita."}, status=400)
+        if len(ids) > transiciones.MAX_TRANSICIONES:
+            return Response({"detalle": f"Máximo {transiciones.MAX_TRANSICIONES} citas por solicitud."}, status=400)
+
+        _, workflow = config_cache.obtener()
+        if not workflow.es_valido(estado):
+            return Response({"detalle": f"El estado '{estado}' no es válido."}, status=400)
+
+        es_admin = getattr(request.user, "is_staff", False) or getattr(request.user, "is_superuser", False)
+        uid = _uid(request)
+        try:
+            with transaction.atomic():
+                cambios, rechazadas = transiciones.aplicar(
+                    ids, estado, workflow=workflow, es_admin=es_admin, usuario_id=uid, motivo=motivo
+                )
+                citas = [c for par in cambios for c in par]
+                _notificar_agenda(*citas)
+                _notificar_sala(*citas)
+                historial.registrar(*(cita for _, cita in cambios), usuario_id=uid)
+                eventos = [
+                    {
+                        "descripcion": f"STATE_CHANGE Cita #{cita.pk}: {anterior.estado} -> {cita.estado}",
+                        "modulo": "APPOINTMENTS",
+                        "accion": "STATE_CHANGE",
+                        "usuario_id": uid,
+                        "recurso": "Cita",
+                        "recurso_id": str(cita.pk),
+                        "metadata": {
+                            "from": anterior.estado,
+                            "to": cita.estado,
+                            "paciente_id": cita.paciente_id,
+                            "profesional_id": cita.profesional_id,
+                            "fecha": str(cita.fecha),
+                            "hora_inicio": str(cita.hora_inicio),
+                            "masivo": True,
+                        },
+                        "ip": request.META.get("REMOTE_ADDR"),
+                        "user_agent": request.META.get("HTTP_USER_AGENT"),
+                    }
+                    for anterior, cita in cambios
+                ]
+                if eventos:
+                    transaction.on_commit(lambda: audit_log_lote(eventos))
+        except IntegrityError as e:
+            # Reactivar en bloque sobre horarios ya ocupados
+            if es_violacion(e, CITA_SIN_CRUCES):
+                return Response({"detalle": MENSAJE_CRUCE_MEDICO}, status=409)
+            raise
+
+        return Response({"actualizadas": [cita.pk for _, cita in cambios], "rechazadas": rechazadas})
+
     @action(detail=False, methods=["get"], url_path="reportes/inasistencias")
     def reporte_inasistencias(self, request):
-        config, _ = ConfiguracionGlobal.objects.get_or_create(pk=1)
+        config, _ = config_cache.obtener()
         limite = config.limite_inasistencias
 
-        data = (
-            Cita.objects.filter(estado="NO_ASISTIO")
-            .values("paciente_id")
-            .annotate(total=Count("id"), ultima_falta=Max("fecha"))
-        )
+        data = ResumenInasistencias.objects.values("paciente_id", "total", "ultima_falta")
 
         resultado = {}
         for item in data:
@@ -161,10 +629,48 @@ class CitaViewSet(viewsets.ModelViewSet):
             }
         return Response(resultado)
 
+    @action(detail=False, methods=["get"], url_path="reportes/estadisticas")
+    def reporte_estadisticas(self, request):
+        """
+        Estadísticas de citas desde los acumulados diarios (no recorre Cita).
+
+        ?periodo=semana|mes|anio[&fecha=YYYY-MM-DD] (default el mes actual)
+        o ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD;
+        filtros opcionales profesional_id, servicio_id, lugar_id y
+        agrupar=profesional_id|servicio_id|lugar_id para el desglose.
+        La serie va por día, o por mes en años y rangos largos.
+        """
+        params = request.query_params
+        periodo = params.get("periodo", "mes")
+        agrupar = params.get("agrupar") or None
+        try:
+            if params.get("desde") or params.get("hasta"):
+                desde = datetime.strptime(params["desde"], "%Y-%m-%d").date()
+                hasta = datetime.strptime(params["hasta"], "%Y-%m-%d").date()
+            else:
+                if periodo not in estadisticas.PERIODOS:
+                    raise ValueError
+                fecha = datetime.strptime(params["fecha"], "%Y-%m-%d").date() if params.get("fecha") else None
+                desde, hasta = estadisticas.rango(periodo, fecha or timezone.localdate())
+            filtros = {campo: int(params[campo]) for campo in estadisticas.AGRUPACIONES if params.get(campo)}
+        except (KeyError, ValueError):
+            return Response({"detalle": "Parámetros inválidos."}, status=400)
+        if hasta < desde or (agrupar and agrupar not in estadisticas.AGRUPACIONES):
+            return Response({"detalle": "Parámetros inválidos."}, status=400)
+
+        largo = (hasta - desde).days >= estadisticas.MAX_DIAS_SERIE_DIARIA
+        serie = "mes" if periodo == "anio" or largo else "dia"
+        return Response(estadisticas.resumen(desde, hasta, serie=serie, agrupar=agrupar, **filtros))
+
     # ✅ CREATE: set usuario_id + auditar
     def perform_create(self, serializer):
         uid = _uid(self.request)
         obj = serializer.save(usuario_id=uid)
+        _notificar_agenda(obj)
+        _notificar_sala(obj)
+        inasistencias.actualizar(None, obj)
+        estadisticas.actualizar(None, obj)
+        historial.registrar(obj, usuario_id=uid)
 
         _audit_from_view(
             self.request,
@@ -220,6 +726,18 @@ class CitaViewSet(viewsets.ModelViewSet):
                         "to": str(nv) if nv is not None else None,
                     }
 
+        if not old or set(changed) & {"estado", "profesional_id", "fecha", "hora_inicio", "hora_fin"}:
+            _notificar_agenda(old, obj)
+        if old and set(changed) & {"profesional_id", "paciente_id", "fecha"}:
+            # Para los tableros filtrados por los valores anteriores la cita "desaparece"
+            _registrar_eliminada(old)
+        _notificar_sala(old, obj)
+        if old:
+            inasistencias.actualizar(old, obj)
+            estadisticas.actualizar(old, obj)
+        if not old or old.estado != obj.estado:
+            historial.registrar(obj, usuario_id=uid)
+
         _audit_from_view(
             self.request,
             descripcion=f"UPDATE Cita #{obj.pk}",
@@ -276,6 +794,12 @@ class CitaViewSet(viewsets.ModelViewSet):
         }
 
         instance.delete()
+        instance.pk = pk
+        _registrar_eliminada(instance)
+        _notificar_agenda(instance)
+        _notificar_sala(instance)
+        inasistencias.actualizar(instance, None)
+        estadisticas.actualizar(instance, None)
 
         _audit_from_view(
             self.request,
@@ -287,139 +811,159 @@ class CitaViewSet(viewsets.ModelViewSet):
         )
 
     def create(self, request, *args, **kwargs):
+        # Reintentos con la misma Idempotency-Key reciben la respuesta original
+        llave = request.headers.get(idempotencia.HEADER)
+        if llave:
+            return idempotencia.ejecutar(_uid(request), llave, request.data, lambda: self._crear(request))
+        return self._crear(request)
+
+    def _crear(self, request):
         data = request.data.copy()
         es_modo_admin_front = data.pop("is_admin_mode", False)
 
         # Evitar spoofing desde el frontend
         data.pop("usuario_id", None)
+        reserva_token = data.pop("reserva_token", None) or None
 
         paciente_id = data.get("paciente_id")
         fecha_solicitada = data.get("fecha")
         servicio_id = data.get("servicio_id")
         hora_inicio_str = data.get("hora_inicio")
-        config, _ = ConfiguracionGlobal.objects.get_or_create(pk=1)
+        config, _ = config_cache.obtener()
 
         try:
-            with transaction.atomic():
-                paciente_profile = _fetch_patient_profile(paciente_id)
-                if not paciente_profile:
+            # Consultas a otros microservicios a la vez y ANTES de abrir la transacción:
+            # el select_for_update de los cruces no debe esperar a la red.
+            perfiles = ejecutar_en_paralelo(
+                {
+                    "paciente": lambda: _fetch_patient_profile(paciente_id),
+                    "servicio": lambda: _fetch_service_profile(servicio_id),
+                }
+            )
+            paciente_profile = perfiles["paciente"]
+            service_profile = perfiles["servicio"]
+            if not paciente_profile:
+                return Response(
+                    {"detalle": "No se pudo validar la información del paciente seleccionado."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            # 0) Agendar para tercero: solo admins/staff o grupos autorizados
+            paciente_user_id = paciente_profile.get("user_id")
+            solicitante_user_id = _uid(request)
+            agenda_para_tercero = (
+                paciente_user_id is not None
+                and solicitante_user_id is not None
+                and str(paciente_user_id) != str(solicitante_user_id)
+            )
+
+            if agenda_para_tercero:
+                tiene_privilegio_terceros = (
+                    getattr(request.user, "is_superuser", False)
+                    or getattr(request.user, "is_staff", False)
+                    or _is_in_exception_groups(request, config.grupos_excepcion_agendar_terceros)
+                )
+                if not tiene_privilegio_terceros:
+                    return Response(
+                        {"detalle": "No tienes permisos para agendar citas a nombre de otro paciente."},
+                        status=status.HTTP_403_FORBIDDEN,
+                    )
+            else:
+                tiene_privilegio_terceros = False
+
+            # 0.5) Restricción por tipo de paciente vs servicio
+            tipo_paciente_id = paciente_profile.get("tipo_usuario")
+            puede_omitir_restriccion_tipo = agenda_para_tercero and tiene_privilegio_terceros
+            if service_profile and tipo_paciente_id is not None and not puede_omitir_restriccion_tipo:
+                permitidos = service_profile.get("tipos_paciente_ids") or []
+                permitidos = [int(x) for x in permitidos if str(x).isdigit()]
+                tipo_id_int = int(tipo_paciente_id) if str(tipo_paciente_id).isdigit() else None
+                if permitidos and tipo_id_int not in permitidos:
                     return Response(
-                        {"detalle": "No se pudo validar la información del paciente seleccionado."},
+                        {"detalle": "El servicio seleccionado no está habilitado para este tipo de paciente."},
                         status=status.HTTP_400_BAD_REQUEST,
                     )
 
-                # 0) Agendar para tercero: solo admins/staff o grupos autorizados
-                paciente_user_id = paciente_profile.get("user_id")
-                solicitante_user_id = _uid(request)
-                agenda_para_tercero = (
-                    paciente_user_id is not None
-                    and solicitante_user_id is not None
-                    and str(paciente_user_id) != str(solicitante_user_id)
-                )
+            # 1. BLOQUEO POR INASISTENCIAS
+            if config.limite_inasistencias > 0:
+                fecha_corte = None
+                try:
+                    f_str = paciente_profile.get("ultima_fecha_desbloqueo")
+                    if f_str:
+                        if f_str.endswith("Z"):
+                            f_str = f_str.replace("Z", "+00:00")
+                        fecha_corte = datetime.fromisoformat(f_str)
+                except Exception:
+                    pass
 
-                if agenda_para_tercero:
-                    tiene_privilegio_terceros = (
-                        getattr(request.user, "is_superuser", False)
-                        or getattr(request.user, "is_staff", False)
-                        or _is_in_exception_groups(request, config.grupos_excepcion_agendar_terceros)
+                total_inasistencias = inasistencias.contar_desde(
+                    paciente_id, fecha_corte.date() if fecha_corte else None
+                )
+                if total_inasistencias >= config.limite_inasistencias:
+                    return Response(
+                        {"detalle": config.mensaje_bloqueo_inasistencia},
+                        status=status.HTTP_403_FORBIDDEN,
                     )
-                    if not tiene_privilegio_terceros:
-                        return Response(
-                            {"detalle": "No tienes permisos para agendar citas a nombre de otro paciente."},
-                            status=status.HTTP_403_FORBIDDEN,
-                        )
-                else:
-                    tiene_privilegio_terceros = False
-
-                # 0.5) Restricción por tipo de paciente vs servicio
-                service_profile = _fetch_service_profile(servicio_id) if servicio_id else None
-                tipo_paciente_id = paciente_profile.get("tipo_usuario")
-                puede_omitir_restriccion_tipo = agenda_para_tercero and tiene_privilegio_terceros
-                if service_profile and tipo_paciente_id is not None and not puede_omitir_restriccion_tipo:
-                    permitidos = service_profile.get("tipos_paciente_ids") or []
-                    permitidos = [int(x) for x in permitidos if str(x).isdigit()]
-                    tipo_id_int = int(tipo_paciente_id) if str(tipo_paciente_id).isdigit() else None
-                    if permitidos and tipo_id_int not in permitidos:
-                        return Response(
-                            {"detalle": "El servicio seleccionado no está habilitado para este tipo de paciente."},
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
 
-                # 1. BLOQUEO POR INASISTENCIAS
-                if config.limite_inasistencias > 0:
-                    fecha_corte = None
-                    try:
-                        f_str = paciente_profile.get("ultima_fecha_desbloqueo")
-                        if f_str:
-                            if f_str.endswith("Z"):
-                                f_str = f_str.replace("Z", "+00:00")
-                            fecha_corte = datetime.fromisoformat(f_str)
-                    except Exception:
-                        pass
-
-                    query_inasistencias = Cita.objects.filter(paciente_id=paciente_id, estado="NO_ASISTIO")
-                    if fecha_corte:
-                        query_inasistencias = query_inasistencias.filter(fecha__gt=fecha_corte.date())
-
-                    if query_inasistencias.count() >= config.limite_inasistencias:
+            # 1.5. ANTELACIÓN MÍNIMA
+            try:
+                fmt = "%H:%M:%S" if len(hora_inicio_str) > 5 else "%H:%M"
+                h_ini = datetime.strptime(hora_inicio_str, fmt).time()
+                f_ini = datetime.strptime(fecha_solicitada, "%Y-%m-%d").date()
+                cita_dt = timezone.make_aware(datetime.combine(f_ini, h_ini))
+
+                tiene_privilegio = (
+                    getattr(request.user, "is_superuser", False)
+                    or _is_in_exception_groups(request, config.grupos_excepcion_antelacion)
+                    or es_modo_admin_front is True
+                )
+
+                if not tiene_privilegio:
+                    if cita_dt < (timezone.now() + timedelta(hours=1)):
                         return Response(
-                            {"detalle": config.mensaje_bloqueo_inasistencia},
-                            status=status.HTTP_403_FORBIDDEN,
+                            {"detalle": "Como paciente, debes agendar con al menos 1 hora de antelación."},
+                            status=status.HTTP_400_BAD_REQUEST,
                         )
+            except ValueError:
+                return Response({"detalle": "Fecha/hora inválida."}, status=400)
 
-                # 1.5. ANTELACIÓN MÍNIMA
-                try:
-                    fmt = "%H:%M:%S" if len(hora_inicio_str) > 5 else "%H:%M"
-                    h_ini = datetime.strptime(hora_inicio_str, fmt).time()
-                    f_ini = datetime.strptime(fecha_solicitada, "%Y-%m-%d").date()
-                    cita_dt = timezone.make_aware(datetime.combine(f_ini, h_ini))
-
-                    tiene_privilegio = (
-                        getattr(request.user, "is_superuser", False)
-                        or _is_in_exception_groups(request, config.grupos_excepcion_antelacion)
-                        or es_modo_admin_front is True
-                    )
+            # 2. OVERBOOKING Y DURACIÓN
+            duracion = 20
+            try:
+                if service_profile:
+                    duracion = service_profile.get("duracion", 20) or 20
+            except Exception:
+                pass
 
-                    if not tiene_privilegio:
-                        if cita_dt < (timezone.now() + timedelta(hours=1)):
-                            return Response(
-                                {"detalle": "Como paciente, debes agendar con al menos 1 hora de antelación."},
-                                status=status.HTTP_400_BAD_REQUEST,
-                            )
-                except ValueError:
-                    return Response({"detalle": "Fecha/hora inválida."}, status=400)
-
-                # 2. OVERBOOKING Y DURACIÓN
-                duracion = 20
-                try:
-                    if service_profile:
-                        duracion = service_profile.get("duracion", 20) or 20
-                except Exception:
-                    pass
+            h_ini_dt = datetime.strptime(hora_inicio_str, fmt)
+            h_fin_dt = h_ini_dt + timedelta(minutes=duracion)
+            if h_fin_dt.date() != h_ini_dt.date():
+                return Response({"detalle": "La cita debe terminar el mismo día en que empieza."}, status=400)
+            data["hora_fin"] = h_fin_dt.strftime("%H:%M:%S")
 
-                h_fin_dt = datetime.strptime(hora_inicio_str, fmt) + timedelta(minutes=duracion)
-                data["hora_fin"] = h_fin_dt.strftime("%H:%M:%S")
+            # Hold de otro usuario sobre el horario: se resuelve sin tocar la base de datos
+            if slot_holds.en_conflicto(data.get("profesional_id"), f_ini, h_ini, h_fin_dt.time(), reserva_token):
+                return Response({"detalle": MENSAJE_HORARIO_RESERVADO}, status=409)
 
-                # Cruces
-                cruce_medico = (
-                    Cita.objects.select_for_update()
-                    .filter(
+            with transaction.atomic():
+                # Cruces. En PostgreSQL el del profesional lo resuelve la restricción de
+                # exclusión al insertar; la consulta no protege dos reservas simultáneas.
+                if not usa_restricciones_exclusion():
+                    cruce_medico = Cita.objects.filter(
                         profesional_id=data.get("profesional_id"),
                         fecha=fecha_solicitada,
-                        estado__in=["PENDIENTE", "ACEPTADA", "EN_SALA", "LLAMADO"],
+                        estado__in=ESTADOS_BLOQUEANTES,
                         hora_inicio__lt=h_fin_dt.time(),
                         hora_fin__gt=h_ini,
-                    )
-                    .exists()
-                )
-                if cruce_medico:
-                    return Response({"detalle": "Horario no disponible (Cruce médico)."}, status=409)
+                    ).exists()
+                    if cruce_medico:
+                        return Response({"detalle": MENSAJE_CRUCE_MEDICO}, status=409)
 
                 cruce_paciente = (
                     Cita.objects.filter(
                         paciente_id=paciente_id,
                         fecha=fecha_solicitada,
-                        estado__in=["PENDIENTE", "ACEPTADA", "EN_SALA", "LLAMADO"],
+                        estado__in=ESTADOS_BLOQUEANTES,
                         hora_inicio__lt=h_fin_dt.time(),
                         hora_fin__gt=h_ini,
                     ).exists()
@@ -442,7 +986,15 @@ class CitaViewSet(viewsets.ModelViewSet):
 
                 serializer = self.get_serializer(data=data)
                 serializer.is_valid(raise_exception=True)
-                self.perform_create(serializer)
+                try:
+                    with transaction.atomic():
+                        self.perform_create(serializer)
+                except IntegrityError as e:
+                    if es_violacion(e, CITA_SIN_CRUCES):
+                        return Response({"detalle": MENSAJE_CRUCE_MEDICO}, status=409)
+                    raise
+                if reserva_token:
+                    transaction.on_commit(lambda: slot_holds.consumir(reserva_token))
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         except Exception as e:
@@ -452,32 +1004,23 @@ class CitaViewSet(viewsets.ModelViewSet):
     def update(self, request, *args, **kwargs):
         instance = self.get_object()
         nuevo_estado = request.data.get("estado")
-        config, _ = ConfiguracionGlobal.objects.get_or_create(pk=1)
-        workflow = config.workflow_citas or []
+        _, workflow = config_cache.obtener()
 
-        estados_validos = [st["slug"] for st in workflow]
-        if nuevo_estado and nuevo_estado not in estados_validos:
+        if nuevo_estado and not workflow.es_valido(nuevo_estado):
             return Response({"detalle": f"El estado '{nuevo_estado}' no es válido."}, status=400)
 
-        estados_finales = [st["slug"] for st in workflow if not st.get("acciones")]
-        if instance.estado in estados_finales and nuevo_estado != instance.estado:
+        if workflow.es_final(instance.estado) and nuevo_estado != instance.estado:
             if not (getattr(request.user, "is_staff", False) or getattr(request.user, "is_superuser", False)):
                 return Response({"detalle": "Cita en estado final."}, status=400)
 
         if nuevo_estado == instance.estado == "LLAMADO":
             instance.save(update_fields=["updated_at"])
+            _notificar_sala(instance)
             return Response(self.get_serializer(instance).data)
 
         if nuevo_estado and nuevo_estado != instance.estado:
-            st_actual = next((s for s in workflow if s.get("slug") == instance.estado), None)
-            allowed = [
-                a.get("target")
-                for a in (st_actual.get("acciones", []) if st_actual else [])
-                if a.get("target")
-            ]
-
             es_admin = getattr(request.user, "is_staff", False) or getattr(request.user, "is_superuser", False)
-            if (nuevo_estado not in allowed) and (not es_admin):
+            if not workflow.permite(instance.estado, nuevo_estado) and not es_admin:
                 return Response(
                     {"detalle": f"Transición no permitida: {instance.estado} -> {nuevo_estado}"},
                     status=400,
@@ -513,16 +1056,27 @@ class CitaViewSet(viewsets.ModelViewSet):
                 metadata={"cita_id": instance.pk},
             )
 
-        return super().update(request, *args, **kwargs)
+        try:
+            with transaction.atomic():
+                return super().update(request, *args, **kwargs)
+        except IntegrityError as e:
+            # Reprogramar o reactivar sobre un horario ya ocupado
+            if es_violacion(e, CITA_SIN_CRUCES):
+                return Response({"detalle": MENSAJE_CRUCE_MEDICO}, status=409)
+            raise
 
     def list(self, request, *args, **kwargs):
         response = super().list(request, *args, **kwargs)
         data = response.data.get("results") if isinstance(response.data, dict) and "results" in response.data else response.data
+        self._tiempos_enriquecimiento = {}
         data_enriquecida = self._enrich_data(data)
         if isinstance(response.data, dict) and "results" in response.data:
             response.data["results"] = data_enriquecida
         else:
             response.data = data_enriquecida
+        if self._tiempos_enriquecimiento:
+            response["Server-Timing"] = server_timing(self._tiempos_enriquecimiento)
+            logger.info("Enriquecimiento de citas: %s", self._tiempos_enriquecimiento)
         return response
 
     def _enrich_data(self, citas):
@@ -540,26 +1094,18 @@ class CitaViewSet(viewsets.ModelViewSet):
             if c.get("lugar_id"):
                 ids["lugar"].add(str(c["lugar_id"]))
 
-        def fetch_bulk(url, id_set):
-            if not id_set:
-                return {}
-            try:
-                clean_ids = [i for i in id_set if i and i != "None"]
-                if not clean_ids:
-                    return {}
-                r = requests.get(
-                    f"{url}?ids={','.join(clean_ids)}",
-                    timeout=2,
-                    headers=_internal_headers(),
-                )
-                return r.json() if r.status_code == 200 else {}
-            except Exception:
-                return {}
-
-        info_pacientes = fetch_bulk(PATIENTS_MS_URL, ids["paciente"])
-        info_profesionales = fetch_bulk(STAFF_MS_URL, ids["profesional"])
-        info_servicios = fetch_bulk(SERVICES_MS_URL, ids["servicio"])
-        info_lugares = fetch_bulk(LUGARES_MS_URL, ids["lugar"])
+        datos, self._tiempos_enriquecimiento = resolver_referencias(
+            {
+                "pacientes": ids["paciente"],
+                "profesionales": ids["profesional"],
+                "servicios": ids["servicio"],
+                "lugares": ids["lugar"],
+            }
+        )
+        info_pacientes = datos["pacientes"]
+        info_profesionales = datos["profesionales"]
+        info_servicios = datos["servicios"]
+        info_lugares = datos["lugares"]
 
         for c in citas:
             p_id = str(c.get("paciente_id"))
@@ -593,3 +1139,30 @@ class NotaMedicaViewSet(viewsets.ModelViewSet):
 class HistoricoCitaViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = HistoricoCita.objects.all().order_by("-fecha_registro")
     serializer_class = HistoricoCitaSerializer
+    filter_backends = [DjangoFilterBackend]
+    # fecha_cita primero: es la columna que encabeza los índices del histórico
+    filterset_fields = {
+        "fecha_cita": ["exact", "gte", "lte"],
+        "estado": ["exact", "in"],
+        "profesional_id": ["exact"],
+        "paciente_id": ["exact"],
+        "cita_original_id": ["exact"],
+    }
+
+
+class ReferenciaInvalidationView(APIView):
+    """
+    Notificación interna (patients-ms/professionals-ms) de que cambiaron datos
+    de referencia usados para enriquecer citas (nombres, documentos, ...).
+    """
+    authentication_classes = []
+    permission_classes = [InternalToken]
+
+    def post(self, request):
+        entidad = request.data.get("entidad")
+        ids = request.data.get("ids") or []
+        if entidad not in reference_cache.ENTIDADES or not isinstance(ids, list) or not ids:
+            return Response({"error": "Parámetros inválidos."}, status=400)
+
+        reference_cache.invalidar(entidad, ids)
+        return Response(status=204)
@@ -0,0 +1,40 @@
+"""
+Flujo de estados de las citas compilado a búsquedas O(1).
+
+ConfiguracionGlobal.workflow_citas es una lista JSON editable desde el admin;
+se compila una vez por versión de la configuración (ver utils/config_cache).
+"""
+
+from typing import Dict, FrozenSet, Iterable, Mapping, Tuple
+
+
+class WorkflowCompilado:
+    def __init__(self, workflow: Iterable[Mapping]):
+        transiciones: Dict[str, FrozenSet[str]] = {}
+        requiere_motivo: Dict[Tuple[str, str], bool] = {}
+        for estado in workflow or []:
+            slug = estado.get("slug")
+            if not slug:
+                continue
+            acciones = [a for a in estado.get("acciones") or [] if a.get("target")]
+            transiciones[slug] = frozenset(a["target"] for a in acciones)
+            for a in acciones:
+                requiere_motivo[(slug, a["target"])] = bool(a.get("requiere_motivo"))
+
+        self.transiciones = transiciones
+        self.estados = frozenset(transiciones)
+        # Estados sin acciones: la cita ya no avanza
+        self.finales = frozenset(slug for slug, destinos in transiciones.items() if not destinos)
+        self._requiere_motivo = requiere_motivo
+
+    def es_valido(self, slug: str) -> bool:
+        return slug in self.estados
+
+    def es_final(self, slug: str) -> bool:
+        return slug in self.finales
+
+    def permite(self, desde: str, hacia: str) -> bool:
+        return hacia in self.transiciones.get(desde, ())
+
+    def requiere_motivo(self, desde: str, hacia: str) -> bool:
+        return self._requiere_motivo.get((desde, hacia), False)
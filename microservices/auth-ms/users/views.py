@@ -275,6 +275,17 @@ def _get_ip(request):
         return xff.split(",")[0].strip()
     return request.META.get("REMOTE_ADDR")
 
+# Tope de eventos por POST en registrar-lote
+MAX_EVENTOS_LOTE = 500
+
+
+def _token_auditoria_valido(request):
+    token = request.headers.get("X-INTERNAL-TOKEN", "")
+    expected = getattr(settings, "INTERNAL_AUDIT_TOKEN", "") or ""
+    # ✅ comparación segura
+    return bool(token and expected and hmac.compare_digest(token, expected))
+
+
 class AuditoriaViewSet(viewsets.ModelViewSet):
     queryset = Auditoria.objects.all().order_by("-fecha")
     serializer_class = AuditoriaSerializer
@@ -298,11 +309,7 @@ class AuditoriaViewSet(viewsets.ModelViewSet):
         """
         Endpoint para registrar auditoría desde otros microservicios (protegido por token interno).
         """
-        token = request.headers.get("X-INTERNAL-TOKEN", "")
-        expected = getattr(settings, "INTERNAL_AUDIT_TOKEN", "") or ""
-
-        # ✅ comparación segura
-        if not token or not expected or not hmac.compare_digest(token, expected):
+        if not _token_auditoria_valido(request):
             return Response({"detail": "Token inválido"}, status=status.HTTP_403_FORBIDDEN)
 
         # ✅ opcional: completar ip/user_agent si el emisor no lo manda
@@ -315,6 +322,35 @@ class AuditoriaViewSet(viewsets.ModelViewSet):
         obj = serializer.save()
         return Response(self.get_serializer(obj).data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=["post"], url_path="registrar-lote", permission_classes=[AllowAny])
+    def registrar_lote(self, request):
+        """
+        Varios eventos en un solo POST (operaciones masivas de otros microservicios).
+        Body: {"eventos": [{...mismo formato que registrar...}, ...]}
+        """
+        if not _token_auditoria_valido(request):
+            return Response({"detail": "Token inválido"}, status=status.HTTP_403_FORBIDDEN)
+
+        eventos = request.data.get("eventos") if isinstance(request.data, dict) else None
+        if not isinstance(eventos, list) or not eventos:
+            return Response({"detail": "Se requiere una lista de eventos."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(eventos) > MAX_EVENTOS_LOTE:
+            return Response(
+                {"detail": f"Máximo {MAX_EVENTOS_LOTE} eventos por lote."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ip = _get_ip(request)
+        user_agent = request.META.get("HTTP_USER_AGENT")
+        for evento in eventos:
+            if isinstance(evento, dict):
+                evento.setdefault("ip", ip)
+                evento.setdefault("user_agent", user_agent)
+
+        serializer = self.get_serializer(data=eventos, many=True)
+        serializer.is_valid(raise_exception=True)
+        creados = Auditoria.objects.bulk_create(Auditoria(**datos) for datos in serializer.validated_data)
+        return Response({"registrados": len(creados)}, status=status.HTTP_201_CREATED)
+
 
 def guardar_auditoria(
     request,
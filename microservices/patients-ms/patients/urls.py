@@ -4,6 +4,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     BulkPacienteView,
     PacienteViewSet,
+    PerfilReservaPacienteView,
     SolicitudValidacionViewSet,
     SyncPacienteUserView,
     TipoPacienteViewSet,
@@ -18,6 +19,7 @@ router.register(r"solicitudes", SolicitudValidacionViewSet, basename="solicitud"
 urlpatterns = [
     path("internal/sync-user/", SyncPacienteUserView.as_view(), name="sync_user"),
     path("internal/bulk-info/", BulkPacienteView.as_view(), name="bulk_pacientes"),
+    path("internal/<int:pk>/perfil-reserva/", PerfilReservaPacienteView.as_view(), name="perfil_reserva_paciente"),
     # --- RUTAS DEL ROUTER (Deben ir AL FINAL) ---
     path("", include(router.urls)),
 ]
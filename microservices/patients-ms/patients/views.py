@@ -12,6 +12,7 @@ from .serializers import (
     SolicitudValidacionSerializer,
     TipoPacienteSerializer,
 )
+from .utils.appointments_client import notificar_cambio_referencia
 from .utils.audit_client import audit_log
 
 
@@ -136,6 +137,7 @@ class PacienteViewSet(viewsets.ModelViewSet):
                 "user_id": getattr(obj, "user_id", None),
             },
         )
+        notificar_cambio_referencia("pacientes", [obj.pk])
 
     def perform_destroy(self, instance):
         pk = instance.pk
@@ -154,6 +156,7 @@ class PacienteViewSet(viewsets.ModelViewSet):
             recurso_id=pk,
             metadata=meta,
         )
+        notificar_cambio_referencia("pacientes", [pk])
 
     @action(detail=True, methods=["post"], url_path="reset-inasistencias")
     def reset_inasistencias(self, request, pk=None):
@@ -300,3 +303,18 @@ class BulkPacienteView(APIView):
                 "fecha_nacimiento": p.fecha_nacimiento.isoformat() if p.fecha_nacimiento else None,
             }
         return Response(data)
+
+
+# 6) Perfil de reserva (internal): solo lo que appointments-ms valida al agendar
+class PerfilReservaPacienteView(APIView):
+    permission_classes = [InternalTokenOrAuthenticatedReadOnly]
+
+    def get(self, request, pk):
+        perfil = (
+            Paciente.objects.filter(pk=pk)
+            .values("id", "user_id", "tipo_usuario", "ultima_fecha_desbloqueo", "activo")
+            .first()
+        )
+        if not perfil:
+            return Response({"detail": "No encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(perfil)
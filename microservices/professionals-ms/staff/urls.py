@@ -7,6 +7,7 @@ from .views import (
     BulkServicioView,
     EspecialidadViewSet,
     LugarViewSet,
+    ProfesionalesElegiblesView,
     ProfesionalViewSet,
     ServicioViewSet,
 )
@@ -24,6 +25,11 @@ urlpatterns = [
         BulkServicioView.as_view(),
         name="bulk_servicios",
     ),
+    path(
+        "servicios/internal/elegibles/",
+        ProfesionalesElegiblesView.as_view(),
+        name="profesionales_elegibles",
+    ),
     path("lugares/internal/bulk-info/", BulkLugarView.as_view(), name="bulk_lugares"),
     path("", include(router.urls)),
 ]
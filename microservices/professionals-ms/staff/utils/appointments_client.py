@@ -0,0 +1,42 @@
+import logging
+import os
+from typing import Iterable
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFERENCIAS_INVALIDATE_URL = "http://appointments-ms:8004/api/v1/internal/referencias/invalidar/"
+
+
+def notificar_cambio_referencia(entidad: str, ids: Iterable, *, timeout: int = 1) -> bool:
+    """
+    Avisa a appointments-ms que cambiaron datos usados para enriquecer citas
+    (entidad: "pacientes", "profesionales", "servicios" o "lugares") para que
+    invalide su caché de referencias. Si falla, NO rompe flujo (la caché
+    expira sola por TTL).
+    """
+    ids = sorted({str(i) for i in ids if i is not None})
+    if not ids:
+        return False
+
+    url = os.getenv("REFERENCIAS_INVALIDATE_URL", DEFAULT_REFERENCIAS_INVALIDATE_URL).strip()
+    token = os.getenv("INTERNAL_SERVICE_TOKEN", "").strip()
+    if not token:
+        logger.warning("[appointments_client] INTERNAL_SERVICE_TOKEN no configurado. Invalidación deshabilitada.")
+        return False
+
+    try:
+        resp = requests.post(
+            url,
+            json={"entidad": entidad, "ids": ids},
+            headers={"X-INTERNAL-TOKEN": token, "Content-Type": "application/json"},
+            timeout=timeout,
+        )
+        if resp.status_code in (200, 204):
+            return True
+        logger.warning("[appointments_client] Respuesta no OK (%s) %s", resp.status_code, url)
+        return False
+    except requests.RequestException as e:
+        logger.warning("[appointments_client] Error invalidando referencias: %s", str(e))
+        return False
@@ -11,6 +11,7 @@ from .serializers import (
     ProfesionalSerializer,
     ServicioSerializer,
 )
+from .utils.appointments_client import notificar_cambio_referencia
 from .utils.audit_client import audit_log
 
 
@@ -105,6 +106,7 @@ class LugarViewSet(viewsets.ModelViewSet):
             recurso_id=obj.pk,
             metadata={"nombre": getattr(obj, "nombre", None), "ciudad": getattr(obj, "ciudad", None)},
         )
+        notificar_cambio_referencia("lugares", [obj.pk])
 
     def perform_destroy(self, instance):
         pk = instance.pk
@@ -118,6 +120,7 @@ class LugarViewSet(viewsets.ModelViewSet):
             recurso_id=pk,
             metadata=meta,
         )
+        notificar_cambio_referencia("lugares", [pk])
 
 
 class ProfesionalViewSet(viewsets.ModelViewSet):
@@ -149,6 +152,7 @@ class ProfesionalViewSet(viewsets.ModelViewSet):
             recurso_id=obj.pk,
             metadata={"nombre": getattr(obj, "nombre", None), "activo": getattr(obj, "activo", None)},
         )
+        notificar_cambio_referencia("profesionales", [obj.pk])
 
     def perform_destroy(self, instance):
         pk = instance.pk
@@ -162,6 +166,7 @@ class ProfesionalViewSet(viewsets.ModelViewSet):
             recurso_id=pk,
             metadata=meta,
         )
+        notificar_cambio_referencia("profesionales", [pk])
 
 
 class ServicioViewSet(viewsets.ModelViewSet):
@@ -193,6 +198,7 @@ class ServicioViewSet(viewsets.ModelViewSet):
             recurso_id=obj.pk,
             metadata={"nombre": getattr(obj, "nombre", None), "activo": getattr(obj, "activo", None)},
         )
+        notificar_cambio_referencia("servicios", [obj.pk])
 
     def perform_destroy(self, instance):
         pk = instance.pk
@@ -206,6 +212,7 @@ class ServicioViewSet(viewsets.ModelViewSet):
             recurso_id=pk,
             metadata=meta,
         )
+        notificar_cambio_referencia("servicios", [pk])
 
 
 class BulkProfesionalView(APIView):
@@ -245,12 +252,39 @@ class BulkServicioView(APIView):
             data[str(s.id)] = {
                 "nombre": s.nombre,
                 "duracion": getattr(s, "duracion_minutos", None),
+                "buffer": getattr(s, "buffer_minutos", 0) or 0,
                 "precio": getattr(s, "precio_base", None),
                 "tipos_paciente_ids": getattr(s, "tipos_paciente_ids", []) or [],
             }
         return Response(data)
 
 
+class ProfesionalesElegiblesView(APIView):
+    """
+    Profesionales activos habilitados para un servicio (y opcionalmente una
+    sede), en una sola consulta. Lo usa schedule-ms para buscar el primer cupo.
+    """
+
+    permission_classes = [InternalTokenOrAuthenticated]
+
+    def get(self, request):
+        servicio_id = request.query_params.get("servicio_id")
+        lugar_id = request.query_params.get("lugar_id")
+        if not servicio_id:
+            return Response({"error": "servicio_id es requerido."}, status=400)
+
+        qs = Profesional.objects.filter(
+            activo=True,
+            servicios_habilitados__id=servicio_id,
+            servicios_habilitados__activo=True,
+        )
+        if lugar_id:
+            qs = qs.filter(lugares_atencion__id=lugar_id)
+
+        data = list(qs.distinct().order_by("id").values("id", "nombre"))
+        return Response(data)
+
+
 class BulkLugarView(APIView):
     permission_classes = [InternalTokenOrAuthenticated]
 
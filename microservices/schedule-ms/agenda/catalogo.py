@@ -0,0 +1,85 @@
+"""
+Catálogo de servicios de professionals-ms (duración y buffer) con caché local.
+
+El calendario de slots usa la misma duración con la que appointments-ms
+calcula hora_fin al agendar; el buffer solo separa los inicios de la grilla.
+"""
+
+import logging
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from .services import _internal_headers
+
+logger = logging.getLogger(__name__)
+
+STAFF_SERVICIOS_BULK_URL = "http://professionals-ms:8002/api/v1/staff/servicios/internal/bulk-info/"
+
+# Duración por defecto cuando no hay servicio (misma que appointments-ms)
+DURACION_POR_DEFECTO = 20
+
+
+def _ttl():
+    return getattr(settings, "SERVICIOS_CACHE_TTL", 300)
+
+
+def _servicio_key(servicio_id):
+    return f"catalogo:servicio:{int(servicio_id)}"
+
+
+def servicios(servicio_ids, timeout=2):
+    """
+    {servicio_id: {"duracion": int, "buffer": int, ...}} desde caché; los que
+    faltan se piden a professionals-ms en una sola llamada. Si no responde,
+    se omiten (sin cachear el fallo).
+    """
+    ids = sorted({int(s) for s in servicio_ids})
+    llaves = {sid: _servicio_key(sid) for sid in ids}
+    encontrados = cache.get_many(list(llaves.values()))
+    resultado = {sid: encontrados[llave] for sid, llave in llaves.items() if llave in encontrados}
+
+    faltantes = [sid for sid in ids if sid not in resultado]
+    if not faltantes:
+        return resultado
+
+    try:
+        resp = requests.get(
+            STAFF_SERVICIOS_BULK_URL,
+            params={"ids": ",".join(str(s) for s in faltantes)},
+            timeout=timeout,
+            headers=_internal_headers(),
+        )
+        if resp.status_code != 200:
+            logger.warning(f"Catálogo de servicios respondió {resp.status_code}")
+            return resultado
+        payload = resp.json() or {}
+    except Exception as e:
+        logger.warning(f"Error consultando catálogo de servicios: {e}")
+        return resultado
+
+    nuevos = {}
+    for sid in faltantes:
+        info = payload.get(str(sid))
+        if info:
+            resultado[sid] = info
+            nuevos[llaves[sid]] = info
+    if nuevos:
+        cache.set_many(nuevos, timeout=_ttl())
+    return resultado
+
+
+def duracion_y_paso(servicio_id, duracion_por_defecto=DURACION_POR_DEFECTO):
+    """
+    (duración, paso de la grilla) para un servicio: duración del catálogo y
+    paso = duración + buffer_minutos. Sin servicio (o si el catálogo no lo
+    conoce) se usa la duración por defecto y la grilla sin buffer.
+    """
+    info = servicios([servicio_id]).get(int(servicio_id)) if servicio_id else None
+    duracion = (info or {}).get("duracion")
+    if not duracion:
+        return int(duracion_por_defecto), None
+
+    buffer = (info or {}).get("buffer") or 0
+    return int(duracion), int(duracion) + int(buffer) if buffer else None
@@ -0,0 +1,30 @@
+"""
+Restricciones de exclusión (PostgreSQL) que impiden cruces de agenda por
+profesional directamente en la base de datos.
+
+En PostgreSQL las validaciones de cruce de los serializers no consultan la
+tabla: confían en la restricción y traducen la violación al mensaje de
+siempre. En otros motores (SQLite en pruebas locales) se mantiene la consulta.
+"""
+
+from django.db import connections
+
+DISPONIBILIDAD_SIN_CRUCES = "agenda_disponibilidad_sin_cruces"
+BLOQUEO_SIN_CRUCES = "agenda_bloqueo_sin_cruces"
+
+MENSAJE_CRUCE_DISPONIBILIDAD = "El profesional ya tiene horarios en este rango (conflicto de agenda)."
+MENSAJE_CRUCE_BLOQUEO = "Ya existe un bloqueo que se cruza con este rango horario."
+
+
+def usa_restricciones_exclusion(using="default"):
+    return connections[using].vendor == "postgresql"
+
+
+def es_violacion(error, nombre):
+    """
+    True si el IntegrityError corresponde a la restricción `nombre`.
+    """
+    diag = getattr(getattr(error, "__cause__", None), "diag", None)
+    if diag is not None and getattr(diag, "constraint_name", None):
+        return diag.constraint_name == nombre
+    return nombre in str(error)
@@ -0,0 +1,115 @@
+# Generated by Django 5.2.11 on 2026-10-18
+
+from django.db import migrations, models
+from django.db.models import F
+
+DISPONIBILIDAD_SIN_CRUCES = "agenda_disponibilidad_sin_cruces"
+BLOQUEO_SIN_CRUCES = "agenda_bloqueo_sin_cruces"
+
+# Rango de fechas en que aplica el horario (fecha fija o vigencia; NULL = abierto)
+# y rango horario sobre un día ancla, porque no existe un tipo rango para time.
+# Solo se comparan filas del mismo tipo (serie con serie, fecha fija con fecha fija):
+# una fecha fija contra las series que la cubren la sigue validando el serializer.
+DISPONIBILIDAD_EXCLUSION_SQL = f"""
+ALTER TABLE agenda_disponibilidad ADD CONSTRAINT {DISPONIBILIDAD_SIN_CRUCES}
+EXCLUDE USING gist (
+    profesional_id WITH =,
+    dia_semana WITH =,
+    ((fecha IS NULL)::int) WITH =,
+    daterange(COALESCE(fecha, fecha_inicio_vigencia), COALESCE(fecha, fecha_fin_vigencia), '[]') WITH &&,
+    tsrange(DATE '2000-01-01' + hora_inicio, DATE '2000-01-01' + hora_fin, '[)') WITH &&
+) WHERE (activo)
+"""
+
+BLOQUEO_EXCLUSION_SQL = f"""
+ALTER TABLE agenda_bloqueoagenda ADD CONSTRAINT {BLOQUEO_SIN_CRUCES}
+EXCLUDE USING gist (
+    profesional_id WITH =,
+    tstzrange(fecha_inicio, fecha_fin, '[)') WITH &&
+)
+"""
+
+CRUCES_DISPONIBILIDAD_SQL = """
+SELECT a.id, b.id FROM agenda_disponibilidad a
+JOIN agenda_disponibilidad b
+  ON a.profesional_id = b.profesional_id AND a.dia_semana = b.dia_semana AND a.id < b.id
+  AND (a.fecha IS NULL) = (b.fecha IS NULL)
+WHERE a.activo AND b.activo
+  AND daterange(COALESCE(a.fecha, a.fecha_inicio_vigencia), COALESCE(a.fecha, a.fecha_fin_vigencia), '[]')
+   && daterange(COALESCE(b.fecha, b.fecha_inicio_vigencia), COALESCE(b.fecha, b.fecha_fin_vigencia), '[]')
+  AND a.hora_inicio < b.hora_fin AND b.hora_inicio < a.hora_fin
+LIMIT 20
+"""
+
+CRUCES_BLOQUEO_SQL = """
+SELECT a.id, b.id FROM agenda_bloqueoagenda a
+JOIN agenda_bloqueoagenda b ON a.profesional_id = b.profesional_id AND a.id < b.id
+WHERE a.fecha_inicio < b.fecha_fin AND b.fecha_inicio < a.fecha_fin
+LIMIT 20
+"""
+
+
+def reparar_rangos(apps, schema_editor):
+    """
+    Filas que darían un rango inválido (inicio > fin) al crear la restricción.
+    El borrado de series cortaba la vigencia a "ayer" aunque la serie empezara
+    después: esas series nunca aplicaron, se desactivan con fin = inicio.
+    """
+    Disponibilidad = apps.get_model("agenda", "Disponibilidad")
+    Disponibilidad.objects.filter(fecha_fin_vigencia__lt=F("fecha_inicio_vigencia")).update(
+        activo=False, fecha_fin_vigencia=F("fecha_inicio_vigencia")
+    )
+    Disponibilidad.objects.filter(activo=True, hora_fin__lte=F("hora_inicio")).update(activo=False)
+
+
+def crear_restricciones(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for tabla, sql in (("disponibilidad", CRUCES_DISPONIBILIDAD_SQL), ("bloqueo", CRUCES_BLOQUEO_SQL)):
+            cursor.execute(sql)
+            cruces = cursor.fetchall()
+            if cruces:
+                raise RuntimeError(
+                    f"Hay registros de {tabla} que se cruzan y deben corregirse antes de migrar "
+                    f"(pares de ids, máximo 20): {cruces}"
+                )
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(DISPONIBILIDAD_EXCLUSION_SQL)
+    schema_editor.execute(BLOQUEO_EXCLUSION_SQL)
+
+
+def eliminar_restricciones(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"ALTER TABLE agenda_disponibilidad DROP CONSTRAINT IF EXISTS {DISPONIBILIDAD_SIN_CRUCES}")
+    schema_editor.execute(f"ALTER TABLE agenda_bloqueoagenda DROP CONSTRAINT IF EXISTS {BLOQUEO_SIN_CRUCES}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("agenda", "0005_disponibilidad_fecha_inicio_vigencia_and_bloqueo_usuario_id"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bloqueoagenda",
+            index=models.Index(fields=["profesional_id", "fecha_inicio", "fecha_fin"], name="bloqueo_prof_rango_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="disponibilidad",
+            index=models.Index(
+                condition=models.Q(("activo", True)),
+                fields=["profesional_id", "dia_semana", "hora_inicio"],
+                name="disp_prof_dia_activo_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="disponibilidad",
+            index=models.Index(fields=["profesional_id", "fecha"], name="disp_prof_fecha_idx"),
+        ),
+        migrations.RunPython(reparar_rangos, migrations.RunPython.noop),
+        migrations.RunPython(crear_restricciones, eliminar_restricciones),
+    ]
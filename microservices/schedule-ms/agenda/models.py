@@ -42,6 +42,16 @@ class Disponibilidad(models.Model):
         verbose_name = "Disponibilidad"
         verbose_name_plural = "Disponibilidades"
         ordering = ["dia_semana", "hora_inicio"]
+        # Forma de la consulta de slots: profesional + día de la semana (+ fecha fija) sobre activos.
+        # Los cruces se impiden con la restricción de exclusión de la migración 0006 (PostgreSQL).
+        indexes = [
+            models.Index(
+                fields=["profesional_id", "dia_semana", "hora_inicio"],
+                condition=models.Q(activo=True),
+                name="disp_prof_dia_activo_idx",
+            ),
+            models.Index(fields=["profesional_id", "fecha"], name="disp_prof_fecha_idx"),
+        ]
 
     def clean(self):
         if self.hora_inicio and self.hora_fin and self.hora_inicio >= self.hora_fin:
@@ -61,6 +71,9 @@ class BloqueoAgenda(models.Model):
     class Meta:
         verbose_name = "Bloqueo de Agenda"
         verbose_name_plural = "Bloqueos de Agenda"
+        indexes = [
+            models.Index(fields=["profesional_id", "fecha_inicio", "fecha_fin"], name="bloqueo_prof_rango_idx"),
+        ]
 
     def __str__(self):
         return f"Bloqueo Prof {self.profesional_id}: {self.motivo}"
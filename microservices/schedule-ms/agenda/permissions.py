@@ -0,0 +1,12 @@
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+
+class InternalToken(BasePermission):
+    """
+    Solo llamadas entre microservicios con X-INTERNAL-TOKEN válido.
+    """
+
+    def has_permission(self, request, view):
+        token = request.headers.get("X-INTERNAL-TOKEN")
+        return bool(token and token == getattr(settings, "INTERNAL_SERVICE_TOKEN", None))
@@ -1,13 +1,50 @@
 import datetime
 
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from django.utils import timezone
 from rest_framework import serializers
 
+from .constraints import (
+    BLOQUEO_SIN_CRUCES,
+    DISPONIBILIDAD_SIN_CRUCES,
+    MENSAJE_CRUCE_BLOQUEO,
+    MENSAJE_CRUCE_DISPONIBILIDAD,
+    es_violacion,
+    usa_restricciones_exclusion,
+)
 from .models import BloqueoAgenda, Disponibilidad
 
 
-class DisponibilidadSerializer(serializers.ModelSerializer):
+class SinCrucesMixin:
+    """
+    Traduce la violación de la restricción de exclusión al mensaje de
+    validación de siempre. El savepoint evita dañar la transacción externa.
+    """
+
+    restriccion_sin_cruces = None
+    mensaje_cruce = None
+
+    def _guardar(self, guardar, *args):
+        try:
+            with transaction.atomic():
+                return guardar(*args)
+        except IntegrityError as e:
+            if es_violacion(e, self.restriccion_sin_cruces):
+                raise serializers.ValidationError(self.mensaje_cruce) from e
+            raise
+
+    def create(self, validated_data):
+        return self._guardar(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._guardar(super().update, instance, validated_data)
+
+
+class DisponibilidadSerializer(SinCrucesMixin, serializers.ModelSerializer):
+    restriccion_sin_cruces = DISPONIBILIDAD_SIN_CRUCES
+    mensaje_cruce = MENSAJE_CRUCE_DISPONIBILIDAD
+
     dia_nombre = serializers.CharField(source="get_dia_semana_display", read_only=True)
 
     class Meta:
@@ -72,6 +109,10 @@ class DisponibilidadSerializer(serializers.ModelSerializer):
             if in_past:
                 raise serializers.ValidationError("No se puede crear agenda en el pasado.")
 
+        # En PostgreSQL la restricción de exclusión impide los cruces entre filas del mismo tipo
+        # (serie con serie, fecha fija con fecha fija; ver _guardar). Una fecha fija contra las
+        # series que la cubren se sigue validando aquí, igual que antes; una serie nueva no se
+        # compara con fechas fijas ya creadas.
         if activo and profesional_id is not None and dia_semana is not None and hora_inicio and hora_fin:
             overlapping = Disponibilidad.objects.filter(
                 profesional_id=profesional_id,
@@ -80,14 +121,16 @@ class DisponibilidadSerializer(serializers.ModelSerializer):
             ).filter(Q(hora_inicio__lt=hora_fin) & Q(hora_fin__gt=hora_inicio))
 
             if fecha:
-                overlapping = overlapping.filter(
-                    Q(fecha=fecha)
-                    | (
-                        Q(fecha__isnull=True)
-                        & (Q(fecha_inicio_vigencia__isnull=True) | Q(fecha_inicio_vigencia__lte=fecha))
-                        & (Q(fecha_fin_vigencia__isnull=True) | Q(fecha_fin_vigencia__gte=fecha))
-                    )
+                cruces = (
+                    Q(fecha__isnull=True)
+                    & (Q(fecha_inicio_vigencia__isnull=True) | Q(fecha_inicio_vigencia__lte=fecha))
+                    & (Q(fecha_fin_vigencia__isnull=True) | Q(fecha_fin_vigencia__gte=fecha))
                 )
+                if not usa_restricciones_exclusion():
+                    cruces |= Q(fecha=fecha)
+                overlapping = overlapping.filter(cruces)
+            elif usa_restricciones_exclusion():
+                overlapping = overlapping.none()
             else:
                 overlapping = overlapping.filter(Q(fecha__isnull=True))
                 if fecha_inicio_vigencia:
@@ -103,14 +146,15 @@ class DisponibilidadSerializer(serializers.ModelSerializer):
                 overlapping = overlapping.exclude(pk=inst.pk)
 
             if overlapping.exists():
-                raise serializers.ValidationError(
-                    "El profesional ya tiene horarios en este rango (conflicto de agenda)."
-                )
+                raise serializers.ValidationError(MENSAJE_CRUCE_DISPONIBILIDAD)
 
         return data
 
 
-class BloqueoAgendaSerializer(serializers.ModelSerializer):
+class BloqueoAgendaSerializer(SinCrucesMixin, serializers.ModelSerializer):
+    restriccion_sin_cruces = BLOQUEO_SIN_CRUCES
+    mensaje_cruce = MENSAJE_CRUCE_BLOQUEO
+
     class Meta:
         model = BloqueoAgenda
         fields = "__all__"
@@ -124,7 +168,7 @@ class BloqueoAgendaSerializer(serializers.ModelSerializer):
         if fecha_inicio and fecha_fin and fecha_inicio >= fecha_fin:
             raise serializers.ValidationError("La fecha de inicio debe ser anterior a la fecha de fin.")
 
-        if fecha_inicio and fecha_fin and profesional_id:
+        if fecha_inicio and fecha_fin and profesional_id and not usa_restricciones_exclusion():
             overlapping = BloqueoAgenda.objects.filter(
                 profesional_id=profesional_id,
                 fecha_inicio__lt=fecha_fin,
@@ -133,6 +177,6 @@ class BloqueoAgendaSerializer(serializers.ModelSerializer):
             if self.instance:
                 overlapping = overlapping.exclude(pk=self.instance.pk)
             if overlapping.exists():
-                raise serializers.ValidationError("Ya existe un bloqueo que se cruza con este rango horario.")
+                raise serializers.ValidationError(MENSAJE_CRUCE_BLOQUEO)
 
         return data
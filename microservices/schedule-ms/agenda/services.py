@@ -0,0 +1,382 @@
+"""
+Carga en lote de la agenda (disponibilidades, bloqueos y citas ocupadas).
+
+Permite calcular slots de varios profesionales y varios días con una sola
+consulta por fuente, en lugar de una ronda de consultas por cada día.
+"""
+
+import logging
+import os
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+import requests
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import BloqueoAgenda, Disponibilidad
+from .slots import MINUTOS_DIA, a_hora, a_minutos, slots_libres
+
+logger = logging.getLogger(__name__)
+
+# Ajusta la URL si tu docker-compose usa otro nombre
+APPOINTMENTS_API_URL = "http://appointments-ms:8004/api/v1/citas/"
+APPOINTMENTS_OCUPACION_URL = f"{APPOINTMENTS_API_URL}ocupacion/"
+STAFF_INTERNAL_BULK_URL = "http://professionals-ms:8002/api/v1/staff/internal/bulk-info/"
+STAFF_ELEGIBLES_URL = "http://professionals-ms:8002/api/v1/staff/servicios/internal/elegibles/"
+
+# Estados de cita que liberan el horario (el resto ocupa el slot)
+ESTADOS_CITA_LIBRES = {"CANCELADA", "RECHAZADA"}
+
+
+def _internal_headers():
+    token = os.getenv("INTERNAL_SERVICE_TOKEN", "").strip()
+    return {"X-INTERNAL-TOKEN": token} if token else {}
+
+
+def rango_fechas(fecha_inicio, fecha_fin):
+    dias = (fecha_fin - fecha_inicio).days
+    return [fecha_inicio + timedelta(days=i) for i in range(dias + 1)]
+
+
+def disponibilidades_en_rango(profesional_ids, fecha_inicio, fecha_fin, servicio_id=None, lugar_id=None):
+    """
+    Una sola consulta con todos los horarios (fijos y recurrentes vigentes)
+    que pueden aplicar a algún día del rango.
+    """
+    dias_semana = {f.weekday() for f in rango_fechas(fecha_inicio, fecha_fin)[:7]}
+
+    horarios = Disponibilidad.objects.filter(
+        profesional_id__in=profesional_ids,
+        dia_semana__in=dias_semana,
+        activo=True,
+    ).filter(
+        Q(fecha__gte=fecha_inicio, fecha__lte=fecha_fin)
+        | (
+            Q(fecha__isnull=True)
+            & (Q(fecha_inicio_vigencia__isnull=True) | Q(fecha_inicio_vigencia__lte=fecha_fin))
+            & (Q(fecha_fin_vigencia__isnull=True) | Q(fecha_fin_vigencia__gte=fecha_inicio))
+        )
+    )
+
+    if servicio_id:
+        horarios = horarios.filter(Q(servicio_id__isnull=True) | Q(servicio_id=servicio_id))
+    if lugar_id:
+        horarios = horarios.filter(lugar_id=lugar_id)
+
+    return list(horarios.order_by("hora_inicio"))
+
+
+def horario_aplica(horario, fecha):
+    """
+    Misma regla que el filtro de SlotGeneratorView, evaluada en memoria.
+    """
+    if horario.dia_semana != fecha.weekday():
+        return False
+    if horario.fecha is not None:
+        return horario.fecha == fecha
+    if horario.fecha_inicio_vigencia and horario.fecha_inicio_vigencia > fecha:
+        return False
+    if horario.fecha_fin_vigencia and horario.fecha_fin_vigencia < fecha:
+        return False
+    return True
+
+
+def ventana_horario(horario):
+    """
+    (desde, hasta) en que un horario puede aplicar; NULL en vigencia = abierto.
+    """
+    if horario.fecha is not None:
+        return horario.fecha, horario.fecha
+    return horario.fecha_inicio_vigencia or date.min, horario.fecha_fin_vigencia or date.max
+
+
+def _horarios_se_cruzan(a, b):
+    a_desde, a_hasta = ventana_horario(a)
+    b_desde, b_hasta = ventana_horario(b)
+    return a.hora_inicio < b.hora_fin and a.hora_fin > b.hora_inicio and a_desde <= b_hasta and b_desde <= a_hasta
+
+
+def conflictos_de_horarios(nuevos):
+    """
+    Cruces de horarios nuevos (sin guardar) contra los activos existentes y
+    entre ellos mismos, con una sola consulta para todo el lote.
+    Devuelve [(nuevo, existente_o_nuevo), ...].
+    """
+    if not nuevos:
+        return []
+
+    ventanas = [ventana_horario(h) for h in nuevos]
+    desde = min(v[0] for v in ventanas)
+    hasta = max(v[1] for v in ventanas)
+
+    existentes = Disponibilidad.objects.filter(
+        profesional_id__in={h.profesional_id for h in nuevos},
+        dia_semana__in={h.dia_semana for h in nuevos},
+        activo=True,
+    ).filter(
+        Q(fecha__gte=desde, fecha__lte=hasta)
+        | (
+            Q(fecha__isnull=True)
+            & (Q(fecha_inicio_vigencia__isnull=True) | Q(fecha_inicio_vigencia__lte=hasta))
+            & (Q(fecha_fin_vigencia__isnull=True) | Q(fecha_fin_vigencia__gte=desde))
+        )
+    )
+
+    grupos = defaultdict(list)
+    for h in existentes:
+        grupos[(h.profesional_id, h.dia_semana)].append(h)
+
+    conflictos = []
+    for h in nuevos:
+        grupo = grupos[(h.profesional_id, h.dia_semana)]
+        otro = next((o for o in grupo if _horarios_se_cruzan(h, o)), None)
+        if otro is not None:
+            conflictos.append((h, otro))
+        grupo.append(h)
+    return conflictos
+
+
+def bloqueos_en_rango(profesional_ids, fecha_inicio, fecha_fin):
+    start_dt = timezone.make_aware(datetime.combine(fecha_inicio, time.min))
+    end_dt = timezone.make_aware(datetime.combine(fecha_fin, time.max))
+    return list(
+        BloqueoAgenda.objects.filter(
+            profesional_id__in=profesional_ids,
+            fecha_inicio__lte=end_dt,
+            fecha_fin__gte=start_dt,
+        )
+    )
+
+
+def _parse_hora(value):
+    value = (value or "").strip()
+    fmt = "%H:%M:%S" if len(value) > 5 else "%H:%M"
+    return datetime.strptime(value, fmt).time()
+
+
+def obtener_ocupacion(
+    profesional_ids,
+    fecha_inicio,
+    fecha_fin=None,
+    estados=None,
+    timeout=3,
+    dia_semana=None,
+    hora_desde=None,
+    hora_hasta=None,
+    incluir_reservas=False,
+):
+    """
+    Citas del rango en la proyección compacta de appointments-ms
+    (profesional_id, fecha, hora_inicio, hora_fin, estado).
+    Opcionalmente restringe a un día de la semana (0 = lunes) y a citas que
+    inician en [hora_desde, hora_hasta). Con incluir_reservas también trae los
+    horarios reservados temporalmente en el asistente (estado RESERVADA).
+    Devuelve None si appointments-ms no responde.
+    """
+    params = {
+        "profesional_id__in": ",".join(str(int(p)) for p in profesional_ids),
+        "fecha__gte": fecha_inicio.isoformat(),
+    }
+    if fecha_fin:
+        params["fecha__lte"] = fecha_fin.isoformat()
+    if estados:
+        params["estado__in"] = ",".join(sorted(estados))
+    if dia_semana is not None:
+        params["fecha__iso_week_day"] = dia_semana + 1
+    if hora_desde:
+        params["hora_inicio__gte"] = hora_desde.strftime("%H:%M:%S")
+    if hora_hasta:
+        params["hora_inicio__lt"] = hora_hasta.strftime("%H:%M:%S")
+    if incluir_reservas:
+        params["incluir_reservas"] = 1
+
+    try:
+        resp = requests.get(APPOINTMENTS_OCUPACION_URL, params=params, timeout=timeout, headers=_internal_headers())
+        if resp.status_code != 200:
+            logger.warning(f"Ocupación de citas respondió {resp.status_code}")
+            return None
+        payload = resp.json()
+    except Exception as e:
+        logger.warning(f"Error consultando ocupación de citas: {e}")
+        return None
+
+    return payload if isinstance(payload, list) else None
+
+
+def profesionales_elegibles(servicio_id, lugar_id=None, timeout=3):
+    """
+    [{id, nombre}, ...] de profesionales activos habilitados para el servicio
+    (y la sede, si se indica). Devuelve None si professionals-ms no responde.
+    """
+    params = {"servicio_id": servicio_id}
+    if lugar_id:
+        params["lugar_id"] = lugar_id
+
+    try:
+        resp = requests.get(STAFF_ELEGIBLES_URL, params=params, timeout=timeout, headers=_internal_headers())
+        if resp.status_code != 200:
+            logger.warning(f"Profesionales elegibles respondió {resp.status_code}")
+            return None
+        payload = resp.json()
+    except Exception as e:
+        logger.warning(f"Error consultando profesionales elegibles: {e}")
+        return None
+
+    return payload if isinstance(payload, list) else None
+
+
+def citas_ocupadas_en_rango(profesional_ids, fechas, timeout=3):
+    """
+    Devuelve {(profesional_id, fecha): [(hora_inicio, hora_fin), ...]} con
+    una sola llamada que cubre de la primera a la última fecha pedida.
+    Los horarios reservados temporalmente (holds) cuentan como ocupados.
+    Devuelve None si appointments-ms no responde.
+    """
+    ids = {int(p) for p in profesional_ids}
+    ocupadas = defaultdict(list)
+    fechas = set(fechas)
+    if not ids or not fechas:
+        return ocupadas
+
+    citas = obtener_ocupacion(ids, min(fechas), max(fechas), timeout=timeout, incluir_reservas=True)
+    if citas is None:
+        return None
+    for c in citas:
+        try:
+            if c.get("estado") in ESTADOS_CITA_LIBRES:
+                continue
+            pid = int(c.get("profesional_id"))
+            fecha = datetime.strptime(c["fecha"], "%Y-%m-%d").date()
+            if pid not in ids or fecha not in fechas:
+                continue
+            ocupadas[(pid, fecha)].append((_parse_hora(c["hora_inicio"]), _parse_hora(c["hora_fin"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    return ocupadas
+
+
+def conflictos_con_citas(nuevos, estados, max_dias=90):
+    """
+    Citas existentes que quedarían dentro de algún horario nuevo, con una sola
+    llamada de ocupación (ventana desde hoy, máximo `max_dias`).
+    Devuelve ["YYYY-MM-DD HH:MM:SS", ...]. Si appointments-ms no responde, [].
+    """
+    if not nuevos:
+        return []
+
+    ventanas = [ventana_horario(h) for h in nuevos]
+    desde = max(date.today(), min(v[0] for v in ventanas))
+    hasta = min(max(v[1] for v in ventanas), desde + timedelta(days=max_dias))
+    if desde > hasta:
+        return []
+
+    por_profesional = defaultdict(list)
+    for h in nuevos:
+        por_profesional[h.profesional_id].append(h)
+
+    citas = obtener_ocupacion(list(por_profesional), desde, hasta, estados=estados, timeout=5) or []
+    conflictos = []
+    for c in citas:
+        try:
+            fecha = datetime.strptime(c["fecha"], "%Y-%m-%d").date()
+            c_ini = _parse_hora(c["hora_inicio"])
+            c_fin = _parse_hora(c["hora_fin"])
+            horarios = por_profesional.get(int(c["profesional_id"]), [])
+        except (KeyError, TypeError, ValueError):
+            continue
+
+        for h in horarios:
+            h_desde, h_hasta = ventana_horario(h)
+            if (
+                h.dia_semana == fecha.weekday()
+                and h_desde <= fecha <= h_hasta
+                and c_ini < h.hora_fin
+                and c_fin > h.hora_inicio
+            ):
+                conflictos.append(f"{c['fecha']} {c['hora_inicio']}")
+                break
+    return conflictos
+
+
+def minutos_bloqueo_en_dia(bloqueo, fecha):
+    """
+    Parte del bloqueo que cae en `fecha` (hora local), en minutos del día.
+    """
+    inicio = timezone.localtime(bloqueo.fecha_inicio)
+    fin = timezone.localtime(bloqueo.fecha_fin)
+    if inicio.date() > fecha or fin.date() < fecha:
+        return None
+    ini_min = a_minutos(inicio) if inicio.date() == fecha else 0
+    fin_min = a_minutos(fin) if fin.date() == fecha else MINUTOS_DIA
+    # Segundos sueltos en el fin siguen ocupando ese minuto
+    if fin.date() == fecha and (fin.second or fin.microsecond):
+        fin_min += 1
+    return ini_min, fin_min
+
+
+def calcular_slots_dia(horarios, citas_ocupadas, bloqueos, fecha, duracion, paso=None):
+    """
+    Slots libres ("HH:MM") de un día dados sus horarios, citas y bloqueos.
+    `paso` separa los inicios de la grilla (duración + buffer del servicio).
+    """
+    turnos = [(a_minutos(h.hora_inicio), a_minutos(h.hora_fin)) for h in horarios]
+    ocupados = [(a_minutos(ini), a_minutos(fin)) for ini, fin in citas_ocupadas]
+    for b in bloqueos:
+        intervalo = minutos_bloqueo_en_dia(b, fecha)
+        if intervalo:
+            ocupados.append(intervalo)
+
+    return [a_hora(m) for m in slots_libres(turnos, ocupados, duracion, paso)]
+
+
+def slots_en_rango(profesional_ids, fecha_inicio, fecha_fin, duracion, servicio_id=None, lugar_id=None, paso=None):
+    """
+    Slots agrupados {profesional_id: {fecha_iso: ["HH:MM", ...]}} con una
+    consulta de horarios, una de bloqueos y las citas del rango.
+
+    Devuelve (slots, sin_ocupacion): sin_ocupacion son los (profesional_id, fecha)
+    calculados sin citas porque appointments-ms no respondió; sus slots pueden
+    incluir horarios ya reservados y no deben cachearse.
+    """
+    profesional_ids = [int(p) for p in profesional_ids]
+    fechas = rango_fechas(fecha_inicio, fecha_fin)
+
+    horarios = disponibilidades_en_rango(profesional_ids, fecha_inicio, fecha_fin, servicio_id, lugar_id)
+    resultado = {pid: {f.isoformat(): [] for f in fechas} for pid in profesional_ids}
+    if not horarios:
+        return resultado, set()
+
+    horarios_por_prof = defaultdict(list)
+    for h in horarios:
+        horarios_por_prof[h.profesional_id].append(h)
+
+    bloqueos_por_prof = defaultdict(list)
+    for b in bloqueos_en_rango(list(horarios_por_prof), fecha_inicio, fecha_fin):
+        bloqueos_por_prof[b.profesional_id].append(b)
+
+    horarios_dia = {}
+    for pid, horarios_prof in horarios_por_prof.items():
+        for fecha in fechas:
+            aplicables = [h for h in horarios_prof if horario_aplica(h, fecha)]
+            if aplicables:
+                horarios_dia[(pid, fecha)] = aplicables
+
+    # Solo se consultan citas de los días que tienen algún horario
+    ocupadas = citas_ocupadas_en_rango(list(horarios_por_prof), {f for _, f in horarios_dia})
+    sin_ocupacion = set()
+    if ocupadas is None:
+        ocupadas, sin_ocupacion = {}, set(horarios_dia)
+
+    for (pid, fecha), aplicables in horarios_dia.items():
+        resultado[pid][fecha.isoformat()] = calcular_slots_dia(
+            aplicables,
+            ocupadas.get((pid, fecha), []),
+            bloqueos_por_prof.get(pid, []),
+            fecha,
+            duracion,
+            paso,
+        )
+
+    return resultado, sin_ocupacion
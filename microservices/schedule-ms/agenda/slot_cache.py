@@ -0,0 +1,270 @@
+"""
+Caché materializada de slots libres por profesional y día.
+
+Las llaves incluyen dos versiones: una por profesional (cambios en horarios
+recurrentes) y otra por profesional+día (bloqueos y citas). Invalidar es
+subir la versión; las entradas viejas quedan huérfanas y expiran por TTL.
+"""
+
+import hashlib
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .services import rango_fechas, slots_en_rango
+
+STATS_HITS_KEY = "slots:stats:hits"
+STATS_MISSES_KEY = "slots:stats:misses"
+# Cambia si la caché se vacía: evita reutilizar ETags con versiones reiniciadas en 0
+EPOCH_KEY = "slots:epoch"
+
+# Rango máximo de días que se invalidan uno a uno; más allá se invalida el profesional completo
+MAX_DIAS_INVALIDACION = 62
+
+
+def _ttl():
+    return getattr(settings, "SLOTS_CACHE_TTL", 600)
+
+
+def _ver_profesional_key(profesional_id):
+    return f"slots:ver:prof:{int(profesional_id)}"
+
+
+def _ver_dia_key(profesional_id, fecha):
+    return f"slots:ver:dia:{int(profesional_id)}:{fecha.isoformat()}"
+
+
+def _incr(key, delta=1):
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # La llave expiró o fue desalojada entre add e incr
+        cache.set(key, delta, timeout=None)
+        return delta
+
+
+def _vigencia_key(profesional_id, fecha):
+    return f"slots:vig:{int(profesional_id)}:{fecha.isoformat()}"
+
+
+def _slots_key(profesional_id, fecha, versiones, servicio_id, lugar_id, duracion, paso=None):
+    ver_prof, ver_dia = versiones
+    return (
+        f"slots:{int(profesional_id)}:{fecha.isoformat()}:v{ver_prof}.{ver_dia}"
+        f":s{servicio_id or '-'}:l{lugar_id or '-'}:d{int(duracion)}:p{paso or '-'}"
+    )
+
+
+def _versiones(pares):
+    """
+    {(profesional_id, fecha): (ver_prof, ver_dia)} leyendo todas las versiones en un get_many.
+    """
+    prof_keys = {pid: _ver_profesional_key(pid) for pid, _ in pares}
+    dia_keys = {par: _ver_dia_key(*par) for par in pares}
+    valores = cache.get_many(list(prof_keys.values()) + list(dia_keys.values()))
+    return {
+        (pid, fecha): (valores.get(prof_keys[pid], 0), valores.get(dia_keys[(pid, fecha)], 0)) for pid, fecha in pares
+    }
+
+
+def _epoch():
+    cache.add(EPOCH_KEY, uuid.uuid4().hex[:12], timeout=None)
+    return cache.get(EPOCH_KEY)
+
+
+def etag_slots(profesional_ids, fecha_inicio, fecha_fin, *parametros):
+    """
+    ETag de los slots de un rango: cambia con el rango, los parámetros del
+    cálculo y el día actual (los días pasados dejan de ofrecerse), y cuando
+    se invalida cualquiera de los profesionales/días cubiertos.
+    """
+    pares = [(int(pid), f) for pid in profesional_ids for f in rango_fechas(fecha_inicio, fecha_fin)]
+    versiones = _versiones(pares)
+    # Un hold que expira libera el horario sin subir versiones: cuenta los ya vencidos
+    ahora = time.time()
+    vencidos = {par: sum(1 for v in lista if v <= ahora) for par, lista in _vigencias(pares).items()}
+    base = "|".join(
+        [
+            _epoch(),
+            fecha_inicio.isoformat(),
+            fecha_fin.isoformat(),
+            timezone.localdate().isoformat(),
+            *(str(p) for p in parametros),
+        ]
+        + [
+            f"{pid}:{f.isoformat()}:{vp}.{vd}.{vencidos.get((pid, f), 0)}"
+            for (pid, f), (vp, vd) in sorted(versiones.items())
+        ]
+    )
+    return '"' + hashlib.sha1(base.encode()).hexdigest()[:24] + '"'
+
+
+def slots_cacheados_en_rango(
+    profesional_ids, fecha_inicio, fecha_fin, duracion, servicio_id=None, lugar_id=None, paso=None
+):
+    """
+    Igual que services.slots_en_rango, pero sirve desde caché y recalcula
+    solo los días sin entrada vigente (sucios o nunca calculados).
+
+    Devuelve (slots, completo). completo es False si algún día se calculó sin
+    la ocupación de appointments-ms: esos días no se guardan en caché y el
+    resultado no debe servir para un ETag.
+    """
+    profesional_ids = [int(p) for p in profesional_ids]
+    fechas = rango_fechas(fecha_inicio, fecha_fin)
+    pares = [(pid, f) for pid in profesional_ids for f in fechas]
+
+    versiones = _versiones(pares)
+    llaves = {par: _slots_key(*par, versiones[par], servicio_id, lugar_id, duracion, paso) for par in pares}
+    encontrados = cache.get_many(list(llaves.values()))
+
+    resultado = {pid: {} for pid in profesional_ids}
+    faltantes, sin_ocupacion = [], set()
+    for par, llave in llaves.items():
+        if llave in encontrados:
+            resultado[par[0]][par[1].isoformat()] = encontrados[llave]
+        else:
+            faltantes.append(par)
+
+    if faltantes:
+        pids = sorted({pid for pid, _ in faltantes})
+        f_min = min(f for _, f in faltantes)
+        f_max = max(f for _, f in faltantes)
+        calculados, sin_ocupacion = slots_en_rango(
+            pids, f_min, f_max, duracion, servicio_id=servicio_id, lugar_id=lugar_id, paso=paso
+        )
+
+        # Días con holds vigentes: la entrada no debe sobrevivir al primero que expire
+        vencimientos = _vencimientos(faltantes)
+        nuevos = {}
+        for pid, fecha in faltantes:
+            slots = calculados[pid][fecha.isoformat()]
+            resultado[pid][fecha.isoformat()] = slots
+            # Sin citas, todo el día se ve libre: se vuelve a calcular en la próxima consulta
+            if (pid, fecha) in sin_ocupacion:
+                continue
+            nuevos.setdefault(vencimientos.get((pid, fecha), _ttl()), {})[llaves[(pid, fecha)]] = slots
+        for timeout, entradas in nuevos.items():
+            cache.set_many(entradas, timeout=timeout)
+
+    registrar_estadisticas(hits=len(pares) - len(faltantes), misses=len(faltantes))
+    return {pid: dict(sorted(dias.items())) for pid, dias in resultado.items()}, not sin_ocupacion
+
+
+def slots_cacheados_dia(profesional_id, fecha, duracion, servicio_id=None, paso=None):
+    slots, _ = slots_cacheados_en_rango([profesional_id], fecha, fecha, duracion, servicio_id=servicio_id, paso=paso)
+    return slots[int(profesional_id)][fecha.isoformat()]
+
+
+def primeros_cupos(
+    profesional_ids, fecha_inicio, fecha_fin, duracion, limite, servicio_id=None, lugar_id=None, paso=None
+):
+    """
+    Los `limite` slots más tempranos entre varios profesionales.
+
+    Recorre el horizonte en tramos crecientes (1, 2, 4, 7, 7... días) y se
+    detiene en cuanto un tramo completa el cupo: lo que queda por revisar es
+    siempre posterior. Devuelve ([(fecha, hora, profesional_id), ...], dias_revisados).
+    """
+    ahora = timezone.localtime()
+    cupos = []
+    desde = fecha_inicio
+    tramo = 1
+    while desde <= fecha_fin and len(cupos) < limite:
+        hasta = min(desde + timedelta(days=tramo - 1), fecha_fin)
+        slots, _ = slots_cacheados_en_rango(
+            profesional_ids, desde, hasta, duracion, servicio_id=servicio_id, lugar_id=lugar_id, paso=paso
+        )
+        for pid, dias in slots.items():
+            for fecha_iso, horas in dias.items():
+                for hora in horas:
+                    if fecha_iso == ahora.date().isoformat() and hora <= ahora.strftime("%H:%M"):
+                        continue
+                    cupos.append((fecha_iso, hora, pid))
+        desde = hasta + timedelta(days=1)
+        tramo = min(tramo * 2, 7)
+
+    cupos.sort()
+    return cupos[:limite], (desde - fecha_inicio).days
+
+
+def invalidar_profesional(profesional_id):
+    if profesional_id is not None:
+        _incr(_ver_profesional_key(profesional_id))
+
+
+def invalidar_dias(profesional_id, fechas):
+    if profesional_id is None:
+        return
+    fechas = set(fechas)
+    if len(fechas) > MAX_DIAS_INVALIDACION:
+        invalidar_profesional(profesional_id)
+        return
+    for fecha in fechas:
+        _incr(_ver_dia_key(profesional_id, fecha))
+
+
+def limitar_vigencia(profesional_id, fechas, segundos):
+    """
+    Los días recalculados de aquí en adelante no se cachean más allá de
+    `segundos` (un hold de appointments-ms que expira sin avisar).
+    """
+    vence = time.time() + segundos
+    for fecha in fechas:
+        key = _vigencia_key(profesional_id, fecha)
+        ahora = time.time()
+        pendientes = sorted({v for v in (cache.get(key) or []) if v > ahora} | {vence})
+        cache.set(key, pendientes, timeout=int(pendientes[-1] - ahora) + 1)
+
+
+def _vigencias(pares):
+    """
+    {(profesional_id, fecha): [vencimientos]} de los días con holds anunciados.
+    """
+    llaves = {par: _vigencia_key(*par) for par in pares}
+    valores = cache.get_many(list(llaves.values()))
+    return {par: valores[llave] for par, llave in llaves.items() if llave in valores}
+
+
+def _vencimientos(pares):
+    """
+    {(profesional_id, fecha): segundos hasta el próximo vencimiento} de los días con holds.
+    """
+    ahora = time.time()
+    resultado = {}
+    for par, vencimientos in _vigencias(pares).items():
+        futuros = [v for v in vencimientos if v > ahora]
+        if futuros:
+            resultado[par] = max(1, min(_ttl(), int(min(futuros) - ahora) + 1))
+    return resultado
+
+
+def invalidar_rango(profesional_id, fecha_inicio, fecha_fin):
+    if (fecha_fin - fecha_inicio).days + 1 > MAX_DIAS_INVALIDACION:
+        invalidar_profesional(profesional_id)
+    else:
+        invalidar_dias(profesional_id, rango_fechas(fecha_inicio, fecha_fin))
+
+
+def registrar_estadisticas(hits=0, misses=0):
+    if hits:
+        _incr(STATS_HITS_KEY, hits)
+    if misses:
+        _incr(STATS_MISSES_KEY, misses)
+
+
+def estadisticas():
+    valores = cache.get_many([STATS_HITS_KEY, STATS_MISSES_KEY])
+    hits = valores.get(STATS_HITS_KEY, 0)
+    misses = valores.get(STATS_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,77 @@
+"""
+Motor de cálculo de slots en minutos enteros (sin Django).
+
+Los intervalos ocupados (citas y bloqueos) se ordenan y fusionan una sola vez
+y luego se recorren junto con la grilla de cada turno (sweep-line), en lugar
+de comparar cada slot contra cada cita/bloqueo.
+
+Todos los intervalos son semiabiertos [inicio, fin) en minutos desde 00:00.
+"""
+
+from bisect import bisect_right
+
+MINUTOS_DIA = 24 * 60
+
+
+def a_minutos(hora):
+    """datetime.time (o datetime) -> minutos desde medianoche."""
+    return hora.hour * 60 + hora.minute
+
+
+def a_hora(minutos):
+    """Minutos desde medianoche -> "HH:MM"."""
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def fusionar_intervalos(intervalos):
+    """
+    Ordena y une intervalos solapados o contiguos. Descarta los vacíos.
+    """
+    fusionados = []
+    for inicio, fin in sorted(i for i in intervalos if i[1] > i[0]):
+        if fusionados and inicio <= fusionados[-1][1]:
+            if fin > fusionados[-1][1]:
+                fusionados[-1][1] = fin
+        else:
+            fusionados.append([inicio, fin])
+    return [(inicio, fin) for inicio, fin in fusionados]
+
+
+def slots_libres(turnos, ocupados, duracion, paso=None):
+    """
+    Inicios (en minutos) de los slots libres de un día.
+
+    - turnos: [(inicio, fin), ...] de cada horario; la grilla de cada turno
+      arranca en su inicio y avanza de a `paso` (por defecto = duracion).
+    - ocupados: [(inicio, fin), ...] sin orden; se fusionan aquí.
+    - Un slot [s, s + duracion) es válido si cabe en el turno y no se cruza
+      con ningún ocupado.
+    """
+    if duracion <= 0:
+        return []
+    paso = paso or duracion
+
+    ocupados = fusionar_intervalos(ocupados)
+    fines = [fin for _, fin in ocupados]
+    total = len(ocupados)
+
+    libres = set()
+    for turno_ini, turno_fin in sorted(turnos):
+        s = turno_ini
+        # Primer ocupado que termina después del inicio del turno
+        j = bisect_right(fines, s)
+
+        while s + duracion <= turno_fin:
+            while j < total and ocupados[j][1] <= s:
+                j += 1
+
+            if j < total and ocupados[j][0] < s + duracion:
+                # Salta directo al primer punto de la grilla libre de este ocupado
+                saltos = -(-(ocupados[j][1] - turno_ini) // paso)
+                s = turno_ini + saltos * paso
+                continue
+
+            libres.add(s)
+            s += paso
+
+    return sorted(libres)
@@ -0,0 +1,122 @@
+from datetime import date, time, timedelta
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from agenda.models import Disponibilidad
+from agenda.views import DisponibilidadViewSet
+
+
+@patch("agenda.views.audit_log")
+@patch("agenda.services.requests.get", return_value=Mock(status_code=200, json=lambda: []))
+class BulkAgendaTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="bulk-tester", password="x")
+        self.factory = APIRequestFactory()
+        cache.clear()
+        self.lunes = date.today() + timedelta(days=7 - date.today().weekday() + 7)
+
+    def _post(self, accion, payload):
+        request = self.factory.post(f"/agenda/disponibilidad/{accion}/", payload, format="json")
+        force_authenticate(request, user=self.user)
+        return DisponibilidadViewSet.as_view({"post": accion})(request)
+
+    def test_copy_week_creates_fixed_rows_for_each_target_week(self, mock_get, mock_audit):
+        Disponibilidad.objects.create(
+            profesional_id=1, lugar_id=1, dia_semana=0, hora_inicio="08:00", hora_fin="09:00", fecha=self.lunes
+        )
+        Disponibilidad.objects.create(
+            profesional_id=1,
+            lugar_id=1,
+            dia_semana=2,
+            hora_inicio="14:00",
+            hora_fin="16:00",
+            fecha=self.lunes + timedelta(days=2),
+        )
+        # Recurrente: ya cubre las semanas destino, no se duplica
+        Disponibilidad.objects.create(profesional_id=1, lugar_id=1, dia_semana=4, hora_inicio="08:00", hora_fin="12:00")
+
+        response = self._post(
+            "copiar_semana",
+            {
+                "profesional_id": 1,
+                "semana_origen": (self.lunes + timedelta(days=3)).isoformat(),
+                "semana_destino_desde": (self.lunes + timedelta(weeks=1)).isoformat(),
+                "semana_destino_hasta": (self.lunes + timedelta(weeks=3)).isoformat(),
+            },
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["creados"], 6)
+        self.assertEqual(response.data["omitidos"], 3)
+        copiados = Disponibilidad.objects.filter(fecha__gt=self.lunes + timedelta(days=6))
+        self.assertEqual(
+            sorted(h.fecha for h in copiados),
+            sorted(self.lunes + timedelta(weeks=w, days=d) for w in (1, 2, 3) for d in (0, 2)),
+        )
+        self.assertTrue(all(h.dia_semana == h.fecha.weekday() for h in copiados))
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(mock_audit.call_count, 1)
+
+    def test_copy_week_rejects_overlaps_without_creating_anything(self, mock_get, mock_audit):
+        Disponibilidad.objects.create(
+            profesional_id=1, lugar_id=1, dia_semana=0, hora_inicio="08:00", hora_fin="09:00", fecha=self.lunes
+        )
+        destino = self.lunes + timedelta(weeks=2)
+        Disponibilidad.objects.create(
+            profesional_id=1, lugar_id=1, dia_semana=0, hora_inicio="08:30", hora_fin="10:00", fecha=destino
+        )
+
+        response = self._post(
+            "copiar_semana",
+            {
+                "profesional_id": 1,
+                "semana_origen": self.lunes.isoformat(),
+                "semana_destino_desde": (self.lunes + timedelta(weeks=1)).isoformat(),
+                "semana_destino_hasta": destino.isoformat(),
+            },
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["total_conflictos"], 1)
+        self.assertEqual(Disponibilidad.objects.count(), 2)
+        mock_audit.assert_not_called()
+
+    def test_apply_template_to_many_professionals(self, mock_get, mock_audit):
+        payload = {
+            "profesional_ids": [1, 2, 3],
+            "fecha_inicio_vigencia": self.lunes.isoformat(),
+            "bloques": [
+                {"dia_semana": 0, "hora_inicio": "08:00", "hora_fin": "12:00", "lugar_id": 1},
+                {"dia_semana": 3, "hora_inicio": "14:00", "hora_fin": "18:00", "lugar_id": 2, "servicio_id": 5},
+            ],
+        }
+
+        # Una lectura de cruces + un INSERT (más el savepoint del atomic)
+        with self.assertNumQueries(4):
+            response = self._post("aplicar_plantilla", payload)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["creados"], 6)
+        self.assertEqual(Disponibilidad.objects.filter(fecha__isnull=True, servicio_id=5).count(), 3)
+        self.assertEqual(Disponibilidad.objects.get(profesional_id=2, dia_semana=0).hora_fin, time(12))
+        self.assertEqual(mock_audit.call_count, 1)
+
+    def test_apply_template_rejects_overlapping_blocks_in_the_template(self, mock_get, mock_audit):
+        response = self._post(
+            "aplicar_plantilla",
+            {
+                "profesional_ids": "1",
+                "bloques": [
+                    {"dia_semana": 0, "hora_inicio": "08:00", "hora_fin": "12:00", "lugar_id": 1},
+                    {"dia_semana": 0, "hora_inicio": "11:00", "hora_fin": "13:00", "lugar_id": 1},
+                ],
+            },
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Disponibilidad.objects.exists())
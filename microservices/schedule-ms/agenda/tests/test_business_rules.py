@@ -1,9 +1,14 @@
+import importlib
 from datetime import date, datetime, timedelta
 from unittest.mock import Mock, patch
 
+from django.apps import apps as django_apps
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError
 from django.test import TestCase
 from django.utils import timezone
+from rest_framework.exceptions import ValidationError
 from rest_framework.test import APIRequestFactory, force_authenticate
 
 from agenda.models import BloqueoAgenda, Disponibilidad
@@ -53,6 +58,26 @@ class DisponibilidadBusinessRulesTests(TestCase):
         self.assertFalse(serializer.is_valid())
         self.assertIn("conflicto", str(serializer.errors).lower())
 
+    @patch("agenda.serializers.usa_restricciones_exclusion", return_value=True)
+    def test_translates_exclusion_constraint_violation(self, _):
+        serializer = DisponibilidadSerializer(
+            data={
+                "profesional_id": 11,
+                "lugar_id": 1,
+                "dia_semana": 2,
+                "hora_inicio": "10:00",
+                "hora_fin": "12:00",
+            }
+        )
+        # Con la restricción activa, validate no consulta la tabla
+        with self.assertNumQueries(0):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+        violacion = IntegrityError('violates exclusion constraint "agenda_disponibilidad_sin_cruces"')
+        with patch.object(Disponibilidad.objects, "create", side_effect=violacion):
+            with self.assertRaisesMessage(ValidationError, "conflicto de agenda"):
+                serializer.save()
+
     def test_rejects_block_shorter_than_15_minutes(self):
         serializer = DisponibilidadSerializer(
             data={
@@ -121,6 +146,7 @@ class SlotGeneratorRulesTests(TestCase):
         user_model = get_user_model()
         self.user = user_model.objects.create_user(username="agenda-tester", password="x")
         self.factory = APIRequestFactory()
+        cache.clear()
 
     @patch("agenda.views.requests.get")
     def test_partial_block_does_not_cancel_whole_day_slots(self, mock_get):
@@ -157,3 +183,130 @@ class SlotGeneratorRulesTests(TestCase):
         response = SlotGeneratorView.as_view()(request)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data, ["08:30", "09:00", "09:30"])
+
+    @patch("agenda.catalogo.requests.get")
+    def test_slot_generator_rejects_non_numeric_parameters(self, mock_get):
+        fecha = (date.today() + timedelta(days=2)).isoformat()
+        for params in (
+            {"profesional_id": "77", "fecha": fecha, "servicio_id": "abc"},
+            {"profesional_id": "77", "fecha": fecha, "duracion_minutos": "media hora"},
+            {"profesional_id": "77", "fecha": fecha, "duracion_minutos": "0"},
+            {"profesional_id": "x", "fecha": fecha},
+            {"profesional_id": "77", "fecha": "mañana"},
+        ):
+            request = self.factory.get("/agenda/slots/", params)
+            force_authenticate(request, user=self.user)
+            self.assertEqual(SlotGeneratorView.as_view()(request).status_code, 400, params)
+
+
+@patch("agenda.views.audit_log")
+class SeriesEndTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="series-tester", password="x")
+        self.factory = APIRequestFactory()
+        cache.clear()
+        self.serie = Disponibilidad.objects.create(
+            profesional_id=88, lugar_id=1, dia_semana=2, hora_inicio="08:00", hora_fin="12:00"
+        )
+        self.miercoles = date.today() + timedelta(days=(2 - date.today().weekday()) % 7 + 7)
+
+    def _bloqueo(self, fecha, hora, profesional_id=88):
+        inicio = timezone.make_aware(datetime.combine(fecha, datetime.strptime(hora, "%H:%M").time()))
+        return BloqueoAgenda.objects.create(
+            profesional_id=profesional_id, fecha_inicio=inicio, fecha_fin=inicio + timedelta(minutes=30), motivo="x"
+        )
+
+    def _destroy(self):
+        request = self.factory.delete(f"/agenda/disponibilidad/{self.serie.pk}/")
+        force_authenticate(request, user=self.user)
+        return DisponibilidadViewSet.as_view({"delete": "destroy"})(request, pk=self.serie.pk)
+
+    @patch("agenda.services.requests.get", return_value=Mock(status_code=200, json=lambda: []))
+    def test_deletes_only_future_blocks_inside_the_series_window(self, mock_get, mock_audit):
+        huerfanos = [
+            self._bloqueo(self.miercoles, "08:00"),
+            self._bloqueo(self.miercoles + timedelta(weeks=3), "11:30"),
+        ]
+        conservados = [
+            self._bloqueo(self.miercoles, "12:00"),
+            self._bloqueo(self.miercoles + timedelta(days=1), "09:00"),
+            self._bloqueo(self.miercoles, "09:00", profesional_id=89),
+        ]
+
+        response = self._destroy()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(BloqueoAgenda.objects.filter(pk__in=[b.pk for b in huerfanos]).exists())
+        self.assertEqual(BloqueoAgenda.objects.filter(pk__in=[b.pk for b in conservados]).count(), 3)
+        self.serie.refresh_from_db()
+        self.assertEqual(self.serie.fecha_fin_vigencia, date.today() - timedelta(days=1))
+
+        params = mock_get.call_args.kwargs["params"]
+        self.assertEqual(params["fecha__iso_week_day"], 3)
+        self.assertEqual(params["hora_inicio__gte"], "08:00:00")
+        self.assertEqual(params["hora_inicio__lt"], "12:00:00")
+
+    @patch("agenda.services.requests.get")
+    def test_keeps_series_when_patients_are_booked(self, mock_get, mock_audit):
+        cita = {"fecha": self.miercoles.isoformat(), "hora_inicio": "09:00:00", "estado": "ACEPTADA"}
+        mock_get.return_value = Mock(status_code=200, json=lambda: [cita])
+        bloqueo = self._bloqueo(self.miercoles, "08:00")
+
+        response = self._destroy()
+
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(BloqueoAgenda.objects.filter(pk=bloqueo.pk).exists())
+        self.serie.refresh_from_db()
+        self.assertIsNone(self.serie.fecha_fin_vigencia)
+
+    @patch("agenda.services.requests.get", return_value=Mock(status_code=200, json=lambda: []))
+    def test_series_not_started_yet_is_deactivated(self, mock_get, mock_audit):
+        self.serie.fecha_inicio_vigencia = date.today() + timedelta(days=10)
+        self.serie.save()
+
+        self.assertEqual(self._destroy().status_code, 200)
+
+        self.serie.refresh_from_db()
+        self.assertFalse(self.serie.activo)
+        self.assertIsNone(self.serie.fecha_fin_vigencia)
+
+    @patch("agenda.services.requests.get", return_value=Mock(status_code=200, json=lambda: []))
+    def test_does_not_extend_an_ended_series(self, mock_get, mock_audit):
+        fin = date.today() - timedelta(days=30)
+        self.serie.fecha_inicio_vigencia = fin - timedelta(days=60)
+        self.serie.fecha_fin_vigencia = fin
+        self.serie.save()
+
+        self.assertEqual(self._destroy().status_code, 200)
+
+        self.serie.refresh_from_db()
+        self.assertEqual(self.serie.fecha_fin_vigencia, fin)
+
+
+class RepararRangosMigrationTests(TestCase):
+    def test_repairs_rows_that_would_break_the_exclusion_constraint(self):
+        migracion = importlib.import_module("agenda.migrations.0006_restricciones_sin_cruces")
+        hoy = date.today()
+        cortada = Disponibilidad.objects.create(
+            profesional_id=5,
+            lugar_id=1,
+            dia_semana=1,
+            hora_inicio="08:00",
+            hora_fin="10:00",
+            fecha_inicio_vigencia=hoy + timedelta(days=5),
+            fecha_fin_vigencia=hoy - timedelta(days=1),
+        )
+        invertida = Disponibilidad.objects.create(
+            profesional_id=5, lugar_id=1, dia_semana=2, hora_inicio="10:00", hora_fin="09:00"
+        )
+        sana = Disponibilidad.objects.create(
+            profesional_id=5, lugar_id=1, dia_semana=3, hora_inicio="08:00", hora_fin="09:00"
+        )
+
+        migracion.reparar_rangos(django_apps, None)
+
+        cortada.refresh_from_db()
+        self.assertEqual((cortada.activo, cortada.fecha_fin_vigencia), (False, cortada.fecha_inicio_vigencia))
+        self.assertFalse(Disponibilidad.objects.get(pk=invertida.pk).activo)
+        self.assertTrue(Disponibilidad.objects.get(pk=sana.pk).activo)
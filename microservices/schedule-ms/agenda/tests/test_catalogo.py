@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from agenda.catalogo import STAFF_SERVICIOS_BULK_URL, duracion_y_paso
+from agenda.models import Disponibilidad
+from agenda.views import SlotGeneratorView
+
+
+def _respuesta(url, params=None, **kwargs):
+    if url == STAFF_SERVICIOS_BULK_URL:
+        return Mock(status_code=200, json=lambda: {"7": {"nombre": "Terapia", "duracion": 30, "buffer": 10}})
+    return Mock(status_code=200, json=lambda: [])
+
+
+class CatalogoServiciosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @patch("agenda.catalogo.requests.get", side_effect=_respuesta)
+    def test_resolves_duration_and_buffer_once_per_ttl(self, mock_get):
+        self.assertEqual(duracion_y_paso("7"), (30, 40))
+        self.assertEqual(duracion_y_paso(7, 15), (30, 40))
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch("agenda.catalogo.requests.get", side_effect=Exception("caído"))
+    def test_falls_back_to_requested_duration(self, mock_get):
+        self.assertEqual(duracion_y_paso("7", "25"), (25, None))
+        self.assertEqual(duracion_y_paso(None), (20, None))
+
+    @patch("agenda.services.requests.get", side_effect=_respuesta)
+    @patch("agenda.catalogo.requests.get", side_effect=_respuesta)
+    def test_slot_grid_uses_service_duration_plus_buffer(self, mock_catalogo, mock_citas):
+        user = get_user_model().objects.create_user(username="catalogo-tester", password="x")
+        fecha = date.today() + timedelta(days=7)
+        Disponibilidad.objects.create(
+            profesional_id=1, lugar_id=1, dia_semana=fecha.weekday(), hora_inicio="08:00", hora_fin="10:00"
+        )
+
+        request = APIRequestFactory().get(
+            "/agenda/slots/",
+            {"profesional_id": "1", "fecha": fecha.isoformat(), "servicio_id": "7", "duracion_minutos": "20"},
+        )
+        force_authenticate(request, user=user)
+        response = SlotGeneratorView.as_view()(request)
+
+        self.assertEqual(response.data, ["08:00", "08:40", "09:20"])
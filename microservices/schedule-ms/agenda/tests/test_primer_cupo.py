@@ -0,0 +1,78 @@
+from datetime import date, timedelta
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from agenda.models import Disponibilidad
+from agenda.services import STAFF_ELEGIBLES_URL
+from agenda.views import PrimerCupoView
+
+
+def _respuesta(url, params=None, **kwargs):
+    if url == STAFF_ELEGIBLES_URL:
+        return Mock(status_code=200, json=lambda: [{"id": 1, "nombre": "Ana"}, {"id": 2, "nombre": "Beto"}])
+    return Mock(status_code=200, json=lambda: [])
+
+
+@patch("agenda.services.requests.get", side_effect=_respuesta)
+class PrimerCupoViewTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="cupo-tester", password="x")
+        self.factory = APIRequestFactory()
+        cache.clear()
+        self.desde = date.today() + timedelta(days=10)
+
+    def _get(self, params):
+        request = self.factory.get("/agenda/slots/primer-cupo/", params)
+        force_authenticate(request, user=self.user)
+        return PrimerCupoView.as_view()(request)
+
+    def _horario(self, profesional_id, fecha, inicio, fin):
+        Disponibilidad.objects.create(
+            profesional_id=profesional_id,
+            lugar_id=1,
+            dia_semana=fecha.weekday(),
+            hora_inicio=inicio,
+            hora_fin=fin,
+            fecha=fecha,
+        )
+
+    def test_returns_earliest_slots_across_professionals_and_stops_early(self, mock_get):
+        self._horario(2, self.desde, "09:00", "10:00")
+        self._horario(1, self.desde + timedelta(days=1), "08:00", "08:40")
+        self._horario(1, self.desde + timedelta(days=60), "07:00", "12:00")
+
+        response = self._get(
+            {"servicio_id": "5", "lugar_id": "1", "desde": self.desde.isoformat(), "dias": "90", "limite": "4"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(c["fecha"], c["hora"], c["profesional_id"]) for c in response.data["cupos"]],
+            [
+                (self.desde.isoformat(), "09:00", 2),
+                (self.desde.isoformat(), "09:20", 2),
+                (self.desde.isoformat(), "09:40", 2),
+                ((self.desde + timedelta(days=1)).isoformat(), "08:00", 1),
+            ],
+        )
+        self.assertEqual(response.data["cupos"][0]["profesional_nombre"], "Beto")
+        # Tramos de 1 y 2 días: no se recorrió el resto del horizonte
+        self.assertEqual(response.data["dias_revisados"], 3)
+        elegibles = [c for c in mock_get.call_args_list if c.args[0] == STAFF_ELEGIBLES_URL]
+        self.assertEqual(len(elegibles), 1)
+        self.assertEqual(elegibles[0].kwargs["params"], {"servicio_id": 5, "lugar_id": 1})
+
+    def test_requires_service(self, mock_get):
+        response = self._get({"lugar_id": "1"})
+        self.assertEqual(response.status_code, 400)
+        mock_get.assert_not_called()
+
+    def test_rejects_non_numeric_parameters(self, mock_get):
+        for params in ({"servicio_id": "5", "lugar_id": "abc"}, {"servicio_id": "abc"}):
+            self.assertEqual(self._get(params).status_code, 400, params)
+        mock_get.assert_not_called()
@@ -0,0 +1,155 @@
+import time
+from datetime import date, datetime, timedelta
+from unittest.mock import Mock, patch
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from agenda.models import Disponibilidad
+from agenda.slot_cache import estadisticas
+from agenda.views import BloqueoAgendaViewSet, SlotCacheInvalidationView, SlotGeneratorView
+
+
+@override_settings(INTERNAL_SERVICE_TOKEN="token-interno")
+@patch("agenda.views.audit_log", Mock(return_value=True))
+@patch("agenda.services.requests.get")
+class SlotCacheTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="cache-tester", password="x")
+        self.factory = APIRequestFactory()
+        cache.clear()
+
+        self.fecha = date.today() + timedelta(days=10)
+        Disponibilidad.objects.create(
+            profesional_id=5,
+            lugar_id=1,
+            dia_semana=self.fecha.weekday(),
+            hora_inicio="08:00",
+            hora_fin="09:00",
+            activo=True,
+        )
+
+    def _slots(self):
+        request = self.factory.get(
+            "/agenda/slots/",
+            {"profesional_id": "5", "fecha": self.fecha.isoformat(), "duracion_minutos": "30"},
+        )
+        force_authenticate(request, user=self.user)
+        return SlotGeneratorView.as_view()(request).data
+
+    def test_second_request_is_served_from_cache(self, mock_get):
+        mock_get.return_value = Mock(status_code=200, json=lambda: [])
+
+        self.assertEqual(self._slots(), ["08:00", "08:30"])
+        self.assertEqual(self._slots(), ["08:00", "08:30"])
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(estadisticas()["hits"], 1)
+        self.assertEqual(estadisticas()["misses"], 1)
+
+    def test_day_computed_without_occupancy_is_not_cached(self, mock_get):
+        mock_get.side_effect = requests.Timeout("appointments-ms caído")
+        self.assertEqual(self._slots(), ["08:00", "08:30"])
+
+        mock_get.side_effect = None
+        mock_get.return_value = Mock(
+            status_code=200,
+            json=lambda: [
+                {
+                    "profesional_id": 5,
+                    "fecha": self.fecha.isoformat(),
+                    "estado": "ACEPTADA",
+                    "hora_inicio": "08:00:00",
+                    "hora_fin": "08:30:00",
+                }
+            ],
+        )
+        self.assertEqual(self._slots(), ["08:30"])
+        self.assertEqual(mock_get.call_count, 2)
+
+        # Ya con la ocupación leída, el día sí queda en caché
+        self.assertEqual(self._slots(), ["08:30"])
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_block_creation_invalidates_the_day(self, mock_get):
+        mock_get.return_value = Mock(status_code=200, json=lambda: [])
+        self.assertEqual(self._slots(), ["08:00", "08:30"])
+
+        inicio = timezone.make_aware(datetime.combine(self.fecha, datetime.min.time()).replace(hour=8))
+        request = self.factory.post(
+            "/agenda/bloqueos/",
+            {
+                "profesional_id": 5,
+                "fecha_inicio": inicio.isoformat(),
+                "fecha_fin": (inicio + timedelta(minutes=30)).isoformat(),
+                "motivo": "Reunion",
+            },
+            format="json",
+        )
+        force_authenticate(request, user=self.user)
+        self.assertEqual(BloqueoAgendaViewSet.as_view({"post": "create"})(request).status_code, 201)
+
+        self.assertEqual(self._slots(), ["08:30"])
+
+    def test_internal_notification_invalidates_the_day(self, mock_get):
+        mock_get.return_value = Mock(status_code=200, json=lambda: [])
+        self.assertEqual(self._slots(), ["08:00", "08:30"])
+
+        mock_get.return_value = Mock(
+            status_code=200,
+            json=lambda: [
+                {
+                    "profesional_id": 5,
+                    "fecha": self.fecha.isoformat(),
+                    "estado": "PENDIENTE",
+                    "hora_inicio": "08:00:00",
+                    "hora_fin": "08:30:00",
+                }
+            ],
+        )
+        request = self.factory.post(
+            "/agenda/slots/invalidar/",
+            {"profesional_id": 5, "fechas": [self.fecha.isoformat()]},
+            format="json",
+            HTTP_X_INTERNAL_TOKEN="token-interno",
+        )
+        self.assertEqual(SlotCacheInvalidationView.as_view()(request).status_code, 204)
+
+        self.assertEqual(self._slots(), ["08:30"])
+
+    def test_notification_requires_internal_token(self, mock_get):
+        request = self.factory.post("/agenda/slots/invalidar/", {"profesional_id": 5}, format="json")
+        self.assertEqual(SlotCacheInvalidationView.as_view()(request).status_code, 403)
+
+    def test_held_slot_is_hidden_only_while_the_hold_lives(self, mock_get):
+        mock_get.return_value = Mock(status_code=200, json=lambda: [])
+        self.assertEqual(self._slots(), ["08:00", "08:30"])
+
+        hold = {
+            "profesional_id": 5,
+            "fecha": self.fecha.isoformat(),
+            "estado": "RESERVADA",
+            "hora_inicio": "08:00:00",
+            "hora_fin": "08:30:00",
+        }
+        mock_get.return_value = Mock(status_code=200, json=lambda: [hold])
+        request = self.factory.post(
+            "/agenda/slots/invalidar/",
+            {"profesional_id": 5, "fechas": [self.fecha.isoformat()], "vigencia": 180},
+            format="json",
+            HTTP_X_INTERNAL_TOKEN="token-interno",
+        )
+        self.assertEqual(SlotCacheInvalidationView.as_view()(request).status_code, 204)
+
+        self.assertEqual(self._slots(), ["08:30"])
+        self.assertEqual(mock_get.call_args.kwargs["params"]["incluir_reservas"], 1)
+
+        # El hold expira sin aviso: la entrada cacheada vence con él
+        mock_get.return_value = Mock(status_code=200, json=lambda: [])
+        with patch("time.time", return_value=time.time() + 181):
+            self.assertEqual(self._slots(), ["08:00", "08:30"])
@@ -0,0 +1,76 @@
+import random
+from datetime import date, datetime, time
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from agenda.models import BloqueoAgenda, Disponibilidad
+from agenda.services import calcular_slots_dia
+from agenda.slots import a_hora, fusionar_intervalos, slots_libres
+
+
+def _fuerza_bruta(turnos, ocupados, duracion, paso):
+    libres = set()
+    for ini, fin in turnos:
+        s = ini
+        while s + duracion <= fin:
+            if not any(s < o_fin and s + duracion > o_ini for o_ini, o_fin in ocupados):
+                libres.add(s)
+            s += paso
+    return sorted(libres)
+
+
+class FusionarIntervalosTests(SimpleTestCase):
+    def test_merges_overlapping_and_adjacent_intervals(self):
+        self.assertEqual(
+            fusionar_intervalos([(50, 60), (10, 20), (15, 30), (30, 40), (70, 70)]),
+            [(10, 40), (50, 60)],
+        )
+
+
+class SlotsLibresTests(SimpleTestCase):
+    def test_skips_busy_intervals_and_keeps_grid(self):
+        # Turno 08:00-10:00, cita 08:30-09:10 -> 09:10 no está en la grilla de 30'
+        self.assertEqual(
+            [a_hora(m) for m in slots_libres([(480, 600)], [(510, 550)], 30)],
+            ["08:00", "09:30"],
+        )
+
+    def test_slot_right_after_busy_interval_is_free(self):
+        self.assertEqual(slots_libres([(480, 540)], [(480, 500)], 20), [500, 520])
+
+    def test_overlapping_shifts_do_not_duplicate_slots(self):
+        self.assertEqual(slots_libres([(480, 540), (480, 520)], [], 20), [480, 500, 520])
+
+    def test_matches_brute_force_on_random_days(self):
+        rnd = random.Random(7)
+        for _ in range(300):
+            turnos = []
+            for _ in range(rnd.randint(1, 3)):
+                ini = rnd.randrange(0, 1200, 5)
+                turnos.append((ini, ini + rnd.randrange(15, 240, 5)))
+            ocupados = []
+            for _ in range(rnd.randint(0, 25)):
+                ini = rnd.randrange(0, 1400)
+                ocupados.append((ini, ini + rnd.randint(1, 90)))
+            duracion = rnd.choice([10, 15, 20, 30])
+            paso = rnd.choice([duracion, duracion + 5])
+
+            self.assertEqual(
+                slots_libres(turnos, ocupados, duracion, paso),
+                _fuerza_bruta(turnos, ocupados, duracion, paso),
+            )
+
+
+class CalcularSlotsDiaTests(SimpleTestCase):
+    def test_combines_citas_and_blocks_crossing_midnight(self):
+        fecha = date(2030, 1, 7)
+        horario = Disponibilidad(profesional_id=1, lugar_id=1, dia_semana=0, hora_inicio=time(7), hora_fin=time(9))
+        bloqueo = BloqueoAgenda(
+            profesional_id=1,
+            fecha_inicio=timezone.make_aware(datetime(2030, 1, 6, 22, 0)),
+            fecha_fin=timezone.make_aware(datetime(2030, 1, 7, 7, 30)),
+            motivo="Turno nocturno",
+        )
+        slots = calcular_slots_dia([horario], [(time(8, 0), time(8, 30))], [bloqueo], fecha, 30)
+        self.assertEqual(slots, ["07:30", "08:30"])
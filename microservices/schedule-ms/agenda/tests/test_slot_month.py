@@ -0,0 +1,83 @@
+from datetime import date
+from unittest.mock import Mock, patch
+
+import requests
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from agenda.models import Disponibilidad
+from agenda.slot_cache import invalidar_dias
+from agenda.views import SlotMesView
+
+
+@patch("agenda.services.requests.get", return_value=Mock(status_code=200, json=lambda: []))
+class SlotMesViewTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="mes-tester", password="x")
+        self.factory = APIRequestFactory()
+        cache.clear()
+        # Febrero 2030: empieza viernes, 28 días
+        Disponibilidad.objects.create(
+            profesional_id=1, lugar_id=1, dia_semana=0, hora_inicio="08:00", hora_fin="09:00", activo=True
+        )
+
+    def _get(self, mes="2030-02", duracion="30", **headers):
+        request = self.factory.get(
+            "/agenda/slots/mes/",
+            {"profesional_id": "1", "mes": mes, "duracion_minutos": duracion},
+            **headers,
+        )
+        force_authenticate(request, user=self.user)
+        return SlotMesView.as_view()(request)
+
+    def test_counts_free_slots_per_day_in_one_pass(self, mock_get):
+        response = self._get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["dias"]), 28)
+        self.assertEqual(response.data["dias"]["2030-02-04"], 2)
+        self.assertEqual(response.data["dias"]["2030-02-05"], 0)
+        self.assertEqual(response.data["bitmap"], "0001000000100000010000001000")
+        self.assertEqual(mock_get.call_count, 1)
+
+    def test_etag_returns_304_until_data_changes(self, mock_get):
+        etag = self._get()["ETag"]
+
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        invalidar_dias(1, [date(2030, 2, 11)])
+        response = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_depends_on_month_parameters_and_today(self, mock_get):
+        etag = self._get()["ETag"]
+
+        self.assertEqual(self._get(mes="2030-03", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self._get(duracion="20", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        with patch("agenda.slot_cache.timezone.localdate", return_value=date(2030, 2, 10)):
+            self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_rejects_non_numeric_parameters(self, mock_get):
+        for params in ({"lugar_id": "abc"}, {"servicio_id": "abc"}, {"mes": "febrero"}):
+            request = self.factory.get(
+                "/agenda/slots/mes/", {"profesional_id": "1", "mes": "2030-02", "duracion_minutos": "30", **params}
+            )
+            force_authenticate(request, user=self.user)
+            self.assertEqual(SlotMesView.as_view()(request).status_code, 400, params)
+        mock_get.assert_not_called()
+
+    def test_no_etag_when_occupancy_is_unavailable(self, mock_get):
+        mock_get.side_effect = requests.ConnectionError("appointments-ms caído")
+        response = self._get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        self.assertEqual(response["Cache-Control"], "no-store")
+
+        mock_get.side_effect = None
+        self.assertIn("ETag", self._get())
@@ -0,0 +1,87 @@
+from datetime import date, datetime, timedelta
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from agenda.models import BloqueoAgenda, Disponibilidad
+from agenda.views import SlotRangeView
+
+
+class SlotRangeViewTests(TestCase):
+    def setUp(self):
+        user_model = get_user_model()
+        self.user = user_model.objects.create_user(username="rango-tester", password="x")
+        self.factory = APIRequestFactory()
+        cache.clear()
+        self.lunes = date.today() + timedelta(days=7 - date.today().weekday() + 7)
+
+    def _get(self, params):
+        request = self.factory.get("/agenda/slots/rango/", params)
+        force_authenticate(request, user=self.user)
+        return SlotRangeView.as_view()(request)
+
+    @patch("agenda.services.requests.get")
+    def test_groups_slots_by_professional_and_day(self, mock_get):
+        martes = self.lunes + timedelta(days=1)
+        Disponibilidad.objects.create(
+            profesional_id=1, lugar_id=1, dia_semana=0, hora_inicio="08:00", hora_fin="09:00", activo=True
+        )
+        Disponibilidad.objects.create(
+            profesional_id=2, lugar_id=1, dia_semana=1, hora_inicio="10:00", hora_fin="11:00", fecha=martes
+        )
+        BloqueoAgenda.objects.create(
+            profesional_id=1,
+            fecha_inicio=timezone.make_aware(datetime.combine(self.lunes, datetime.min.time()).replace(hour=8)),
+            fecha_fin=timezone.make_aware(datetime.combine(self.lunes, datetime.min.time()).replace(hour=8, minute=30)),
+            motivo="Reunion",
+        )
+        cita = {"profesional_id": 2, "fecha": martes.isoformat()}
+        mock_get.return_value = Mock(
+            status_code=200,
+            json=lambda: [
+                {**cita, "estado": "ACEPTADA", "hora_inicio": "10:00:00", "hora_fin": "10:30:00"},
+                {**cita, "estado": "CANCELADA", "hora_inicio": "10:30:00", "hora_fin": "11:00:00"},
+            ],
+        )
+
+        response = self._get(
+            {
+                "profesional_ids": "1,2",
+                "fecha_inicio": self.lunes.isoformat(),
+                "fecha_fin": martes.isoformat(),
+                "duracion_minutos": "30",
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+        profesionales = response.data["profesionales"]
+        self.assertEqual(profesionales["1"][self.lunes.isoformat()], ["08:30"])
+        self.assertEqual(profesionales["1"][martes.isoformat()], [])
+        self.assertEqual(profesionales["2"][martes.isoformat()], ["10:30"])
+        # Una sola llamada de ocupación para todo el rango y ambos profesionales
+        self.assertEqual(mock_get.call_count, 1)
+        params = mock_get.call_args.kwargs["params"]
+        self.assertEqual(params["profesional_id__in"], "1,2")
+        self.assertEqual(params["fecha__gte"], self.lunes.isoformat())
+        self.assertEqual(params["fecha__lte"], martes.isoformat())
+
+    def test_rejects_ranges_longer_than_limit(self):
+        response = self._get(
+            {
+                "profesional_ids": "1",
+                "fecha_inicio": self.lunes.isoformat(),
+                "fecha_fin": (self.lunes + timedelta(days=40)).isoformat(),
+            }
+        )
+        self.assertEqual(response.status_code, 400)
+
+    @patch("agenda.catalogo.requests.get")
+    def test_rejects_non_numeric_parameters(self, mock_get):
+        base = {"profesional_ids": "1", "fecha_inicio": self.lunes.isoformat()}
+        for params in ({"lugar_id": "abc"}, {"servicio_id": "abc"}, {"duracion_minutos": "0"}):
+            self.assertEqual(self._get({**base, **params}).status_code, 400, params)
+        mock_get.assert_not_called()
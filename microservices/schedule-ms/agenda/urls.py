@@ -1,7 +1,16 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import BloqueoAgendaViewSet, DisponibilidadViewSet, SlotGeneratorView
+from .views import (
+    BloqueoAgendaViewSet,
+    DisponibilidadViewSet,
+    PrimerCupoView,
+    SlotCacheInvalidationView,
+    SlotCacheStatsView,
+    SlotGeneratorView,
+    SlotMesView,
+    SlotRangeView,
+)
 
 router = DefaultRouter()
 router.register(r"disponibilidad", DisponibilidadViewSet, basename="disponibilidad")
@@ -10,4 +19,9 @@ router.register(r"bloqueos", BloqueoAgendaViewSet, basename="bloqueo")
 urlpatterns = [
     path("", include(router.urls)),
     path("slots/", SlotGeneratorView.as_view(), name="slots-calculator"),
+    path("slots/rango/", SlotRangeView.as_view(), name="slots-rango"),
+    path("slots/mes/", SlotMesView.as_view(), name="slots-mes"),
+    path("slots/primer-cupo/", PrimerCupoView.as_view(), name="slots-primer-cupo"),
+    path("slots/cache/", SlotCacheStatsView.as_view(), name="slots-cache-stats"),
+    path("slots/invalidar/", SlotCacheInvalidationView.as_view(), name="slots-invalidar"),
 ]
@@ -1,10 +1,10 @@
 import logging
-import os
-from datetime import date, datetime, timedelta, time
+from datetime import date, datetime, timedelta
 
 import requests
-from django.db import models, transaction
+from django.db import IntegrityError, transaction
 from django.db.models import Q
+from django.db.models.functions import ExtractIsoWeekDay, TruncTime
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, status, viewsets
@@ -13,26 +13,105 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .catalogo import DURACION_POR_DEFECTO, duracion_y_paso
+from .constraints import DISPONIBILIDAD_SIN_CRUCES, MENSAJE_CRUCE_DISPONIBILIDAD, es_violacion
 from .models import BloqueoAgenda, Disponibilidad
+from .permissions import InternalToken
 from .serializers import BloqueoAgendaSerializer, DisponibilidadSerializer
+from .services import (
+    STAFF_INTERNAL_BULK_URL,
+    _internal_headers,
+    _parse_hora,
+    conflictos_con_citas,
+    conflictos_de_horarios,
+    disponibilidades_en_rango,
+    horario_aplica,
+    obtener_ocupacion,
+    profesionales_elegibles,
+    rango_fechas,
+)
+from .slot_cache import (
+    estadisticas,
+    etag_slots,
+    invalidar_dias,
+    invalidar_profesional,
+    invalidar_rango,
+    limitar_vigencia,
+    primeros_cupos,
+    slots_cacheados_dia,
+    slots_cacheados_en_rango,
+)
 from .utils.audit_client import audit_log
 
 logger = logging.getLogger(__name__)
 
-# Ajusta la URL si tu docker-compose usa otro nombre
-APPOINTMENTS_API_URL = "http://appointments-ms:8004/api/v1/citas/"
-STAFF_INTERNAL_BULK_URL = "http://professionals-ms:8002/api/v1/staff/internal/bulk-info/"
-
-
-def _internal_headers():
-    token = os.getenv("INTERNAL_SERVICE_TOKEN", "").strip()
-    return {"X-INTERNAL-TOKEN": token} if token else {}
+MAX_DIAS_RANGO_SLOTS = 31
+MAX_PROFESIONALES_RANGO_SLOTS = 50
+MAX_DIAS_PRIMER_CUPO = 90
+MAX_CUPOS_PRIMER_CUPO = 20
+MAX_SEMANAS_COPIA = 26
+MAX_PROFESIONALES_PLANTILLA = 100
+MAX_CONFLICTOS_REPORTADOS = 20
 
 
 def _uid(request):
     return request.user.id if getattr(request, "user", None) and request.user.is_authenticated else None
 
 
+def _invalidar_slots_disponibilidad(obj):
+    # Un horario de fecha fija solo afecta ese día; uno recurrente, todos
+    if obj.fecha:
+        invalidar_dias(obj.profesional_id, [obj.fecha])
+    else:
+        invalidar_profesional(obj.profesional_id)
+
+
+def _lunes(fecha):
+    return fecha - timedelta(days=fecha.weekday())
+
+
+def _error_duracion_bloque(hora_inicio, hora_fin):
+    # Mismas reglas que DisponibilidadSerializer.validate
+    duracion = (hora_fin.hour * 60 + hora_fin.minute) - (hora_inicio.hour * 60 + hora_inicio.minute)
+    if duracion <= 0:
+        return "La hora de inicio debe ser anterior a la hora de fin."
+    if duracion < 15:
+        return "La duracion minima del bloque es de 15 minutos."
+    if duracion > 720:
+        return "La duracion maxima por bloque es de 12 horas."
+    return None
+
+
+def _describir_horario(h):
+    cuando = h.fecha.isoformat() if h.fecha else h.get_dia_semana_display()
+    return f"Profesional {h.profesional_id} {cuando} {h.hora_inicio:%H:%M}-{h.hora_fin:%H:%M}"
+
+
+def _invalidar_slots_bloqueo(obj):
+    invalidar_rango(
+        obj.profesional_id,
+        timezone.localtime(obj.fecha_inicio).date(),
+        timezone.localtime(obj.fecha_fin).date(),
+    )
+
+
+def _parametros_slots(params):
+    """
+    ((servicio_id, lugar_id, duracion, paso), None) de una consulta de slots, o
+    (None, mensaje) si alguno no es válido. Todas las vistas de slots validan aquí.
+    """
+    try:
+        servicio_id = int(params["servicio_id"]) if params.get("servicio_id") else None
+        lugar_id = int(params["lugar_id"]) if params.get("lugar_id") else None
+        # Con servicio, la duración y el buffer salen del catálogo; duracion_minutos queda como respaldo
+        duracion, paso = duracion_y_paso(servicio_id, params.get("duracion_minutos", DURACION_POR_DEFECTO))
+    except ValueError:
+        return None, "Parámetros inválidos."
+    if duracion <= 0:
+        return None, "La duración debe ser mayor a cero."
+    return (servicio_id, lugar_id, duracion, paso), None
+
+
 def _audit_from_view(request, *, descripcion, accion, recurso, recurso_id=None, metadata=None):
     """
     Auditoría centralizada desde las vistas.
@@ -59,49 +138,34 @@ class DisponibilidadViewSet(viewsets.ModelViewSet):
     ordering_fields = ["dia_semana", "hora_inicio"]
     ESTADOS_CITA_BLOQUEANTES = {"PENDIENTE", "ACEPTADA", "EN_SALA", "LLAMADO"}
 
-    def _obtener_citas_activas(self, profesional_id, fecha_inicio, fecha_fin=None):
-        try:
-            f_ini_str = (
-                fecha_inicio.strftime("%Y-%m-%d") if isinstance(fecha_inicio, (date, datetime)) else fecha_inicio
-            )
-            f_fin_str = (
-                fecha_fin.strftime("%Y-%m-%d")
-                if fecha_fin and isinstance(fecha_fin, (date, datetime))
-                else fecha_fin
-            )
-
-            # appointments-ms soporta filtro exacto por fecha, no por rango.
-            params = {"profesional_id": profesional_id}
-            if f_fin_str and f_fin_str == f_ini_str:
-                params["fecha"] = f_ini_str
-
-            response = requests.get(APPOINTMENTS_API_URL, params=params, timeout=5, headers=_internal_headers())
-            if response.status_code != 200:
-                return []
-
-            payload = response.json()
-            citas = payload.get("results", []) if isinstance(payload, dict) else payload
-            if not isinstance(citas, list):
-                return []
-
-            if not fecha_fin:
-                return citas
-
-            # Filtro de rango en schedule-ms para evitar falsos positivos.
-            fecha_ini_obj = datetime.strptime(f_ini_str, "%Y-%m-%d").date()
-            fecha_fin_obj = datetime.strptime(f_fin_str, "%Y-%m-%d").date()
-            citas_filtradas = []
-            for c in citas:
-                try:
-                    c_fecha = datetime.strptime(c.get("fecha", ""), "%Y-%m-%d").date()
-                except Exception:
-                    continue
-                if fecha_ini_obj <= c_fecha <= fecha_fin_obj:
-                    citas_filtradas.append(c)
-            return citas_filtradas
-        except Exception as e:
-            logger.error(f"Error contactando Appointments MS: {e}")
+    def _obtener_citas_activas(self, profesional_id, fecha_inicio, fecha_fin=None, **ventana):
+        """
+        Citas bloqueantes del profesional en la ventana pedida.
+        appointments-ms filtra por rango y estado; no se descarga el historial.
+        `ventana` acepta dia_semana, hora_desde y hora_hasta (ver obtener_ocupacion).
+        """
+        fecha_inicio = self._como_fecha(fecha_inicio)
+        fecha_fin = self._como_fecha(fecha_fin) if fecha_fin else None
+        citas = obtener_ocupacion(
+            [profesional_id],
+            fecha_inicio,
+            fecha_fin,
+            estados=self.ESTADOS_CITA_BLOQUEANTES,
+            timeout=5,
+            **ventana,
+        )
+        if citas is None:
+            logger.error("Error contactando Appointments MS")
             return []
+        return citas
+
+    @staticmethod
+    def _como_fecha(value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return datetime.strptime(value, "%Y-%m-%d").date()
 
     def _obtener_profesional_info(self, profesional_id):
         try:
@@ -179,7 +243,7 @@ class DisponibilidadViewSet(viewsets.ModelViewSet):
 
         citas = self._obtener_citas_activas(profesional_id, fecha_inicio, fecha_fin)
         for c in citas:
-            if c.get("estado") not in self.ESTADOS_CITA_BLOQUEANTES:
+            if c.get("estado") and c["estado"] not in self.ESTADOS_CITA_BLOQUEANTES:
                 continue
             try:
                 c_fecha = datetime.strptime(c["fecha"], "%Y-%m-%d").date()
@@ -199,6 +263,7 @@ class DisponibilidadViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         uid = _uid(self.request)
         obj = serializer.save(usuario_id=uid)
+        _invalidar_slots_disponibilidad(obj)
 
         _audit_from_view(
             self.request,
@@ -234,6 +299,9 @@ class DisponibilidadViewSet(viewsets.ModelViewSet):
             old = None
 
         obj = serializer.save(usuario_id=uid)
+        if old:
+            _invalidar_slots_disponibilidad(old)
+        _invalidar_slots_disponibilidad(obj)
 
         changed = {}
         if old:
@@ -299,6 +367,7 @@ class DisponibilidadViewSet(viewsets.ModelViewSet):
             "activo": instance.activo,
         }
         instance.delete()
+        _invalidar_slots_disponibilidad(instance)
         _audit_from_view(
             self.request,
             descripcion=f"DELETE Disponibilidad #{pk}",
@@ -383,7 +452,18 @@ class DisponibilidadViewSet(viewsets.ModelViewSet):
 
             # --- CASO A: RECURRENTE (Semanal) ---
             if instance.fecha is None:
-                citas_futuras = self._obtener_citas_activas(instance.profesional_id, hoy)
+                # Solo el día de la semana y franja de la serie, dentro de su vigencia
+                desde = max(hoy, instance.fecha_inicio_vigencia) if instance.fecha_inicio_vigencia else hoy
+                citas_futuras = []
+                if not instance.fecha_fin_vigencia or instance.fecha_fin_vigencia >= desde:
+                    citas_futuras = self._obtener_citas_activas(
+                        instance.profesional_id,
+                        desde,
+                        instance.fecha_fin_vigencia,
+                        dia_semana=instance.dia_semana,
+                        hora_desde=instance.hora_inicio,
+                        hora_hasta=instance.hora_fin,
+                    )
                 conflictos = []
 
                 for c in citas_futuras:
@@ -393,18 +473,12 @@ class DisponibilidadViewSet(viewsets.ModelViewSet):
                         c_date = datetime.strptime(c["fecha"], "%Y-%m-%d").date()
                         c_time = datetime.strptime(c["hora_inicio"], "%H:%M:%S").time()
 
-                        if c_date.weekday() == instance.dia_semana:
-                            if c_time >= instance.hora_inicio and c_time < instance.hora_fin:
-                                cumple_inicio = (
-                                    instance.fecha_inicio_vigencia is None
-                                    or c_date >= instance.fecha_inicio_vigencia
-                                )
-                                cumple_fin = (
-                                    instance.fecha_fin_vigencia is None
-                                    or c_date <= instance.fecha_fin_vigencia
-                                )
-                                if cumple_inicio and cumple_fin:
-                                    conflictos.append(f"{c['fecha']} {c['hora_inicio']}")
+                        # appointments-ms ya filtra; se revalida por si ignora algún parámetro
+                        if (
+                            c_date.weekday() == instance.dia_semana
+                            and instance.hora_inicio <= c_time < instance.hora_fin
+                        ):
+                            conflictos.append(f"{c['fecha']} {c['hora_inicio']}")
                     except Exception:
                         continue
 
@@ -414,27 +488,41 @@ class DisponibilidadViewSet(viewsets.ModelViewSet):
                         status=409,
                     )
 
-                bloqueos_futuros = BloqueoAgenda.objects.filter(
-                    profesional_id=instance.profesional_id,
-                    fecha_inicio__date__gt=hoy,
-                )
+                with transaction.atomic():
+                    # Un solo DELETE; día y hora se evalúan en SQL en la zona horaria local
+                    count_bloqueos, _ = (
+                        BloqueoAgenda.objects.filter(
+                            profesional_id=instance.profesional_id,
+                            fecha_inicio__date__gt=hoy,
+                        )
+                        .annotate(
+                            dia_iso=ExtractIsoWeekDay("fecha_inicio"),
+                            hora=TruncTime("fecha_inicio"),
+                        )
+                        .filter(
+                            dia_iso=instance.dia_semana + 1,
+                            hora__gte=instance.hora_inicio,
+                            hora__lt=instance.hora_fin,
+                        )
+                        .delete()
+                    )
 
-                count_bloqueos = 0
-                for b in bloqueos_futuros:
-                    if b.fecha_inicio.weekday() == instance.dia_semana:
-                        b_hora = b.fecha_inicio.time()
-                        if b_hora >= instance.hora_inicio and b_hora < instance.hora_fin:
-                            b.delete()
-                            count_bloqueos += 1
+                    # Soft delete = cortar vigencia (sin alargar una que ya terminó)
+                    ayer = hoy - timedelta(days=1)
+                    old_vig = instance.fecha_fin_vigencia
+                    if instance.fecha_inicio_vigencia and instance.fecha_inicio_vigencia > ayer:
+                        # Aún no empieza: cortarla a ayer dejaría fin < inicio (rango inválido)
+                        instance.activo = False
+                        campos = ["activo", "usuario_id"]
+                    else:
+                        instance.fecha_fin_vigencia = min(old_vig, ayer) if old_vig else ayer
+                        campos = ["fecha_fin_vigencia", "usuario_id"]
 
-                # Soft delete = cortar vigencia
-                ayer = hoy - timedelta(days=1)
-                old_vig = instance.fecha_fin_vigencia
-                instance.fecha_fin_vigencia = ayer
+                    # set actor
+                    instance.usuario_id = _uid(request)
+                    instance.save(update_fields=campos)
 
-                # set actor
-                instance.usuario_id = _uid(request)
-                instance.save(update_fields=["fecha_fin_vigencia", "usuario_id"])
+                invalidar_profesional(instance.profesional_id)
 
                 _audit_from_view(
                     request,
@@ -448,6 +536,7 @@ class DisponibilidadViewSet(viewsets.ModelViewSet):
                         "hora_inicio": str(instance.hora_inicio),
                         "hora_fin": str(instance.hora_fin),
                         "vigente_hasta": str(instance.fecha_fin_vigencia),
+                        "activo": instance.activo,
                         "bloqueos_eliminados": count_bloqueos,
                         "changed": {
                             "fecha_fin_vigencia": {
@@ -559,6 +648,8 @@ class DisponibilidadViewSet(viewsets.ModelViewSet):
                     )
                     count_creados += 1
 
+            invalidar_dias(profesional_id, [f_destino])
+
             _audit_from_view(
                 request,
                 descripcion=f"DUPLICAR_DIA profesional={profesional_id} {fecha_origen_str}->{fecha_destino_str}",
@@ -576,10 +667,277 @@ class DisponibilidadViewSet(viewsets.ModelViewSet):
 
             return Response({"mensaje": f"Se copiaron {count_creados} bloques horarios."}, status=200)
 
+        except IntegrityError as e:
+            if es_violacion(e, DISPONIBILIDAD_SIN_CRUCES):
+                return Response({"error": MENSAJE_CRUCE_DISPONIBILIDAD}, status=status.HTTP_409_CONFLICT)
+            logger.error(f"Error duplicando agenda: {e}")
+            return Response({"error": str(e)}, status=500)
         except Exception as e:
             logger.error(f"Error duplicando agenda: {e}")
             return Response({"error": str(e)}, status=500)
 
+    def _validar_lote(self, nuevos):
+        """
+        Valida un lote de horarios sin guardar: cruces (una sola consulta para
+        todo el lote) y citas vigentes (una sola llamada a appointments-ms).
+        Devuelve un Response 409 si hay conflictos, o None.
+        """
+        cruces = conflictos_de_horarios(nuevos)
+        if cruces:
+            return Response(
+                {
+                    "error": MENSAJE_CRUCE_DISPONIBILIDAD,
+                    "conflictos": [
+                        f"{_describir_horario(h)} se cruza con {_describir_horario(otro)}"
+                        for h, otro in cruces[:MAX_CONFLICTOS_REPORTADOS]
+                    ],
+                    "total_conflictos": len(cruces),
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        citas = conflictos_con_citas(nuevos, self.ESTADOS_CITA_BLOQUEANTES)
+        if citas:
+            return Response(
+                {
+                    "error": "Hay pacientes citados en los horarios a crear.",
+                    "conflictos": citas[:MAX_CONFLICTOS_REPORTADOS],
+                    "total_conflictos": len(citas),
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+        return None
+
+    def _insertar_lote(self, nuevos):
+        # La restricción de exclusión cubre la carrera entre la validación y el INSERT
+        try:
+            with transaction.atomic():
+                Disponibilidad.objects.bulk_create(nuevos)
+        except IntegrityError as e:
+            if es_violacion(e, DISPONIBILIDAD_SIN_CRUCES):
+                return Response({"error": MENSAJE_CRUCE_DISPONIBILIDAD}, status=status.HTTP_409_CONFLICT)
+            raise
+        return None
+
+    @action(detail=False, methods=["post"], url_path="copiar_semana")
+    def copiar_semana(self, request):
+        """
+        Copia la agenda efectiva de una semana (lunes a domingo) a un rango de
+        semanas destino como horarios de fecha fija. Los horarios recurrentes
+        que ya cubren el día destino no se duplican.
+        """
+        profesional_id = request.data.get("profesional_id")
+        semana_origen_str = request.data.get("semana_origen")
+        destino_desde_str = request.data.get("semana_destino_desde")
+        destino_hasta_str = request.data.get("semana_destino_hasta") or destino_desde_str
+        lugar_id = request.data.get("lugar_id")
+
+        if not all([profesional_id, semana_origen_str, destino_desde_str]):
+            return Response({"error": "Faltan datos requeridos."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            profesional_id = int(profesional_id)
+            origen = _lunes(datetime.strptime(semana_origen_str, "%Y-%m-%d").date())
+            destino_desde = _lunes(datetime.strptime(destino_desde_str, "%Y-%m-%d").date())
+            destino_hasta = _lunes(datetime.strptime(destino_hasta_str, "%Y-%m-%d").date())
+        except (TypeError, ValueError):
+            return Response({"error": "Parámetros inválidos."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if destino_hasta < destino_desde:
+            return Response({"error": "Rango de semanas destino inválido."}, status=status.HTTP_400_BAD_REQUEST)
+        semanas = [destino_desde + timedelta(weeks=i) for i in range((destino_hasta - destino_desde).days // 7 + 1)]
+        if len(semanas) > MAX_SEMANAS_COPIA:
+            return Response(
+                {"error": f"Máximo {MAX_SEMANAS_COPIA} semanas por operación."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if origen in semanas:
+            return Response(
+                {"error": "La semana origen no puede estar en el rango destino."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if destino_desde <= date.today():
+            return Response({"error": "No se puede crear agenda en el pasado."}, status=status.HTTP_400_BAD_REQUEST)
+
+        dias_origen = rango_fechas(origen, origen + timedelta(days=6))
+        horarios_origen = disponibilidades_en_rango([profesional_id], dias_origen[0], dias_origen[-1])
+        if not horarios_origen:
+            return Response({"error": "No hay horarios para copiar en la semana origen."}, status=404)
+
+        uid = _uid(request)
+        nuevos = []
+        omitidos = 0
+        for lunes in semanas:
+            for offset, dia in enumerate(dias_origen):
+                destino = lunes + timedelta(days=offset)
+                for h in horarios_origen:
+                    if not horario_aplica(h, dia):
+                        continue
+                    if horario_aplica(h, destino):
+                        omitidos += 1
+                        continue
+                    nuevos.append(
+                        Disponibilidad(
+                            usuario_id=uid,
+                            profesional_id=profesional_id,
+                            lugar_id=lugar_id or h.lugar_id,
+                            servicio_id=h.servicio_id,
+                            dia_semana=destino.weekday(),
+                            hora_inicio=h.hora_inicio,
+                            hora_fin=h.hora_fin,
+                            fecha=destino,
+                            activo=True,
+                        )
+                    )
+
+        error = self._validar_lote(nuevos)
+        if error:
+            return error
+
+        error = self._insertar_lote(nuevos)
+        if error:
+            return error
+
+        invalidar_dias(profesional_id, {h.fecha for h in nuevos})
+
+        _audit_from_view(
+            request,
+            descripcion=(
+                f"COPIAR_SEMANA profesional={profesional_id} {origen}->{destino_desde}..{destino_hasta} "
+                f"creados={len(nuevos)}"
+            ),
+            accion="COPIAR_SEMANA",
+            recurso="Disponibilidad",
+            recurso_id=None,
+            metadata={
+                "profesional_id": profesional_id,
+                "lugar_id": lugar_id,
+                "semana_origen": origen.isoformat(),
+                "semana_destino_desde": destino_desde.isoformat(),
+                "semana_destino_hasta": destino_hasta.isoformat(),
+                "semanas": len(semanas),
+                "creados": len(nuevos),
+                "omitidos": omitidos,
+            },
+        )
+
+        return Response(
+            {
+                "mensaje": f"Se copiaron {len(nuevos)} bloques horarios en {len(semanas)} semanas.",
+                "creados": len(nuevos),
+                "omitidos": omitidos,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=False, methods=["post"], url_path="aplicar_plantilla")
+    def aplicar_plantilla(self, request):
+        """
+        Crea la misma plantilla semanal (horarios recurrentes con vigencia)
+        para varios profesionales en una sola operación.
+
+        Body: profesional_ids, bloques=[{dia_semana, hora_inicio, hora_fin,
+        lugar_id, servicio_id?}], fecha_inicio_vigencia?, fecha_fin_vigencia?
+        """
+        profesional_ids = request.data.get("profesional_ids") or []
+        bloques = request.data.get("bloques") or []
+        vigencia_desde_str = request.data.get("fecha_inicio_vigencia")
+        vigencia_hasta_str = request.data.get("fecha_fin_vigencia")
+
+        if isinstance(profesional_ids, str):
+            profesional_ids = [p for p in profesional_ids.split(",") if p.strip()]
+        if not profesional_ids or not bloques:
+            return Response({"error": "Faltan datos requeridos."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            profesional_ids = sorted({int(p) for p in profesional_ids})
+            vigencia_desde = (
+                datetime.strptime(vigencia_desde_str, "%Y-%m-%d").date() if vigencia_desde_str else None
+            )
+            vigencia_hasta = (
+                datetime.strptime(vigencia_hasta_str, "%Y-%m-%d").date() if vigencia_hasta_str else None
+            )
+            plantilla = [
+                {
+                    "dia_semana": int(b["dia_semana"]),
+                    "hora_inicio": _parse_hora(b["hora_inicio"]),
+                    "hora_fin": _parse_hora(b["hora_fin"]),
+                    "lugar_id": int(b["lugar_id"]),
+                    "servicio_id": int(b["servicio_id"]) if b.get("servicio_id") else None,
+                }
+                for b in bloques
+            ]
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return Response({"error": "Parámetros inválidos."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(profesional_ids) > MAX_PROFESIONALES_PLANTILLA:
+            return Response(
+                {"error": f"Máximo {MAX_PROFESIONALES_PLANTILLA} profesionales por operación."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if vigencia_desde and vigencia_hasta and vigencia_desde > vigencia_hasta:
+            return Response(
+                {"error": "La fecha de inicio de vigencia debe ser anterior o igual a la fecha fin."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        for b in plantilla:
+            if not 0 <= b["dia_semana"] <= 6:
+                return Response({"error": "dia_semana debe estar entre 0 y 6."}, status=status.HTTP_400_BAD_REQUEST)
+            error = _error_duracion_bloque(b["hora_inicio"], b["hora_fin"])
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        uid = _uid(request)
+        nuevos = [
+            Disponibilidad(
+                usuario_id=uid,
+                profesional_id=pid,
+                fecha_inicio_vigencia=vigencia_desde,
+                fecha_fin_vigencia=vigencia_hasta,
+                activo=True,
+                **b,
+            )
+            for pid in profesional_ids
+            for b in plantilla
+        ]
+
+        error = self._validar_lote(nuevos)
+        if error:
+            return error
+
+        error = self._insertar_lote(nuevos)
+        if error:
+            return error
+
+        for pid in profesional_ids:
+            invalidar_profesional(pid)
+
+        _audit_from_view(
+            request,
+            descripcion=(
+                f"APLICAR_PLANTILLA profesionales={len(profesional_ids)} bloques={len(plantilla)} "
+                f"creados={len(nuevos)}"
+            ),
+            accion="APLICAR_PLANTILLA",
+            recurso="Disponibilidad",
+            recurso_id=None,
+            metadata={
+                "profesional_ids": profesional_ids,
+                "bloques": len(plantilla),
+                "fecha_inicio_vigencia": vigencia_desde_str,
+                "fecha_fin_vigencia": vigencia_hasta_str,
+                "creados": len(nuevos),
+            },
+        )
+
+        return Response(
+            {
+                "mensaje": f"Se crearon {len(nuevos)} bloques horarios para {len(profesional_ids)} profesionales.",
+                "creados": len(nuevos),
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
 
 class BloqueoAgendaViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
@@ -591,6 +949,7 @@ class BloqueoAgendaViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         uid = _uid(self.request)
         obj = serializer.save(usuario_id=uid)
+        _invalidar_slots_bloqueo(obj)
 
         _audit_from_view(
             self.request,
@@ -618,6 +977,9 @@ class BloqueoAgendaViewSet(viewsets.ModelViewSet):
             old = None
 
         obj = serializer.save(usuario_id=uid)
+        if old:
+            _invalidar_slots_bloqueo(old)
+        _invalidar_slots_bloqueo(obj)
 
         changed = {}
         if old:
@@ -657,6 +1019,7 @@ class BloqueoAgendaViewSet(viewsets.ModelViewSet):
             "motivo": instance.motivo,
         }
         instance.delete()
+        _invalidar_slots_bloqueo(instance)
         _audit_from_view(
             self.request,
             descripcion=f"DELETE BloqueoAgenda #{pk}",
@@ -677,73 +1040,243 @@ class SlotGeneratorView(APIView):
     def get(self, request):
         profesional_id = request.query_params.get("profesional_id")
         fecha_str = request.query_params.get("fecha")
-        servicio_id = request.query_params.get("servicio_id")
-        duracion = int(request.query_params.get("duracion_minutos", 20))
 
         if not profesional_id or not fecha_str:
             return Response({"error": "Faltan parámetros"}, status=400)
 
-        fecha_obj = datetime.strptime(fecha_str, "%Y-%m-%d").date()
-        dia_semana = fecha_obj.weekday()
+        try:
+            profesional_id = int(profesional_id)
+            fecha_obj = datetime.strptime(fecha_str, "%Y-%m-%d").date()
+        except ValueError:
+            return Response({"error": "Parámetros inválidos."}, status=400)
+        parametros, error = _parametros_slots(request.query_params)
+        if error:
+            return Response({"error": error}, status=400)
+        servicio_id, _, duracion, paso = parametros
+
+        slots_disponibles = slots_cacheados_dia(
+            profesional_id, fecha_obj, duracion, servicio_id=servicio_id, paso=paso
+        )
+        return Response(slots_disponibles, status=200)
+
 
-        # ✅ FIX warnings naive datetime: comparar con rango aware del día
-        start_dt = timezone.make_aware(datetime.combine(fecha_obj, time.min))
-        end_dt = timezone.make_aware(datetime.combine(fecha_obj, time.max))
+class SlotRangeView(APIView):
+    """
+    Slots de varios profesionales en un rango de fechas con una sola carga
+    de horarios, bloqueos y citas (vista semanal del agendamiento).
+    """
+    permission_classes = [IsAuthenticated]
 
-        bloqueos_dia = list(
-            BloqueoAgenda.objects.filter(
-                profesional_id=profesional_id,
-                fecha_inicio__lte=end_dt,
-                fecha_fin__gte=start_dt,
+    def get(self, request):
+        ids_param = request.query_params.get("profesional_ids") or ",".join(
+            request.query_params.getlist("profesional_id")
+        )
+        fecha_inicio_str = request.query_params.get("fecha_inicio")
+        fecha_fin_str = request.query_params.get("fecha_fin") or fecha_inicio_str
+
+        if not ids_param or not fecha_inicio_str:
+            return Response({"error": "Faltan parámetros (profesional_ids, fecha_inicio)."}, status=400)
+
+        try:
+            profesional_ids = sorted({int(x) for x in ids_param.split(",") if x.strip()})
+            fecha_inicio = datetime.strptime(fecha_inicio_str, "%Y-%m-%d").date()
+            fecha_fin = datetime.strptime(fecha_fin_str, "%Y-%m-%d").date()
+        except ValueError:
+            return Response({"error": "Parámetros inválidos."}, status=400)
+        parametros, error = _parametros_slots(request.query_params)
+        if error:
+            return Response({"error": error}, status=400)
+        servicio_id, lugar_id, duracion, paso = parametros
+
+        if fecha_fin < fecha_inicio:
+            return Response({"error": "La fecha fin debe ser posterior o igual a la fecha inicio."}, status=400)
+        if (fecha_fin - fecha_inicio).days + 1 > MAX_DIAS_RANGO_SLOTS:
+            return Response({"error": f"El rango máximo es de {MAX_DIAS_RANGO_SLOTS} días."}, status=400)
+        if len(profesional_ids) > MAX_PROFESIONALES_RANGO_SLOTS:
+            return Response(
+                {"error": f"Máximo {MAX_PROFESIONALES_RANGO_SLOTS} profesionales por consulta."},
+                status=400,
             )
+
+        slots, _ = slots_cacheados_en_rango(
+            profesional_ids,
+            fecha_inicio,
+            fecha_fin,
+            duracion,
+            servicio_id=servicio_id,
+            lugar_id=lugar_id,
+            paso=paso,
+        )
+
+        return Response(
+            {
+                "fecha_inicio": fecha_inicio.isoformat(),
+                "fecha_fin": fecha_fin.isoformat(),
+                "duracion_minutos": duracion,
+                "paso_minutos": paso or duracion,
+                "profesionales": {str(pid): dias for pid, dias in slots.items()},
+            },
+            status=200,
+        )
+
+
+class SlotMesView(APIView):
+    """
+    Resumen de un mes para el selector de fechas: cantidad de slots libres por
+    día y un bitmap ("1" = hay al menos un slot). Se calcula con una sola carga
+    de horarios, bloqueos y ocupación del mes y responde 304 si el ETag
+    (mes, parámetros, día actual y versiones de caché del profesional y sus
+    días) no cambió.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        profesional_id = request.query_params.get("profesional_id")
+        mes_str = request.query_params.get("mes")
+
+        if not profesional_id or not mes_str:
+            return Response({"error": "Faltan parámetros (profesional_id, mes)."}, status=400)
+
+        try:
+            profesional_id = int(profesional_id)
+            fecha_inicio = datetime.strptime(mes_str, "%Y-%m").date()
+        except ValueError:
+            return Response({"error": "Parámetros inválidos."}, status=400)
+        parametros, error = _parametros_slots(request.query_params)
+        if error:
+            return Response({"error": error}, status=400)
+        servicio_id, lugar_id, duracion, paso = parametros
+
+        fecha_fin = (fecha_inicio.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+        etag = etag_slots([profesional_id], fecha_inicio, fecha_fin, servicio_id, lugar_id, duracion, paso)
+        cabeceras = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag in [t.strip() for t in request.headers.get("If-None-Match", "").split(",")]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+
+        slots, completo = slots_cacheados_en_rango(
+            [profesional_id],
+            fecha_inicio,
+            fecha_fin,
+            duracion,
+            servicio_id=servicio_id,
+            lugar_id=lugar_id,
+            paso=paso,
+        )
+        if not completo:
+            # Calculado sin la ocupación de citas: que el cliente no lo reutilice con un 304
+            cabeceras = {"Cache-Control": "no-store"}
+        dias = slots[profesional_id]
+        conteo = {fecha: len(slots) for fecha, slots in dias.items()}
+
+        return Response(
+            {
+                "profesional_id": profesional_id,
+                "mes": mes_str,
+                "duracion_minutos": duracion,
+                "paso_minutos": paso or duracion,
+                "bitmap": "".join("1" if conteo[f] else "0" for f in sorted(conteo)),
+                "dias": conteo,
+            },
+            status=200,
+            headers=cabeceras,
         )
 
-        horarios = Disponibilidad.objects.filter(
-            profesional_id=profesional_id, dia_semana=dia_semana, activo=True
-        ).filter(
-            models.Q(fecha=fecha_obj)
-            | (
-                models.Q(fecha__isnull=True)
-                & (models.Q(fecha_inicio_vigencia__isnull=True) | models.Q(fecha_inicio_vigencia__lte=fecha_obj))
-                & (models.Q(fecha_fin_vigencia__isnull=True) | models.Q(fecha_fin_vigencia__gte=fecha_obj))
+
+class PrimerCupoView(APIView):
+    """
+    Cupos más tempranos para un servicio con cualquier profesional habilitado
+    (opcionalmente en una sede). Los profesionales se piden una sola vez a
+    professionals-ms y los días se recorren en orden hasta llenar el cupo.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not request.query_params.get("servicio_id"):
+            return Response({"error": "Faltan parámetros (servicio_id)."}, status=400)
+
+        try:
+            desde_str = request.query_params.get("desde")
+            desde = datetime.strptime(desde_str, "%Y-%m-%d").date() if desde_str else timezone.localdate()
+            dias = int(request.query_params.get("dias", 30))
+            limite = int(request.query_params.get("limite", 5))
+        except ValueError:
+            return Response({"error": "Parámetros inválidos."}, status=400)
+        parametros, error = _parametros_slots(request.query_params)
+        if error:
+            return Response({"error": error}, status=400)
+        servicio_id, lugar_id, duracion, paso = parametros
+
+        if not 1 <= dias <= MAX_DIAS_PRIMER_CUPO:
+            return Response({"error": f"El horizonte debe estar entre 1 y {MAX_DIAS_PRIMER_CUPO} días."}, status=400)
+        if not 1 <= limite <= MAX_CUPOS_PRIMER_CUPO:
+            return Response({"error": f"El límite debe estar entre 1 y {MAX_CUPOS_PRIMER_CUPO}."}, status=400)
+
+        profesionales = profesionales_elegibles(servicio_id, lugar_id)
+        if profesionales is None:
+            return Response({"error": "No fue posible consultar los profesionales."}, status=503)
+        nombres = {int(p["id"]): p.get("nombre") for p in profesionales}
+
+        cupos, dias_revisados = [], 0
+        if nombres:
+            cupos, dias_revisados = primeros_cupos(
+                sorted(nombres),
+                max(desde, timezone.localdate()),
+                desde + timedelta(days=dias - 1),
+                duracion,
+                limite,
+                servicio_id=servicio_id,
+                lugar_id=lugar_id,
+                paso=paso,
             )
+
+        return Response(
+            {
+                "servicio_id": servicio_id,
+                "lugar_id": lugar_id,
+                "duracion_minutos": duracion,
+                "paso_minutos": paso or duracion,
+                "dias_revisados": dias_revisados,
+                "cupos": [
+                    {"fecha": fecha, "hora": hora, "profesional_id": pid, "profesional_nombre": nombres.get(pid)}
+                    for fecha, hora, pid in cupos
+                ],
+            },
+            status=200,
         )
 
-        if servicio_id:
-            horarios = horarios.filter(models.Q(servicio_id__isnull=True) | models.Q(servicio_id=servicio_id))
 
-        url_citas = f"{APPOINTMENTS_API_URL}?profesional_id={profesional_id}&fecha={fecha_str}"
-        citas_ocupadas = []
+class SlotCacheInvalidationView(APIView):
+    """
+    Notificación interna (appointments-ms) de que cambió la ocupación de un
+    profesional en uno o varios días. `vigencia` (segundos) acota cuánto se
+    cachean esos días: llega cuando se toma un hold que expira solo.
+    """
+    authentication_classes = []
+    permission_classes = [InternalToken]
+
+    def post(self, request):
+        profesional_id = request.data.get("profesional_id")
+        fechas_str = request.data.get("fechas") or ([request.data["fecha"]] if request.data.get("fecha") else [])
+
         try:
-            resp = requests.get(url_citas, timeout=3, headers=_internal_headers())
-            if resp.status_code == 200:
-                for c in resp.json():
-                    if c.get("estado") not in ["CANCELADA", "RECHAZADA"]:
-                        citas_ocupadas.append((c["hora_inicio"], c["hora_fin"]))
-        except Exception:
-            pass
-
-        slots_disponibles = []
-        for horario in horarios:
-            inicio_turno = datetime.combine(fecha_obj, horario.hora_inicio)
-            fin_turno = datetime.combine(fecha_obj, horario.hora_fin)
-            cursor = inicio_turno
-
-            while cursor + timedelta(minutes=duracion) <= fin_turno:
-                s_ini = cursor.strftime("%H:%M")
-                s_fin = (cursor + timedelta(minutes=duracion)).strftime("%H:%M")
-                slot_start = cursor
-                slot_end = cursor + timedelta(minutes=duracion)
-                if timezone.is_naive(slot_start):
-                    slot_start = timezone.make_aware(slot_start)
-                if timezone.is_naive(slot_end):
-                    slot_end = timezone.make_aware(slot_end)
-
-                ocupado = any((s_ini < oc_fin and s_fin > oc_ini) for oc_ini, oc_fin in citas_ocupadas)
-                bloqueado = any(b.fecha_inicio < slot_end and b.fecha_fin > slot_start for b in bloqueos_dia)
-
-                if not ocupado and not bloqueado:
-                    slots_disponibles.append(s_ini)
-                cursor += timedelta(minutes=duracion)
-
-        return Response(sorted(list(set(slots_disponibles))), status=200)
+            profesional_id = int(profesional_id)
+            fechas = [datetime.strptime(str(f), "%Y-%m-%d").date() for f in fechas_str]
+            vigencia = int(request.data.get("vigencia") or 0)
+        except (TypeError, ValueError):
+            return Response({"error": "Parámetros inválidos."}, status=400)
+
+        if fechas:
+            if vigencia > 0:
+                limitar_vigencia(profesional_id, fechas, vigencia)
+            invalidar_dias(profesional_id, fechas)
+        else:
+            invalidar_profesional(profesional_id)
+        return Response(status=204)
+
+
+class SlotCacheStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(estadisticas())
@@ -0,0 +1,109 @@
+"""
+Compara el cálculo de slots anterior (any() anidados) contra el motor
+sweep-line de agenda/slots.py en un día denso.
+
+Fuera de la app y de las pruebas: se corre a mano desde schedule-ms,
+    python benchmarks/benchmark_slots.py [--duracion 5] [--citas 120] ...
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+
+from agenda.slots import a_hora, slots_libres  # noqa: E402
+
+
+def _slots_legacy(turnos, citas, bloqueos, fecha, duracion):
+    """
+    Réplica del cálculo anterior de SlotGeneratorView: cada slot contra cada
+    cita (strings "HH:MM") y cada bloqueo (datetimes aware).
+    """
+    libres = []
+    for h_ini, h_fin in turnos:
+        cursor = datetime.combine(fecha, h_ini)
+        fin_turno = datetime.combine(fecha, h_fin)
+        while cursor + timedelta(minutes=duracion) <= fin_turno:
+            s_ini = cursor.strftime("%H:%M")
+            s_fin = (cursor + timedelta(minutes=duracion)).strftime("%H:%M")
+            slot_start = timezone.make_aware(cursor)
+            slot_end = timezone.make_aware(cursor + timedelta(minutes=duracion))
+            ocupado = any((s_ini < oc_fin and s_fin > oc_ini) for oc_ini, oc_fin in citas)
+            bloqueado = any(b_ini < slot_end and b_fin > slot_start for b_ini, b_fin in bloqueos)
+            if not ocupado and not bloqueado:
+                libres.append(s_ini)
+            cursor += timedelta(minutes=duracion)
+    return sorted(set(libres))
+
+
+def _dia_denso(fecha, duracion, n_citas, n_bloqueos, seed):
+    rnd = random.Random(seed)
+    turnos = [(time(6, 0), time(13, 0)), (time(14, 0), time(22, 0))]
+    inicios = rnd.sample(range(6 * 60, 22 * 60 - duracion, 5), n_citas + n_bloqueos)
+
+    # "HH:MM" sin segundos: con "HH:MM:SS" la comparación de strings del cálculo
+    # anterior marcaba ocupado el slot justo después de cada cita.
+    citas = [(a_hora(m), a_hora(m + duracion)) for m in inicios[:n_citas]]
+
+    bloqueos = []
+    for m in inicios[n_citas:]:
+        ini = timezone.make_aware(datetime.combine(fecha, time(m // 60, m % 60)))
+        bloqueos.append((ini, ini + timedelta(minutes=rnd.choice([10, 15, 30]))))
+    return turnos, citas, bloqueos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duracion", type=int, default=5, help="Duración del slot en minutos (default 5).")
+    parser.add_argument("--citas", type=int, default=120, help="Citas ocupadas en el día (default 120).")
+    parser.add_argument("--bloqueos", type=int, default=20, help="Bloqueos en el día (default 20).")
+    parser.add_argument("--repeticiones", type=int, default=50, help="Repeticiones por medición (default 50).")
+    options = parser.parse_args()
+
+    duracion = options.duracion
+    repeticiones = options.repeticiones
+    fecha = date.today()
+
+    turnos, citas, bloqueos = _dia_denso(fecha, duracion, options.citas, options.bloqueos, seed=42)
+
+    def motor():
+        ocupados = []
+        for ini, fin in citas:
+            ocupados.append((int(ini[:2]) * 60 + int(ini[3:5]), int(fin[:2]) * 60 + int(fin[3:5])))
+        for ini, fin in bloqueos:
+            ini_l, fin_l = timezone.localtime(ini), timezone.localtime(fin)
+            ocupados.append((ini_l.hour * 60 + ini_l.minute, fin_l.hour * 60 + fin_l.minute))
+        grilla = [(t[0].hour * 60 + t[0].minute, t[1].hour * 60 + t[1].minute) for t in turnos]
+        return [a_hora(m) for m in slots_libres(grilla, ocupados, duracion)]
+
+    def legacy():
+        return _slots_legacy(turnos, citas, bloqueos, fecha, duracion)
+
+    if motor() != legacy():
+        sys.exit("[benchmark_slots] Los resultados no coinciden.")
+
+    t_legacy = min(timeit.repeat(legacy, number=repeticiones, repeat=3)) / repeticiones
+    t_motor = min(timeit.repeat(motor, number=repeticiones, repeat=3)) / repeticiones
+
+    print(
+        f"[benchmark_slots] duracion={duracion}min citas={len(citas)} bloqueos={len(bloqueos)} "
+        f"slots_libres={len(motor())}"
+    )
+    print(f"[benchmark_slots] legacy={t_legacy * 1000:.3f} ms | sweep-line={t_motor * 1000:.3f} ms")
+    print(f"[benchmark_slots] speedup x{t_legacy / t_motor:.1f}")
+
+
+if __name__ == "__main__":
+    main()
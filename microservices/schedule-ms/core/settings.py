@@ -73,6 +73,28 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Caché compartida (Redis del docker-compose). Sin REDIS_URL se usa memoria local.
+REDIS_URL = env("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "schedule",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Segundos que vive un día de slots calculado (se invalida antes por eventos)
+SLOTS_CACHE_TTL = env.int("SLOTS_CACHE_TTL", default=600)
+
+# Segundos que vive la duración/buffer de un servicio leída de professionals-ms
+SERVICIOS_CACHE_TTL = env.int("SERVICIOS_CACHE_TTL", default=300)
 
 LANGUAGE_CODE = "es-co"
 TIME_ZONE = "America/Bogota"